@@ -36,6 +36,13 @@ def create_app(config_name='default'):
     db.init_app(app)
     login_manager.init_app(app)
 
+    from app.utils import events
+    from app.utils.cache import cache
+    cache.init_app(app)  # before events, so a resync after a delta reads fresh stats
+    events.init_app(app)
+    from app.utils.pdf_cache import pdf_cache
+    pdf_cache.init_app(app)
+
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.dashboard import dashboard_bp
@@ -48,6 +55,7 @@ def create_app(config_name='default'):
     from app.routes.library import library_bp
     from app.routes.reports import reports_bp
     from app.routes.settings import settings_bp
+    from app.routes.jobs import jobs_bp
 
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(dashboard_bp, url_prefix='/')
@@ -60,6 +68,7 @@ def create_app(config_name='default'):
     app.register_blueprint(library_bp, url_prefix='/library')
     app.register_blueprint(reports_bp, url_prefix='/reports')
     app.register_blueprint(settings_bp, url_prefix='/settings')
+    app.register_blueprint(jobs_bp, url_prefix='/jobs')
 
     # Create upload directories (Will fail gracefully on Vercel's read-only FS)
     try:
@@ -69,14 +78,20 @@ def create_app(config_name='default'):
     except OSError:
         pass
 
+    def recent_announcements():
+        from app.models import Announcement
+        return [{'id': a.id, 'title': a.title, 'created_at': a.created_at}
+                for a in Announcement.query.filter_by(is_active=True).order_by(
+                    Announcement.created_at.desc()).limit(3)]
+
     @app.context_processor
     def inject_globals():
         from flask_login import current_user
-        from app.models import Announcement
         announcements = []
         try:
-            announcements = Announcement.query.filter_by(is_active=True).order_by(
-                Announcement.created_at.desc()).limit(3).all()
+            # Rendered on every page; cached until an announcement changes.
+            announcements = cache.get_or_set('announcements:recent', recent_announcements,
+                                             ttl=300, tags=('announcements',))
         except Exception:
             pass
         return dict(current_user=current_user, announcements=announcements)
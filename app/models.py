@@ -2,6 +2,7 @@ from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date
+from app.utils.helpers import get_current_academic_year
 
 
 # ─── User ───────────────────────────────────────────────────────────────────
@@ -33,9 +34,38 @@ class User(UserMixin, db.Model):
         return f'<User {self.username} [{self.role}]>'
 
 
+USER_CACHE_TTL = 300  # seconds; any commit to users invalidates sooner
+
+
+def _user_snapshot(user_id):
+    """Column values of a user, minus the password hash, for the cache."""
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    return {c.key: getattr(user, c.key) for c in User.__table__.columns
+            if c.key != 'password_hash'}
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """Rebuild the session user from a snapshot cached under the 'users'
+    tag instead of a query per request. Every commit that writes to users
+    bumps the tag, so a deactivation or role change applies on the user's
+    next request. The instance is attached without a load, so views can
+    still modify and commit current_user; password_hash loads on access."""
+    from sqlalchemy.orm import make_transient_to_detached
+    from app.utils.cache import cache
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    snapshot = cache.get_or_set(f'user:{user_id}', lambda: _user_snapshot(user_id),
+                                ttl=USER_CACHE_TTL, tags=('users',))
+    if snapshot is None:
+        return None
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
 
 # ─── Department ──────────────────────────────────────────────────────────────
@@ -141,6 +171,11 @@ class Student(db.Model):
     medical = db.relationship('MedicalRecord', backref='student', uselist=False)
     leave_applications = db.relationship('LeaveApplication', backref='student', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_students_status_class', 'status', 'class_section_id'),
+        db.Index('ix_students_admission_date', 'admission_date'),
+    )
+
     def __repr__(self):
         return f'<Student {self.reg_no} - {self.full_name}>'
 
@@ -210,9 +245,38 @@ class Attendance(db.Model):
     method = db.Column(db.String(30), default='manual')  # manual, face_recognition
     confidence = db.Column(db.Float)  # For face recognition
     remarks = db.Column(db.String(200))
+    # Set on rows an approved leave application wrote, so revoking it can undo
+    # them; previous_status is what a switched row held (NULL: leave created it).
+    leave_application_id = db.Column(db.Integer, db.ForeignKey('leave_applications.id'))
+    previous_status = db.Column(db.String(10))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint('student_id', 'date', name='unique_student_date'),)
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'date', name='unique_student_date'),
+        db.Index('ix_attendance_date_status', 'date', 'status'),
+        db.Index('ix_attendance_class_date', 'class_section_id', 'date'),
+        db.Index('ix_attendance_created', 'created_at', 'id'),  # analytics snapshots
+    )
+
+
+# ─── Daily Attendance Rollup ─────────────────────────────────────────────────
+
+class AttendanceDaily(db.Model):
+    """Per-day, per-class attendance counts, kept in step with Attendance
+    writes by app.utils.attendance.refresh_attendance_rollup so dashboards
+    never have to recount raw rows."""
+    __tablename__ = 'attendance_daily'
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    class_section_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = no class assigned
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    leave = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('date', 'class_section_id', name='unique_rollup_date_class'),)
 
 
 # ─── Teacher Attendance ──────────────────────────────────────────────────────
@@ -259,7 +323,7 @@ class FeeStructure(db.Model):
     amount = db.Column(db.Float, nullable=False)
     frequency = db.Column(db.String(20), default='monthly')  # monthly, quarterly, annual, one-time
     fee_type = db.Column(db.String(30), default='tuition')  # tuition, exam, library, transport, uniform, other
-    academic_year = db.Column(db.String(20), default='2024-25')
+    academic_year = db.Column(db.String(20), default=get_current_academic_year)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -288,6 +352,65 @@ class FeePayment(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_fee_payments_period_student', 'month', 'year', 'student_id'),
+        db.Index('ix_fee_payments_payment_date', 'payment_date'),
+        db.Index('ix_fee_payments_created', 'created_at', 'id'),  # analytics snapshots
+    )
+
+
+# ─── Fee Ledger ──────────────────────────────────────────────────────────────
+
+class FeeCharge(db.Model):
+    """A fee a student is expected to pay for a month, generated from the
+    active FeeStructure rows of the month's academic year by
+    app.utils.ledger.ensure_charges."""
+    __tablename__ = 'fee_charges'
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    fee_structure_id = db.Column(db.Integer, db.ForeignKey('fee_structure.id'), nullable=False)
+    period = db.Column(db.Integer, nullable=False)  # year * 12 + month - 1
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # 1-12
+    amount = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    student = db.relationship('Student')
+    fee_structure = db.relationship('FeeStructure')
+
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'fee_structure_id', 'period', name='unique_charge_period'),
+        db.Index('ix_fee_charges_period', 'period'),
+    )
+
+
+class FeeLedger(db.Model):
+    """Per-student, per-month totals of charges and payments. balance is the
+    running balance through this month (positive = owed). Kept in step by
+    app.utils.ledger; `flask fees-reconcile` checks it against the raw rows."""
+    __tablename__ = 'fee_ledger'
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    period = db.Column(db.Integer, nullable=False)  # year * 12 + month - 1
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # 1-12
+    charged = db.Column(db.Float, nullable=False, default=0)
+    paid = db.Column(db.Float, nullable=False, default=0)
+    balance = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    student = db.relationship('Student', backref=db.backref('ledger', lazy='dynamic'))
+
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'period', name='unique_ledger_student_period'),
+        db.Index('ix_fee_ledger_period_student', 'period', 'student_id'),
+    )
+
+    @property
+    def due(self):
+        """Unpaid part of this month's charges."""
+        return max(self.charged - self.paid, 0)
+
 
 # ─── Exam ────────────────────────────────────────────────────────────────────
 
@@ -339,6 +462,14 @@ class Mark(db.Model):
 
     subject = db.relationship('Subject', backref='marks')
 
+    __table_args__ = (
+        # An index rather than a UniqueConstraint so upgrade-db can add it to
+        # existing databases (after remove_duplicate_marks).
+        db.Index('uq_marks_student_exam_subject', 'student_id', 'exam_id', 'subject_id', unique=True),
+        db.Index('ix_marks_exam_subject', 'exam_id', 'subject_id'),
+        db.Index('ix_marks_created', 'created_at', 'id'),  # analytics snapshots
+    )
+
 
 # ─── Library Book ─────────────────────────────────────────────────────────────
 
@@ -378,6 +509,8 @@ class BookIssue(db.Model):
     returned_to = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.Index('ix_book_issues_status_due', 'status', 'due_date'),)
+
     @property
     def calculate_fine(self):
         if self.status == 'issued' and self.due_date and self.due_date < date.today():
@@ -503,3 +636,68 @@ class ActivityLog(db.Model):
     details = db.Column(db.Text)
     ip_address = db.Column(db.String(45))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ─── Number Sequence ──────────────────────────────────────────────────────────
+
+class NumberSequence(db.Model):
+    """Last number handed out per prefix, e.g. 'RCP-20250401-' -> 17.
+    Advanced by app.utils.helpers.next_number with an atomic UPDATE."""
+    __tablename__ = 'number_sequences'
+    prefix = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ─── PDF Cache ────────────────────────────────────────────────────────────────
+
+class PdfCacheEntry(db.Model):
+    """A cached receipt or result card, used when there is no writable
+    PDF_CACHE_FOLDER (see app.utils.pdf_cache)."""
+    __tablename__ = 'pdf_cache'
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of kind, version and data
+    kind = db.Column(db.String(30), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_pdf_cache_last_used', 'last_used_at'),
+    )
+
+
+# ─── Background Job ───────────────────────────────────────────────────────────
+
+class Job(db.Model):
+    """A queued export, batch PDF or report rebuild, run by `flask jobs-worker`."""
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, default='{}')  # JSON
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    result_path = db.Column(db.String(500))
+    result_name = db.Column(db.String(150))
+    result_mimetype = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref=db.backref('jobs', lazy='dynamic'))
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_id', 'status', 'id'),
+        db.Index('ix_jobs_user_status', 'created_by', 'status'),
+    )
+
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        return round(self.progress / self.total * 100) if self.total else 0
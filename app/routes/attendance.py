@@ -1,8 +1,11 @@
 from flask import (Blueprint, render_template, redirect, url_for, flash, request)
 from flask_login import login_required, current_user
-from app.models import (Attendance, Student, ClassSection, LeaveApplication,
+from app.models import (Attendance, Student, LeaveApplication,
                          TeacherAttendance, Teacher)
 from app.utils.decorators import staff_required
+from app.utils.attendance import (bulk_mark_attendance, mark_leave_attendance, clear_leave_attendance,
+                                  student_attendance_summary, EMPTY_COUNTS)
+from app.utils.reference import reference_data
 from app import db
 from datetime import date, timedelta, datetime
 from sqlalchemy import func
@@ -34,7 +37,7 @@ def index():
 @login_required
 @staff_required
 def mark():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     selected_class = request.args.get('class_id', '')
     att_date_str = request.args.get('date', date.today().isoformat())
     att_date_obj = parse_date(att_date_str)
@@ -53,27 +56,13 @@ def mark():
     if request.method == 'POST':
         class_id = request.form.get('class_id')
         mark_date = parse_date(request.form.get('att_date'), default=date.today())
-        all_students = Student.query.filter_by(class_section_id=class_id, status='active').all()
-        marked = 0
-        for student in all_students:
-            status = request.form.get(f'status_{student.id}', 'absent')
-            existing = Attendance.query.filter_by(
-                student_id=student.id, date=mark_date).first()
-            if existing:
-                existing.status = status
-                existing.marked_by = current_user.full_name
-                existing.method = 'manual'
-            else:
-                att = Attendance(
-                    student_id=student.id,
-                    class_section_id=int(class_id),
-                    date=mark_date,
-                    status=status,
-                    marked_by=current_user.full_name,
-                    method='manual',
-                )
-                db.session.add(att)
-            marked += 1
+        student_ids = [sid for (sid,) in db.session.query(Student.id).filter_by(
+            class_section_id=class_id, status='active')]
+        statuses = {
+            sid: request.form.get(f'status_{sid}', 'absent') for sid in student_ids
+        }
+        marked = bulk_mark_attendance(statuses, int(class_id), mark_date,
+                                      current_user.full_name)
         db.session.commit()
         flash(f'Attendance marked for {marked} students.', 'success')
         return redirect(url_for('attendance.mark', class_id=class_id, date=mark_date.isoformat()))
@@ -87,7 +76,7 @@ def mark():
 @attendance_bp.route('/report')
 @login_required
 def report():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     class_id = request.args.get('class_id', type=int)
 
     today = date.today()
@@ -107,19 +96,13 @@ def report():
     if class_id:
         students = Student.query.filter_by(
             class_section_id=class_id, status='active').order_by(Student.full_name).all()
+        summary = student_attendance_summary(start, end, class_section_id=class_id)
         for s in students:
-            recs = Attendance.query.filter(
-                Attendance.student_id == s.id,
-                Attendance.date >= start, Attendance.date <= end
-            ).all()
-            present = sum(1 for r in recs if r.status == 'present')
-            absent = sum(1 for r in recs if r.status == 'absent')
-            leave = sum(1 for r in recs if r.status == 'leave')
-            total = len(recs)
-            percentage = round((present / total * 100) if total else 0, 1)
+            counts = summary.get(s.id, EMPTY_COUNTS)
             report_data.append({
-                'student': s, 'present': present, 'absent': absent,
-                'leave': leave, 'total': total, 'percentage': percentage,
+                'student': s, 'present': counts['present'], 'absent': counts['absent'],
+                'leave': counts['leave'], 'total': counts['total'],
+                'percentage': counts['percentage'],
             })
 
     return render_template('attendance/report.html', report_data=report_data,
@@ -155,10 +138,15 @@ def leave():
 def approve_leave(id):
     leave_app = LeaveApplication.query.get_or_404(id)
     action = request.form.get('action', 'approve')
+    was_approved = leave_app.status == 'approved'
     leave_app.status = 'approved' if action == 'approve' else 'rejected'
     leave_app.approved_by = current_user.full_name
     leave_app.approved_at = datetime.utcnow()
     leave_app.remarks = request.form.get('remarks', '')
+    if leave_app.status == 'approved':
+        mark_leave_attendance(leave_app, current_user.full_name)
+    elif was_approved:
+        clear_leave_attendance(leave_app, current_user.full_name)
     db.session.commit()
     flash(f'Leave application {leave_app.status}.', 'success')
     return redirect(url_for('attendance.leave'))
\ No newline at end of file
@@ -1,37 +1,70 @@
-from flask import Blueprint, render_template, jsonify
+import json
+import queue
+import time
+from flask import Blueprint, Response, abort, current_app, render_template, jsonify, request
 from flask_login import login_required, current_user
-from app.models import (Student, Teacher, FeePayment, Attendance,
-                         ClassSection, LibraryBook, BookIssue, Exam,
+from app.models import (Student, Teacher, FeePayment, AttendanceDaily,
+                         LibraryBook, BookIssue, Exam,
                          Announcement, AcademicCalendar)
+from app.utils.attendance import daily_attendance_totals, EMPTY_COUNTS
+from app.utils.helpers import month_range, shift_month
+from app.utils.cache import cache
+from app.utils.events import broker
+from app.utils.reference import reference_data
 from app import db
 from datetime import date, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 dashboard_bp = Blueprint('dashboard', __name__, template_folder='../templates')
 
 
+STATS_TTL = 300  # seconds; commits to the tagged tables invalidate sooner
+STATS_TAGS = ('students', 'teachers', 'attendance_daily', 'fee_payments',
+              'book_issues', 'library_books', 'exams')
+
+
+def _count(model, *criteria):
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def _sum(column, *criteria):
+    return select(func.coalesce(func.sum(column), 0)).where(*criteria).scalar_subquery()
+
+
+@cache.memoize(ttl=STATS_TTL, tags=STATS_TAGS)
+def dashboard_stats(today):
+    """All dashboard counters in a single SELECT of scalar subqueries."""
+    month_start, month_end = month_range(today.year, today.month)
+    row = db.session.execute(select(
+        _count(Student, Student.status == 'active').label('total_students'),
+        _count(Teacher, Teacher.status == 'active').label('total_teachers'),
+        _sum(AttendanceDaily.present, AttendanceDaily.date == today).label('today_present'),
+        _sum(AttendanceDaily.total, AttendanceDaily.date == today).label('today_total'),
+        _sum(FeePayment.total_paid, FeePayment.payment_date >= month_start,
+             FeePayment.payment_date < month_end).label('month_fees'),
+        _count(BookIssue, BookIssue.status == 'issued').label('books_issued'),
+        _count(LibraryBook).label('total_books'),
+        _count(Exam, Exam.is_active == True).label('active_exams'),
+    )).one()
+    return {
+        'total_students': row.total_students,
+        'total_teachers': row.total_teachers,
+        'today_present': row.today_present,
+        'today_total': row.today_total,
+        'today_attendance_pct': round(
+            (row.today_present / row.today_total * 100) if row.today_total else 0, 1),
+        'month_fees': float(row.month_fees),
+        'books_issued': row.books_issued,
+        'total_books': row.total_books,
+        'active_exams': row.active_exams,
+    }
+
+
 @dashboard_bp.route('/')
 @login_required
 def index():
-    # Core stats
-    total_students = Student.query.filter_by(status='active').count()
-    total_teachers = Teacher.query.filter_by(status='active').count()
-
-    # Today's attendance
     today = date.today()
-    today_present = Attendance.query.filter_by(date=today, status='present').count()
-    today_total = Attendance.query.filter_by(date=today).count()
-    today_attendance_pct = round((today_present / today_total * 100) if today_total else 0, 1)
-
-    # Monthly fee collection
-    month_fees = db.session.query(func.sum(FeePayment.total_paid)).filter(
-        func.extract('month', FeePayment.payment_date) == today.month,
-        func.extract('year', FeePayment.payment_date) == today.year
-    ).scalar() or 0
-
-    # Library stats
-    books_issued = BookIssue.query.filter_by(status='issued').count()
-    total_books = LibraryBook.query.count()
+    stats = dashboard_stats(today)
 
     # Upcoming events
     upcoming_events = AcademicCalendar.query.filter(
@@ -42,87 +75,167 @@ def index():
     announcements = Announcement.query.filter_by(is_active=True).order_by(
         Announcement.created_at.desc()).limit(5).all()
 
-    # Active exams
-    active_exams = Exam.query.filter_by(is_active=True).count()
-
-    stats = {
-        'total_students': total_students,
-        'total_teachers': total_teachers,
-        'today_attendance_pct': today_attendance_pct,
-        'month_fees': month_fees,
-        'books_issued': books_issued,
-        'total_books': total_books,
-        'active_exams': active_exams,
-    }
-
     return render_template('dashboard/index.html',
                            stats=stats,
+                           live_stream=current_app.config['DASHBOARD_STREAM'],
+                           poll_seconds=current_app.config['DASHBOARD_POLL_SECONDS'],
                            upcoming_events=upcoming_events,
                            announcements=announcements,
                            today=today)
 
 
+@dashboard_bp.route('/api/stats')
+@login_required
+def stats_data():
+    """Absolute counter values; the live stream resyncs from here."""
+    today = date.today()
+    return jsonify(dict(dashboard_stats(today), date=today.isoformat()))
+
+
+STREAM_HEARTBEAT = 15   # seconds between keep-alive comments
+STREAM_LIFETIME = 300   # seconds before the server closes; EventSource reconnects
+
+
+def _sse(event_name, data):
+    return f'event: {event_name}\ndata: {json.dumps(data)}\n\n'
+
+
+@dashboard_bp.route('/api/stream')
+@login_required
+def stream():
+    """Server-sent events: counter deltas as attendance, fee and library
+    writes commit in this worker. Streams are capped at STREAM_LIFETIME so a
+    connection cannot hold a worker thread indefinitely, and at
+    DASHBOARD_STREAM_MAX per worker; past that, or with DASHBOARD_STREAM
+    off, the client polls /api/stats instead."""
+    if not current_app.config['DASHBOARD_STREAM']:
+        abort(404)
+    subscription = broker.subscribe(limit=current_app.config['DASHBOARD_STREAM_MAX'])
+    if subscription is None:
+        response = Response('Too many live streams; poll /api/stats instead.\n',
+                            status=503, mimetype='text/plain')
+        response.headers['Retry-After'] = str(current_app.config['DASHBOARD_POLL_SECONDS'])
+        return response
+
+    def generate():
+        deadline = time.monotonic() + STREAM_LIFETIME
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    event_name, data = subscription.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield _sse(event_name, data)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    # Also frees the slot when the client goes away before the first event.
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+CHART_MAX_AGE = 60  # seconds the browser may reuse chart data without asking
+
+
+def _chart_response(payload):
+    """JSON chart data with a content ETag, so an unchanged series comes
+    back as a bodiless 304 instead of being refetched."""
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers['Cache-Control'] = f'private, max-age={CHART_MAX_AGE}'
+    return response.make_conditional(request)
+
+
+def _month_buckets(today, months):
+    """(year, month) for the last `months` calendar months, oldest first."""
+    return [shift_month(today.year, today.month, -i) for i in range(months - 1, -1, -1)]
+
+
+def _monthly_totals(column, value, months, today):
+    """{(year, month): aggregate} over calendar months, in one GROUP BY."""
+    first = _month_buckets(today, months)[0]
+    start, _ = month_range(*first)
+    _, end = month_range(today.year, today.month)
+    year_col = func.extract('year', column)
+    month_col = func.extract('month', column)
+    rows = db.session.query(year_col, month_col, value).filter(
+        column >= start, column < end
+    ).group_by(year_col, month_col)
+    return {(int(y), int(m)): total for y, m, total in rows}
+
+
 @dashboard_bp.route('/api/enrollment-data')
 @login_required
 def enrollment_data():
-    """Chart.js: monthly enrollment trend (last 6 months)"""
+    """Chart.js: monthly enrollment trend (?months=1-12, default 6)"""
     today = date.today()
-    labels = []
-    data = []
-    for i in range(5, -1, -1):
-        d = today.replace(day=1) - timedelta(days=i * 30)
-        month_name = d.strftime('%b %Y')
-        count = Student.query.filter(
-            func.extract('month', Student.admission_date) == d.month,
-            func.extract('year', Student.admission_date) == d.year
-        ).count()
-        labels.append(month_name)
-        data.append(count)
-    return jsonify({'labels': labels, 'data': data})
+    months = min(max(request.args.get('months', 6, type=int), 1), 12)
+
+    def build():
+        counts = _monthly_totals(Student.admission_date, func.count(Student.id), months, today)
+        buckets = _month_buckets(today, months)
+        return {
+            'labels': [date(y, m, 1).strftime('%b %Y') for y, m in buckets],
+            'data': [counts.get(b, 0) for b in buckets],
+        }
+    return _chart_response(cache.get_or_set(
+        f'dashboard:chart:enrollment:{today.isoformat()}:{months}', build,
+        ttl=STATS_TTL, tags=('students',)))
 
 
 @dashboard_bp.route('/api/attendance-data')
 @login_required
 def attendance_data():
-    """Chart.js: attendance last 7 days"""
+    """Chart.js: daily attendance (?days=7-366, default 7)"""
     today = date.today()
-    labels = []
-    present_data = []
-    absent_data = []
-    for i in range(6, -1, -1):
-        d = today - timedelta(days=i)
-        labels.append(d.strftime('%a %d'))
-        present = Attendance.query.filter_by(date=d, status='present').count()
-        absent = Attendance.query.filter_by(date=d, status='absent').count()
-        present_data.append(present)
-        absent_data.append(absent)
-    return jsonify({'labels': labels, 'present': present_data, 'absent': absent_data})
+    days = min(max(request.args.get('days', 7, type=int), 7), 366)
+
+    def build():
+        totals = daily_attendance_totals(today - timedelta(days=days - 1), today)
+        label_fmt = '%a %d' if days <= 14 else '%d %b'
+        series = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+        return {
+            'labels': [d.strftime(label_fmt) for d in series],
+            'present': [totals.get(d, EMPTY_COUNTS)['present'] for d in series],
+            'absent': [totals.get(d, EMPTY_COUNTS)['absent'] for d in series],
+        }
+    return _chart_response(cache.get_or_set(
+        f'dashboard:chart:attendance:{today.isoformat()}:{days}', build,
+        ttl=STATS_TTL, tags=('attendance_daily',)))
 
 
 @dashboard_bp.route('/api/fees-data')
 @login_required
 def fees_data():
-    """Chart.js: fee collection last 6 months"""
+    """Chart.js: fee collection per calendar month (?months=1-12, default 6)"""
     today = date.today()
-    labels = []
-    data = []
-    for i in range(5, -1, -1):
-        d = today.replace(day=1) - timedelta(days=i * 30)
-        total = db.session.query(func.sum(FeePayment.total_paid)).filter(
-            func.extract('month', FeePayment.payment_date) == d.month,
-            func.extract('year', FeePayment.payment_date) == d.year
-        ).scalar() or 0
-        labels.append(d.strftime('%b'))
-        data.append(float(total))
-    return jsonify({'labels': labels, 'data': data})
+    months = min(max(request.args.get('months', 6, type=int), 1), 12)
+
+    def build():
+        totals = _monthly_totals(FeePayment.payment_date, func.sum(FeePayment.total_paid),
+                                 months, today)
+        buckets = _month_buckets(today, months)
+        return {
+            'labels': [date(y, m, 1).strftime('%b') for y, m in buckets],
+            'data': [float(totals.get(b) or 0) for b in buckets],
+        }
+    return _chart_response(cache.get_or_set(
+        f'dashboard:chart:fees:{today.isoformat()}:{months}', build,
+        ttl=STATS_TTL, tags=('fee_payments',)))
 
 
 @dashboard_bp.route('/api/class-stats')
 @login_required
 def class_stats():
     """Students per class for doughnut chart"""
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
+    counts = dict(db.session.query(Student.class_section_id, func.count(Student.id)).filter(
+        Student.status == 'active').group_by(Student.class_section_id).all())
     labels = [cs.display_name for cs in classes]
-    data = [Student.query.filter_by(class_section_id=cs.id, status='active').count()
-            for cs in classes]
-    return jsonify({'labels': labels, 'data': data})
+    data = [counts.get(cs.id, 0) for cs in classes]
+    return _chart_response({'labels': labels, 'data': data})
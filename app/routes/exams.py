@@ -1,11 +1,16 @@
 from flask import (Blueprint, render_template, redirect, url_for, flash,
-                   request, make_response)
+                   request, make_response, Response, stream_with_context, jsonify)
 from flask_login import login_required, current_user
-from app.models import Exam, ExamSubject, Mark, Student, ClassSection, Subject
-from app.utils.decorators import staff_required
-from app.utils.helpers import calculate_grade_from_marks, paginate_query
+from app.models import Exam, ExamSubject, Mark, Student
+from app.utils.decorators import staff_required, STAFF_ROLES
+from app.utils.helpers import paginate_query
+from app.utils.marks import save_subject_marks
+from app.utils.reference import reference_data
+from app.utils.exporter import iter_zip
+from app.utils.jobs import job_handler
 from app import db
 from datetime import date, datetime
+from werkzeug.utils import secure_filename
 
 exams_bp = Blueprint('exams', __name__, template_folder='../templates')
 
@@ -27,7 +32,7 @@ def parse_date(value, default=None):
 @login_required
 def list_exams():
     exams = Exam.query.order_by(Exam.created_at.desc()).all()
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     return render_template('exams/list.html', exams=exams, classes=classes)
 
 
@@ -35,7 +40,7 @@ def list_exams():
 @login_required
 @staff_required
 def add_exam():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     if request.method == 'POST':
         exam = Exam(
             name=request.form.get('name'),
@@ -57,7 +62,7 @@ def add_exam():
 @staff_required
 def exam_subjects(exam_id):
     exam = Exam.query.get_or_404(exam_id)
-    subjects = Subject.query.filter_by(is_active=True).all()
+    subjects = reference_data().subjects
     if request.method == 'POST':
         subject_id = request.form.get('subject_id')
         total_marks = int(request.form.get('total_marks', 100))
@@ -107,31 +112,13 @@ def enter_marks(exam_id):
     if request.method == 'POST':
         sub_id = int(request.form.get('subject_id'))
         sub_total = int(request.form.get('total_marks', 100))
-        saved = 0
+        obtained = {}
         for student in students:
-            marks_str = request.form.get(f'marks_{student.id}', '')
-            if marks_str == '':
-                continue
-            obtained = float(marks_str)
-            grade, pct = calculate_grade_from_marks(obtained, sub_total)
-            existing = Mark.query.filter_by(
-                student_id=student.id, exam_id=exam_id, subject_id=sub_id).first()
-            if existing:
-                existing.obtained_marks = obtained
-                existing.grade = grade
-                existing.entered_by = current_user.full_name
-            else:
-                mark = Mark(
-                    student_id=student.id,
-                    exam_id=exam_id,
-                    subject_id=sub_id,
-                    obtained_marks=obtained,
-                    total_marks=sub_total,
-                    grade=grade,
-                    entered_by=current_user.full_name,
-                )
-                db.session.add(mark)
-            saved += 1
+            try:
+                obtained[student.id] = float(request.form.get(f'marks_{student.id}', ''))
+            except ValueError:
+                continue  # left blank or not a number
+        saved = save_subject_marks(exam_id, sub_id, obtained, sub_total, current_user.full_name)
         db.session.commit()
         flash(f'Marks saved for {saved} students.', 'success')
         return redirect(url_for('exams.enter_marks', exam_id=exam_id, subject_id=sub_id))
@@ -149,60 +136,114 @@ def enter_marks(exam_id):
 @exams_bp.route('/<int:exam_id>/results')
 @login_required
 def results(exam_id):
+    from app.utils.results import exam_results
     exam = Exam.query.get_or_404(exam_id)
-    exam_subs = ExamSubject.query.filter_by(exam_id=exam_id).all()
+    report = exam_results(exam)
+    return render_template('exams/results.html', exam=exam, subjects=report['subjects'],
+                           results=report['results'], result_summary=report['summary'])
 
-    if exam.class_section_id:
-        students = Student.query.filter_by(
-            class_section_id=exam.class_section_id, status='active').order_by(Student.full_name).all()
-    else:
-        students = Student.query.filter_by(status='active').order_by(Student.full_name).all()
 
-    results_data = []
-    for student in students:
-        student_marks = Mark.query.filter_by(student_id=student.id, exam_id=exam_id).all()
-        total_obtained = sum(m.obtained_marks for m in student_marks)
-        total_possible = sum(es.total_marks for es in exam_subs)
-        pct = round((total_obtained / total_possible * 100) if total_possible else 0, 1)
-        grade, _ = calculate_grade_from_marks(total_obtained, total_possible)
-        results_data.append({
-            'student': student, 'marks': {m.subject_id: m for m in student_marks},
-            'total_obtained': total_obtained, 'total_possible': total_possible,
-            'percentage': pct, 'grade': grade,
-        })
-    results_data.sort(key=lambda x: x['total_obtained'], reverse=True)
-    return render_template('exams/results.html', exam=exam, exam_subs=exam_subs,
-                           results_data=results_data)
+@exams_bp.route('/<int:exam_id>/statistics')
+@login_required
+def statistics(exam_id):
+    """Subject statistics, grade distribution and merit list of an exam"""
+    from app.utils.exam_stats import exam_statistics
+    exam = Exam.query.get_or_404(exam_id)
+    return render_template('exams/statistics.html', exam=exam, stats=exam_statistics(exam))
+
+
+@exams_bp.route('/<int:exam_id>/api/statistics')
+@login_required
+def statistics_data(exam_id):
+    """The statistics page's data as JSON, with a content ETag"""
+    from app.utils.exam_stats import exam_statistics
+    exam = Exam.query.get_or_404(exam_id)
+    response = jsonify(exam_statistics(exam))
+    response.add_etag()
+    # Revalidate every time: marks can still be corrected.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 
 @exams_bp.route('/<int:exam_id>/result/<int:student_id>/pdf')
 @login_required
 def result_pdf(exam_id, student_id):
+    from app.utils.batch_pdf import result_card_items
     exam = Exam.query.get_or_404(exam_id)
     student = Student.query.get_or_404(student_id)
-    exam_subs = ExamSubject.query.filter_by(exam_id=exam_id).all()
-
-    subject_marks = []
-    for es in exam_subs:
-        mark = Mark.query.filter_by(
-            student_id=student_id, exam_id=exam_id, subject_id=es.subject_id).first()
-        if mark:
-            subject_marks.append({
-                'subject_name': es.subject.name if es.subject else 'Subject',
-                'obtained': mark.obtained_marks,
-                'total': mark.total_marks,
-                'grade': mark.grade or 'N/A',
-            })
+    items = result_card_items(exam, student_id=student.id)
+    data = items[0][1] if items else None
 
     try:
-        from app.utils.pdf_generator import generate_result_card
-        pdf_bytes = generate_result_card(student, exam, subject_marks)
-        if pdf_bytes:
-            response = make_response(pdf_bytes)
-            response.headers['Content-Type'] = 'application/pdf'
-            response.headers['Content-Disposition'] = (
-                f'inline; filename=result_{student.reg_no}_{exam_id}.pdf')
-            return response
+        from app.utils.pdf_generator import result_card_data, REPORTLAB_AVAILABLE
+        from app.utils.pdf_cache import pdf_response
+        if REPORTLAB_AVAILABLE:
+            return pdf_response('result_card', data or result_card_data(student, exam, []),
+                                f'result_{student.reg_no}_{exam_id}.pdf')
     except Exception as e:
         flash(f'Could not generate PDF: {str(e)}', 'warning')
     return redirect(url_for('exams.results', exam_id=exam_id))
+
+
+def _result_card_name(exam, class_id):
+    classes = reference_data().classes_by_id
+    label = classes[class_id].display_name if class_id in classes else 'all_classes'
+    return secure_filename(f'result_cards_{exam.name}_{label}_{exam.id}')
+
+
+@exams_bp.route('/<int:exam_id>/result-cards')
+@login_required
+@staff_required
+def result_cards(exam_id):
+    """Every result card of the exam (optionally one class) as a ZIP or one PDF"""
+    from app.utils.pdf_generator import REPORTLAB_AVAILABLE
+    from app.utils.batch_pdf import batch_files, render_one_pdf, result_card_items
+    exam = Exam.query.get_or_404(exam_id)
+    if not REPORTLAB_AVAILABLE:
+        flash('PDF generation is not available (ReportLab is not installed).', 'warning')
+        return redirect(url_for('exams.results', exam_id=exam_id))
+    class_id = request.args.get('class_id', type=int)
+    items = result_card_items(exam, class_id)
+    if not items:
+        flash('No marks entered for this exam yet.', 'info')
+        return redirect(url_for('exams.results', exam_id=exam_id))
+
+    name = _result_card_name(exam, class_id)
+    if request.args.get('output') == 'pdf':
+        response = make_response(render_one_pdf('result_card', [data for _, data in items]))
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}.pdf"'
+        return response
+    response = Response(stream_with_context(iter_zip(batch_files('result_card', items))),
+                        mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.zip"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ─── Background Jobs ─────────────────────────────────────────
+
+@job_handler('result_cards', 'Result cards for an exam (ZIP or one PDF)', roles=STAFF_ROLES)
+def result_cards_job(ctx, exam_id, class_id=None, output='zip'):
+    """The result card of every student with marks in the exam."""
+    from app.utils.pdf_generator import REPORTLAB_AVAILABLE
+    from app.utils.batch_pdf import batch_files, render_one_pdf, result_card_items
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError('ReportLab is not installed on the worker.')
+    exam = db.session.get(Exam, int(exam_id))
+    if exam is None:
+        raise ValueError(f'Exam {exam_id} no longer exists.')
+    class_id = int(class_id) if class_id else None
+    items = result_card_items(exam, class_id)
+    if not items:
+        raise ValueError('No marks entered for this exam yet.')
+
+    name = _result_card_name(exam, class_id)
+    if output == 'pdf':
+        ctx.progress(0, len(items), f'Rendering {len(items)} pages', force=True)
+        ctx.write_result(f'{name}.pdf', [render_one_pdf('result_card', [d for _, d in items])],
+                         'application/pdf')
+        ctx.progress(len(items), force=True)
+        return
+    files = ctx.track(batch_files('result_card', items), len(items), 'Rendering result cards')
+    ctx.write_result(f'{name}.zip', iter_zip(files), 'application/zip')
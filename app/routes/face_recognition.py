@@ -1,8 +1,10 @@
 import os
 from flask import (Blueprint, render_template, request, jsonify, current_app, flash, redirect, url_for)
 from flask_login import login_required, current_user
-from app.models import Student, Attendance, ClassSection
+from app.models import Student, Attendance
 from app.utils.decorators import staff_required
+from app.utils.attendance import refresh_attendance_rollup
+from app.utils.reference import reference_data
 from app import db
 from datetime import date
 
@@ -64,7 +66,7 @@ def register_api():
 @login_required
 @staff_required
 def mark():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     engine = get_engine()
     available = engine.is_available()
     return render_template('face_recognition/mark.html', classes=classes, available=available)
@@ -86,6 +88,7 @@ def mark_api():
 
     results = engine.recognize_faces(image_b64)
     marked = []
+    touched = set()
     detections = []  # every detected face, known or not - for drawing boxes
     today = date.today()
 
@@ -119,6 +122,7 @@ def mark_api():
                 confidence=r['confidence'],
             )
             db.session.add(att)
+            touched.add((today, student.class_section_id))
             marked.append({'name': student.full_name, 'confidence': r['confidence'],
                            'reg_no': student.reg_no,
                            'class_name': student.class_section.display_name if student.class_section else '—'})
@@ -127,6 +131,7 @@ def mark_api():
             'class_name': student.class_section.display_name if student.class_section else '—',
             'confidence': r['confidence'],
         })
+    refresh_attendance_rollup(touched)
     db.session.commit()
     return jsonify({'success': True, 'marked': marked, 'recognized': len(results),
                     'detections': detections})
@@ -158,6 +163,7 @@ def live_frame():
     results = engine.process_live_frame(frame_b64)
     today = date.today()
     response_results = []
+    touched = set()
 
     for r in results:
         loc = r['location']
@@ -192,6 +198,7 @@ def live_frame():
                 confidence=r['confidence'],
             )
             db.session.add(att)
+            touched.add((today, student.class_section_id))
         response_results.append({
             'name': student.full_name,
             'reg_no': student.reg_no,
@@ -202,5 +209,6 @@ def live_frame():
             'location': loc,
         })
 
+    refresh_attendance_rollup(touched)
     db.session.commit()
     return jsonify({'results': response_results, 'available': True})
@@ -1,11 +1,18 @@
 from flask import (Blueprint, render_template, redirect, url_for, flash,
-                   request, send_file, make_response)
+                   request, send_file, make_response, Response, stream_with_context)
 from flask_login import login_required, current_user
-from app.models import FeePayment, FeeStructure, Student, ClassSection
-from app.utils.helpers import generate_receipt_no, paginate_query
+from app.models import FeePayment, FeeStructure, Student
+from app.utils.helpers import (generate_receipt_no, paginate_query, paginate_list,
+                               get_current_academic_year)
 from app.utils.decorators import role_required
+from app.utils.events import record_counter_delta
+from app.utils.reference import reference_data
+from app.utils.exporter import iter_zip
+from app.utils.jobs import job_handler
+from app.utils import ledger
 from app import db
 from datetime import date, datetime
+from werkzeug.utils import secure_filename
 import io
 
 fees_bp = Blueprint('fees', __name__, template_folder='../templates')
@@ -48,7 +55,7 @@ def add_structure():
         amount=float(request.form.get('amount', 0) or 0),
         frequency=request.form.get('frequency', 'monthly'),
         fee_type=request.form.get('fee_type', 'tuition'),
-        academic_year=request.form.get('academic_year', '2024-25'),
+        academic_year=request.form.get('academic_year') or get_current_academic_year(),
     )
     db.session.add(fs)
     db.session.commit()
@@ -86,7 +93,7 @@ def payments():
 
     pagination = paginate_query(query.order_by(FeePayment.id.desc()), page, 15)
     from app.utils.helpers import get_months
-    total_collected = db.session.query(db.func.sum(FeePayment.total_paid)).scalar() or 0
+    total_collected = ledger.total_collected()
     return render_template('fees/payments.html', payments=pagination.items,
                            pagination=pagination, search=search,
                            month_filter=month_filter, months=get_months(),
@@ -98,7 +105,7 @@ def payments():
 @role_required('admin', 'principal', 'accountant', 'receptionist')
 def record_payment():
     students = Student.query.filter_by(status='active').order_by(Student.full_name).all()
-    fee_structures = FeeStructure.query.filter_by(is_active=True).all()
+    fee_structures = reference_data().fee_structures
     if request.method == 'POST':
         amount = float(request.form.get('amount', 0) or 0)
         discount = float(request.form.get('discount', 0) or 0)
@@ -120,6 +127,10 @@ def record_payment():
             notes=request.form.get('notes'),
         )
         db.session.add(payment)
+        ledger.post_payment(payment)
+        today = date.today()
+        if (payment.payment_date.year, payment.payment_date.month) == (today.year, today.month):
+            record_counter_delta(month_fees=payment.total_paid)
         db.session.commit()
         flash(f'Payment recorded. Receipt No: {payment.receipt_no}', 'success')
         return redirect(url_for('fees.download_receipt', id=payment.id))
@@ -134,54 +145,168 @@ def record_payment():
 def download_receipt(id):
     payment = FeePayment.query.get_or_404(id)
     try:
-        from app.utils.pdf_generator import generate_fee_receipt
-        pdf_bytes = generate_fee_receipt(payment)
-        if pdf_bytes:
-            response = make_response(pdf_bytes)
-            response.headers['Content-Type'] = 'application/pdf'
-            response.headers['Content-Disposition'] = f'inline; filename=receipt_{payment.receipt_no}.pdf'
-            return response
+        from app.utils.pdf_generator import receipt_data, REPORTLAB_AVAILABLE
+        from app.utils.pdf_cache import pdf_response
+        if REPORTLAB_AVAILABLE:
+            return pdf_response('receipt', receipt_data(payment),
+                                f'receipt_{payment.receipt_no}.pdf')
     except Exception as e:
         flash(f'Could not generate PDF: {str(e)}', 'warning')
     return redirect(url_for('fees.payments'))
 
 
+def parse_month(value, default):
+    """Parse a 'YYYY-MM' query arg into a ledger period."""
+    try:
+        d = datetime.strptime(value, '%Y-%m')
+        return ledger.period_of(d.year, d.month)
+    except (ValueError, TypeError):
+        return default
+
+
+BATCH_DOCUMENTS = {'voucher': 'Fee vouchers', 'receipt': 'Fee receipts'}
+
+
+def _batch_items(document, period, class_id):
+    """Load the data for a batch. Vouchers list the charges that have
+    been generated for the month; printing never generates them."""
+    from app.utils.batch_pdf import BATCH_ITEMS
+    return BATCH_ITEMS[document](period // 12, period % 12 + 1, class_id)
+
+
+def _nothing_to_print(document, period):
+    message = f'No {BATCH_DOCUMENTS[document].lower()} for {ledger.period_label(period)}.'
+    if document == 'voucher':
+        message += ' Generate the month\'s fee charges first.'
+    return message
+
+
+def _batch_name(document, period, class_id):
+    classes = reference_data().classes_by_id
+    label = classes[class_id].display_name if class_id in classes else 'all_classes'
+    return secure_filename(f'{document}s_{label}_{period // 12}-{period % 12 + 1:02d}')
+
+
+@fees_bp.route('/batch')
+@login_required
+@role_required('admin', 'principal', 'accountant')
+def batch():
+    """Vouchers or receipts of one month for a whole class, as a ZIP or one PDF"""
+    from app.utils.pdf_generator import REPORTLAB_AVAILABLE
+    from app.utils.batch_pdf import batch_files, render_one_pdf
+    today = date.today()
+    classes = reference_data().classes
+    if 'class_id' not in request.args:
+        return render_template('fees/batch.html', classes=classes, documents=BATCH_DOCUMENTS,
+                               month=f'{today.year}-{today.month:02d}')
+    document = request.args.get('document')
+    class_id = request.args.get('class_id', type=int)
+    period = parse_month(request.args.get('month'), None)
+    if document not in BATCH_DOCUMENTS or not class_id or period is None:
+        flash('Choose a document, a class and a month.', 'warning')
+        return redirect(url_for('fees.batch'))
+    if not REPORTLAB_AVAILABLE:
+        flash('PDF generation is not available (ReportLab is not installed).', 'warning')
+        return redirect(url_for('fees.batch'))
+    items = _batch_items(document, period, class_id)
+    if not items:
+        flash(_nothing_to_print(document, period), 'info')
+        return redirect(url_for('fees.batch'))
+
+    name = _batch_name(document, period, class_id)
+    if request.args.get('output') == 'pdf':
+        response = make_response(render_one_pdf(document, [data for _, data in items]))
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}.pdf"'
+        return response
+    response = Response(stream_with_context(iter_zip(batch_files(document, items))),
+                        mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.zip"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ─── Background Jobs ─────────────────────────────────────────
+
+@job_handler('fee_documents', 'Fee vouchers or receipts for a month',
+             roles=('admin', 'principal', 'accountant'))
+def fee_documents_job(ctx, month, document='voucher', class_id=None, output='zip'):
+    """A month's vouchers or receipts for one class or every class."""
+    from app.utils.pdf_generator import REPORTLAB_AVAILABLE
+    from app.utils.batch_pdf import batch_files, render_one_pdf
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError('ReportLab is not installed on the worker.')
+    period = parse_month(month, None)
+    if document not in BATCH_DOCUMENTS or period is None:
+        raise ValueError('Choose a document and a month.')
+    class_id = int(class_id) if class_id else None
+    items = _batch_items(document, period, class_id)
+    if not items:
+        raise ValueError(_nothing_to_print(document, period))
+
+    name = _batch_name(document, period, class_id)
+    if output == 'pdf':
+        ctx.progress(0, len(items), f'Rendering {len(items)} pages', force=True)
+        ctx.write_result(f'{name}.pdf', [render_one_pdf(document, [d for _, d in items])],
+                         'application/pdf')
+        ctx.progress(len(items), force=True)
+        return
+    files = ctx.track(batch_files(document, items), len(items), 'Rendering PDFs')
+    ctx.write_result(f'{name}.zip', iter_zip(files), 'application/zip')
+
+
+@job_handler('fee_charges', "Generate a month's fee charges", roles=('admin',))
+def fee_charges_job(ctx, month):
+    """Charge every active student for a month from the fee structures in
+    force in it, like `flask fees-generate-charges`."""
+    period = parse_month(month, None)
+    if period is None:
+        raise ValueError('Choose a month.')
+    today = date.today()
+    if period > ledger.period_of(today.year, today.month):
+        raise ValueError('Charges can be generated once the month has started.')
+    year, month_no = period // 12, period % 12 + 1
+    if not ledger.charging_structures(year, month_no):
+        raise ValueError(f'No active fee structure bills in {ledger.period_label(period)}.')
+    ctx.progress(0, 1, f'Charging {ledger.period_label(period)}', force=True)
+    charged = ledger.ensure_charges(year, month_no)
+    db.session.commit()
+    ctx.progress(1, 1, f'{len(charged)} students charged for {ledger.period_label(period)}', force=True)
+
+
 @fees_bp.route('/defaulters')
 @login_required
 def defaulters():
-    """Students with unpaid fees"""
-    classes = ClassSection.query.filter_by(is_active=True).all()
-    class_id = request.args.get('class_id', '')
+    """Students in arrears over a range of months, with ageing buckets"""
+    classes = reference_data().classes
+    class_id = request.args.get('class_id', '', type=str)
+    page = request.args.get('page', 1, type=int)
     today = date.today()
-    month = request.args.get('month', today.strftime('%B'))
-    year = request.args.get('year', str(today.year))
-
-    paid_ids = db.session.query(FeePayment.student_id).filter(
-        FeePayment.month == month,
-        FeePayment.year == int(year)
-    ).scalar_subquery()
+    current = ledger.period_of(today.year, today.month)
+    # Default range: the academic year so far (it starts in April).
+    year_start = ledger.period_of(today.year if today.month >= 4 else today.year - 1, 4)
+    if request.args.get('month') in ledger.MONTH_NUMBERS:  # single-month links
+        year = request.args.get('year', today.year, type=int)
+        since = until = ledger.period_of(year, ledger.MONTH_NUMBERS[request.args['month']])
+    else:
+        until = min(parse_month(request.args.get('to'), current), current)
+        since = min(parse_month(request.args.get('from'), year_start), until)
 
-    query = Student.query.filter(
-        Student.status == 'active',
-        ~Student.id.in_(paid_ids)
-    )
-    if class_id:
-        query = query.filter_by(class_section_id=int(class_id))
-
-    defaulter_students = query.order_by(Student.full_name).all()
-
-    # Estimate expected fee: each defaulter's class's monthly tuition fee.
-    tuition_by_class = {
-        fs.class_name: fs.amount
-        for fs in FeeStructure.query.filter_by(fee_type='tuition', is_active=True).all()
-    }
-    defaulters = [
-        (s, tuition_by_class.get(s.class_section.class_name, 0) if s.class_section else 0)
-        for s in defaulter_students
-    ]
-    total_pending = sum(expected for _, expected in defaulters)
+    # Read-only: viewing arrears never generates charges; months are charged
+    # explicitly (`flask fees-generate-charges`); a student not yet charged
+    # for the last month of the range owes an estimate from class tuition.
+    report = ledger.arrears_report(since, until, int(class_id) if class_id.isdigit() else None)
+    pagination = paginate_list(report['rows'], page, 25)
+    students = {s.id: s for s in Student.query.options(
+        db.joinedload(Student.class_section)).filter(
+        Student.id.in_([r.student_id for r in pagination.items]))}
+    defaulters = [(students[r.student_id], r) for r in pagination.items
+                  if r.student_id in students]
 
     return render_template('fees/defaulters.html', defaulters=defaulters,
-                           classes=classes, class_id=class_id,
-                           month=month, year=year, today=today,
-                           total_pending=total_pending)
\ No newline at end of file
+                           pagination=pagination, totals=report['totals'],
+                           estimated=report['estimated'],
+                           classes=classes, class_id=class_id, today=today,
+                           since=since, until=until, period_label=ledger.period_label,
+                           from_month=f'{since // 12}-{since % 12 + 1:02d}',
+                           to_month=f'{until // 12}-{until % 12 + 1:02d}')
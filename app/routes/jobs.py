@@ -0,0 +1,84 @@
+import os
+from datetime import date
+from flask import (Blueprint, render_template, redirect, url_for, flash, request,
+                   jsonify, send_file, abort)
+from flask_login import login_required, current_user
+from app.models import Job, Exam
+from app.utils.decorators import staff_required
+from app.utils.jobs import JOB_HANDLERS, JobLimitError, enqueue_job
+from app.utils.reference import reference_data
+from app import db
+
+jobs_bp = Blueprint('jobs', __name__, template_folder='../templates')
+
+
+def _visible_jobs():
+    query = Job.query
+    if current_user.role != 'admin':
+        query = query.filter(Job.created_by == current_user.id)
+    return query
+
+
+def _job_or_404(job_id):
+    job = _visible_jobs().filter(Job.id == job_id).first()
+    if job is None:
+        abort(404)
+    return job
+
+
+@jobs_bp.route('/')
+@login_required
+@staff_required
+def list_jobs():
+    jobs = _visible_jobs().order_by(Job.id.desc()).limit(50).all()
+    handlers = [h for h in JOB_HANDLERS.values() if h.allowed_for(current_user)]
+    exams = Exam.query.order_by(Exam.created_at.desc()).all()
+    labels = {kind: h.label for kind, h in JOB_HANDLERS.items()}
+    return render_template('jobs/list.html', jobs=jobs, handlers=handlers, exams=exams,
+                           labels=labels, classes=reference_data().classes,
+                           this_month=date.today().strftime('%Y-%m'))
+
+
+@jobs_bp.route('/start/<kind>', methods=['POST'])
+@login_required
+@staff_required
+def start_job(kind):
+    handler = JOB_HANDLERS.get(kind)
+    if handler is None:
+        flash('Unknown job type.', 'danger')
+        return redirect(url_for('jobs.list_jobs'))
+    try:
+        job = enqueue_job(kind, current_user, **handler.pick_params(request.form))
+    except PermissionError:
+        flash('You are not allowed to run that job.', 'danger')
+    except ValueError as e:
+        flash(str(e), 'danger')
+    except JobLimitError as e:
+        flash(str(e), 'warning')
+    else:
+        db.session.commit()
+        flash(f'{JOB_HANDLERS[kind].label} queued (job #{job.id}).', 'success')
+    return redirect(url_for('jobs.list_jobs'))
+
+
+@jobs_bp.route('/<int:job_id>.json')
+@login_required
+@staff_required
+def job_status(job_id):
+    job = _job_or_404(job_id)
+    return jsonify({
+        'id': job.id, 'status': job.status, 'progress': job.progress, 'total': job.total,
+        'percent': job.percent, 'message': job.message,
+    })
+
+
+@jobs_bp.route('/<int:job_id>/download')
+@login_required
+@staff_required
+def download(job_id):
+    job = _job_or_404(job_id)
+    if job.status != 'done' or not job.result_path or not os.path.exists(job.result_path):
+        flash('That result is not available (it may have expired).', 'warning')
+        return redirect(url_for('jobs.list_jobs'))
+    return send_file(job.result_path, mimetype=job.result_mimetype,
+                     as_attachment=True, download_name=job.result_name)
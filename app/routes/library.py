@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from app.models import LibraryBook, BookIssue, Student
 from app.utils.decorators import role_required
 from app.utils.helpers import paginate_query
+from app.utils.events import record_counter_delta
 from app import db
 from datetime import date, timedelta
 
@@ -54,6 +55,7 @@ def add_book():
             location=request.form.get('location'),
         )
         db.session.add(book)
+        record_counter_delta(total_books=1)
         db.session.commit()
         flash(f'Book "{book.title}" added to library.', 'success')
         return redirect(url_for('library.books'))
@@ -144,6 +146,7 @@ def issue_book():
         )
         book.available_copies -= 1
         db.session.add(issue)
+        record_counter_delta(books_issued=1)
         db.session.commit()
         flash(f'Book issued. Due date: {due_date.strftime("%d %b %Y")}', 'success')
         return redirect(url_for('library.issues'))
@@ -157,6 +160,7 @@ def issue_book():
 @role_required('admin', 'librarian', 'receptionist')
 def return_book(issue_id):
     issue = BookIssue.query.get_or_404(issue_id)
+    was_issued = issue.status == 'issued'
     return_date = date.today()
     fine = 0
     if issue.due_date and return_date > issue.due_date:
@@ -167,6 +171,8 @@ def return_book(issue_id):
     issue.status = 'returned'
     issue.returned_to = current_user.full_name
     issue.book.available_copies += 1
+    if was_issued:
+        record_counter_delta(books_issued=-1)
     db.session.commit()
 
     if fine > 0:
@@ -1,16 +1,36 @@
-from flask import (Blueprint, render_template, request, send_file, flash, redirect, url_for)
+from flask import Blueprint, render_template, request
 from flask_login import login_required
-from app.models import (Student, Teacher, Attendance, FeePayment, Mark,
-                         Exam, ClassSection, FeeStructure, SalaryRecord)
-from app.utils.decorators import staff_required
+from app.models import (Student, Teacher, FeePayment, Mark,
+                         Exam, ClassSection, SalaryRecord)
+from app.utils.decorators import staff_required, STAFF_ROLES
+from app.utils.attendance import (student_attendance_summary, class_attendance_summary,
+                                  rebuild_attendance_rollup, EMPTY_COUNTS)
+from app.utils.helpers import get_current_academic_year
+from app.utils.cache import cache
+from app.utils.reference import reference_data
+from app.utils import ledger
+from app.utils.exporter import xlsx_response, iter_xlsx, EXPORT_BATCH, XLSX_MIMETYPE
+from app.utils.jobs import job_handler
 from app import db
-from datetime import date, timedelta
-from sqlalchemy import func
-import io
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, case
 
 reports_bp = Blueprint('reports', __name__, template_folder='../templates')
 
 
+def parse_date(value, default=None):
+    """Parse a 'YYYY-MM-DD' query arg into a real Python date object -
+    SQLite's Date column rejects plain strings."""
+    if isinstance(value, date):
+        return value
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return default
+
+
 def _grade_for_pct(pct):
     if pct >= 90: return 'A+'
     if pct >= 80: return 'A'
@@ -20,108 +40,120 @@ def _grade_for_pct(pct):
     return 'F'
 
 
-@reports_bp.route('/')
-@login_required
-def index():
-    today = date.today()
-
-    # ── Performance: top 10 students by average exam % ──────────────────
-    students_active = Student.query.filter_by(status='active').all()
-    performance_rows = []
-    for s in students_active:
-        marks = Mark.query.filter_by(student_id=s.id).all()
-        if not marks:
-            continue
-        total_obtained = sum(m.obtained_marks for m in marks)
-        total_possible = sum(m.total_marks for m in marks) or 1
-        avg_pct = round(total_obtained / total_possible * 100, 1)
-        performance_rows.append({
-            'name': s.full_name,
-            'class_name': s.class_section.display_name if s.class_section else '—',
+OVERVIEW_TTL = 300  # seconds; commits to the tagged tables invalidate sooner
+OVERVIEW_TAGS = ('students', 'marks', 'class_sections', 'fee_ledger', 'fee_charges', 'fee_structure',
+                 'attendance_daily')
+
+
+def _top_performers(limit=10):
+    """Active students ranked by overall exam percentage, aggregated in SQL."""
+    total = func.sum(Mark.total_marks)
+    pct = func.sum(Mark.obtained_marks) * 100.0 / func.coalesce(func.nullif(total, 0), 1)
+    rows = db.session.query(
+        Student.full_name, ClassSection.class_name, ClassSection.section,
+        pct.label('avg_pct')
+    ).select_from(Student).join(Mark, Mark.student_id == Student.id).outerjoin(
+        ClassSection, ClassSection.id == Student.class_section_id
+    ).filter(Student.status == 'active').group_by(
+        Student.id, Student.full_name, ClassSection.class_name, ClassSection.section
+    ).order_by(pct.desc(), Student.id).limit(limit)
+    performance = []
+    for row in rows:
+        avg_pct = round(float(row.avg_pct or 0), 1)
+        performance.append({
+            'name': row.full_name,
+            'class_name': f"{row.class_name} - {row.section}" if row.class_name else '—',
             'avg_pct': avg_pct,
             'grade': _grade_for_pct(avg_pct),
         })
-    performance_rows.sort(key=lambda r: r['avg_pct'], reverse=True)
-    performance_data = performance_rows[:10]
-
-    # ── Financial summary (this month) ───────────────────────────────────
-    total_collected = db.session.query(func.sum(FeePayment.total_paid)).scalar() or 0
-    tuition_by_class = {
-        fs.class_name: fs.amount
-        for fs in FeeStructure.query.filter_by(fee_type='tuition', is_active=True).all()
-    }
-    paid_ids_this_month = db.session.query(FeePayment.student_id).filter(
-        FeePayment.month == today.strftime('%B'),
-        FeePayment.year == today.year
-    ).scalar_subquery()
-    defaulters_now = Student.query.filter(
-        Student.status == 'active', ~Student.id.in_(paid_ids_this_month)
-    ).all()
-    total_pending = sum(
-        tuition_by_class.get(s.class_section.class_name, 0) if s.class_section else 0
-        for s in defaulters_now
-    )
-    total_students = len(students_active)
-    defaulter_count = len(defaulters_now)
-    paid_count = total_students - defaulter_count
-    financial = {
-        'collected': total_collected,
-        'pending': total_pending,
+    return performance
+
+
+def _financial_summary(today):
+    """Collections and this month's dues, read from the fee ledger. A student
+    not yet charged for the month who has paid nothing for it counts as a
+    defaulter owing their class's tuition (ledger.unpaid_estimate)."""
+    from app.models import FeeLedger
+    period = ledger.period_of(today.year, today.month)
+    total_students = db.session.query(func.count(Student.id)).filter(
+        Student.status == 'active').scalar()
+    due = FeeLedger.charged - FeeLedger.paid
+    owing = due >= ledger.TOLERANCE
+    paid_count, defaulter_count, total_pending = db.session.query(
+        func.count(case((FeeLedger.paid > 0, 1))), func.count(case((owing, 1))),
+        func.coalesce(func.sum(case((owing, due), else_=0)), 0)
+    ).join(Student, Student.id == FeeLedger.student_id).filter(
+        FeeLedger.period == period, Student.status == 'active').one()
+    estimate = ledger.unpaid_estimate(period)
+    return {
+        'collected': ledger.total_collected(),
+        'pending': total_pending + sum(estimate.values()),
         'total_students': total_students,
         'paid_count': paid_count,
-        'defaulter_count': defaulter_count,
+        'defaulter_count': defaulter_count + len(estimate),
     }
 
-    # ── Class-wise attendance (this month) ───────────────────────────────
-    classes = ClassSection.query.filter_by(is_active=True).all()
+
+def _class_attendance(today):
+    """Month-to-date attendance per active class, from the daily rollup."""
+    classes = reference_data().classes
     att_data = []
-    month_start = today.replace(day=1)
+    class_summary = class_attendance_summary(today.replace(day=1), today)
     for cls in classes:
-        cls_students = Student.query.filter_by(class_section_id=cls.id, status='active').all()
-        if not cls_students:
+        counts = class_summary.get(cls.id)
+        if not counts or not counts.get('students'):
             continue
-        student_ids = [s.id for s in cls_students]
-        total_records = Attendance.query.filter(
-            Attendance.student_id.in_(student_ids),
-            Attendance.date >= month_start, Attendance.date <= today
-        ).count()
-        present_records = Attendance.query.filter(
-            Attendance.student_id.in_(student_ids),
-            Attendance.date >= month_start, Attendance.date <= today,
-            Attendance.status == 'present'
-        ).count()
-        avg_pct = round((present_records / total_records * 100) if total_records else 0, 1)
         att_data.append({
             'class_name': cls.display_name,
-            'total_students': len(cls_students),
-            'present_days': present_records,
-            'avg_pct': avg_pct,
+            'total_students': counts['students'],
+            'present_days': counts['present'],
+            'avg_pct': counts['percentage'],
         })
+    return att_data
+
 
-    return render_template('reports/index.html', performance_data=performance_data,
-                           financial=financial, att_data=att_data)
+@reports_bp.route('/')
+@login_required
+def index():
+    today = date.today()
+    academic_year = get_current_academic_year()
+    # The financial and attendance sections are month-to-date, so the day
+    # is part of the key as well as the academic year.
+    overview = cache.get_or_set(
+        f'reports:overview:{academic_year}:{today.isoformat()}',
+        lambda: {
+            'performance_data': _top_performers(),
+            'financial': _financial_summary(today),
+            'att_data': _class_attendance(today),
+        }, ttl=OVERVIEW_TTL, tags=OVERVIEW_TAGS)
+    return render_template('reports/index.html', **overview)
 
 
 @reports_bp.route('/students')
 @login_required
 @staff_required
 def student_report():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     class_id = request.args.get('class_id')
     students = []
     if class_id:
         students = Student.query.filter_by(
             class_section_id=int(class_id), status='active').order_by(Student.full_name).all()
     student_data = []
+    summary, fees_by_student = {}, {}
+    if students:
+        summary = student_attendance_summary(class_section_id=int(class_id))
+        fees_by_student = dict(
+            db.session.query(FeePayment.student_id, func.sum(FeePayment.total_paid)).join(
+                Student, Student.id == FeePayment.student_id).filter(
+                Student.class_section_id == int(class_id)).group_by(FeePayment.student_id).all()
+        )
     for s in students:
-        total_att = Attendance.query.filter_by(student_id=s.id).count()
-        present = Attendance.query.filter_by(student_id=s.id, status='present').count()
-        att_pct = round((present / total_att * 100) if total_att else 0, 1)
-        total_fees = db.session.query(func.sum(FeePayment.total_paid)).filter_by(
-            student_id=s.id).scalar() or 0
+        counts = summary.get(s.id, EMPTY_COUNTS)
         student_data.append({
-            'student': s, 'att_pct': att_pct, 'total_fees': total_fees,
-            'present': present, 'total_att': total_att
+            'student': s, 'att_pct': counts['percentage'],
+            'total_fees': fees_by_student.get(s.id) or 0,
+            'present': counts['present'], 'total_att': counts['total']
         })
     return render_template('reports/performance.html', student_data=student_data,
                            classes=classes, class_id=class_id)
@@ -138,12 +170,18 @@ reports_bp.add_url_rule('/students', endpoint='student_performance',
 @staff_required
 def financial_report():
     today = date.today()
-    month = int(request.args.get('month', today.month))
-    year = int(request.args.get('year', today.year))
-
+    month = request.args.get('month', today.month, type=int)
+    year = request.args.get('year', today.year, type=int)
+    if not 1 <= month <= 12:
+        month = today.month
+    if not date.min.year <= year < date.max.year:  # month_range needs year + 1
+        year = today.year
+
+    from app.utils.helpers import get_months, month_range
+    start, end = month_range(year, month)
     monthly_payments = FeePayment.query.filter(
-        func.extract('month', FeePayment.payment_date) == month,
-        func.extract('year', FeePayment.payment_date) == year
+        FeePayment.payment_date >= start,
+        FeePayment.payment_date < end
     ).order_by(FeePayment.payment_date.desc()).all()
 
     total = sum(p.total_paid for p in monthly_payments)
@@ -157,7 +195,6 @@ def financial_report():
     ).scalar() or 0
     net_balance = total - total_salary
 
-    from app.utils.helpers import get_months
     return render_template('reports/financial.html', payments=monthly_payments,
                            total=total, total_collected=total, total_salary=total_salary,
                            net_balance=net_balance, by_type=by_type, month=month, year=year,
@@ -175,7 +212,7 @@ reports_bp.add_url_rule('/financial', endpoint='financial',
 @login_required
 @staff_required
 def attendance_report():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     class_id = request.args.get('class_id')
     from_date = request.args.get('from_date', (date.today() - timedelta(days=30)).isoformat())
     to_date = request.args.get('to_date', date.today().isoformat())
@@ -184,20 +221,14 @@ def attendance_report():
     if class_id:
         students = Student.query.filter_by(
             class_section_id=int(class_id), status='active').all()
+        summary = student_attendance_summary(
+            parse_date(from_date, date.today() - timedelta(days=30)),
+            parse_date(to_date, date.today()),
+            class_section_id=int(class_id))
         for s in students:
-            total = Attendance.query.filter(
-                Attendance.student_id == s.id,
-                Attendance.date >= from_date,
-                Attendance.date <= to_date
-            ).count()
-            present = Attendance.query.filter(
-                Attendance.student_id == s.id,
-                Attendance.date >= from_date,
-                Attendance.date <= to_date,
-                Attendance.status == 'present'
-            ).count()
-            pct = round((present / total * 100) if total else 0, 1)
-            data.append({'student': s, 'present': present, 'total': total, 'pct': pct})
+            counts = summary.get(s.id, EMPTY_COUNTS)
+            data.append({'student': s, 'present': counts['present'],
+                         'total': counts['total'], 'pct': counts['percentage']})
 
     return render_template('reports/attendance.html', data=data, classes=classes,
                            class_id=class_id, from_date=from_date, to_date=to_date)
@@ -208,44 +239,45 @@ reports_bp.add_url_rule('/attendance', endpoint='attendance',
                         view_func=attendance_report)
 
 
+PERFORMANCE_HEADERS = ['Reg No', 'Name', "Father's Name", 'Class', 'Present', 'Total Days',
+                       'Attendance %']
+ATTENDANCE_HEADERS = ['Class', 'Total Students', 'Present Days', 'Attendance %']
+
+
+def performance_rows():
+    """Rows of the student performance export, read in yield_per batches."""
+    classes = reference_data().classes_by_id
+    summary = student_attendance_summary()
+    query = db.session.query(
+        Student.id, Student.reg_no, Student.full_name, Student.father_name,
+        Student.class_section_id
+    ).filter(Student.status == 'active').order_by(Student.id).yield_per(EXPORT_BATCH)
+    for s in query:
+        counts = summary.get(s.id, EMPTY_COUNTS)
+        cls = classes.get(s.class_section_id)
+        yield [s.reg_no, s.full_name, s.father_name, cls.display_name if cls else '',
+               counts['present'], counts['total'], counts['percentage']]
+
+
+def attendance_rows():
+    """Rows of the class-wise attendance export (this month)."""
+    today = date.today()
+    class_summary = class_attendance_summary(today.replace(day=1), today)
+    for cls in reference_data().classes:
+        counts = class_summary.get(cls.id)
+        if not counts or not counts.get('students'):
+            continue
+        yield [cls.display_name, counts['students'], counts['present'],
+               counts['percentage']]
+
+
 @reports_bp.route('/export/students')
 @login_required
 @staff_required
 def export_student_report():
-    """Export student performance report to Excel"""
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment
-    except ImportError:
-        from flask import flash, redirect, url_for
-        flash('openpyxl not installed.', 'danger')
-        return redirect(url_for('reports.student_report'))
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Student Performance'
-    headers = ['Reg No', 'Name', "Father's Name", 'Class', 'Present', 'Total Days', 'Attendance %']
-    hf = PatternFill(start_color='FF6B35', end_color='FF6B35', fill_type='solid')
-    hfont = Font(color='FFFFFF', bold=True)
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.fill = hf
-        cell.font = hfont
-        ws.column_dimensions[cell.column_letter].width = 18
-
-    students = Student.query.filter_by(status='active').all()
-    for row, s in enumerate(students, 2):
-        total = Attendance.query.filter_by(student_id=s.id).count()
-        present = Attendance.query.filter_by(student_id=s.id, status='present').count()
-        pct = round((present / total * 100) if total else 0, 1)
-        class_name = s.class_section.display_name if s.class_section else ''
-        ws.append([s.reg_no, s.full_name, s.father_name, class_name, present, total, pct])
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name='student_performance.xlsx',
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    """Export student performance report to Excel, streamed as rows are read"""
+    return xlsx_response('student_performance.xlsx', 'Student Performance',
+                         PERFORMANCE_HEADERS, performance_rows())
 
 
 # Same naming mismatch pattern as the other reports/index.html links.
@@ -260,51 +292,8 @@ def export_attendance():
     """Export class-wise attendance summary (this month) to Excel.
     Covers both reports/index.html's 'export_attendance' link and
     reports/attendance.html's 'attendance_excel' link (same report)."""
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment
-    except ImportError:
-        flash('openpyxl not installed.', 'danger')
-        return redirect(url_for('reports.attendance_report'))
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Attendance Summary'
-    headers = ['Class', 'Total Students', 'Present Days', 'Attendance %']
-    hf = PatternFill(start_color='FF6B35', end_color='FF6B35', fill_type='solid')
-    hfont = Font(color='FFFFFF', bold=True)
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.fill = hf
-        cell.font = hfont
-        cell.alignment = Alignment(horizontal='center')
-        ws.column_dimensions[cell.column_letter].width = 20
-
-    today = date.today()
-    month_start = today.replace(day=1)
-    classes = ClassSection.query.filter_by(is_active=True).all()
-    for row, cls in enumerate(classes, 2):
-        cls_students = Student.query.filter_by(class_section_id=cls.id, status='active').all()
-        if not cls_students:
-            continue
-        student_ids = [s.id for s in cls_students]
-        total_records = Attendance.query.filter(
-            Attendance.student_id.in_(student_ids),
-            Attendance.date >= month_start, Attendance.date <= today
-        ).count()
-        present_records = Attendance.query.filter(
-            Attendance.student_id.in_(student_ids),
-            Attendance.date >= month_start, Attendance.date <= today,
-            Attendance.status == 'present'
-        ).count()
-        pct = round((present_records / total_records * 100) if total_records else 0, 1)
-        ws.append([cls.display_name, len(cls_students), present_records, pct])
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name='attendance_summary.xlsx',
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return xlsx_response('attendance_summary.xlsx', 'Attendance Summary', ATTENDANCE_HEADERS,
+                         attendance_rows(), widths=[20] * len(ATTENDANCE_HEADERS))
 
 
 # reports/attendance.html links to 'reports.attendance_excel' for the same export.
@@ -315,3 +304,41 @@ reports_bp.add_url_rule('/export/attendance-excel', endpoint='attendance_excel',
 # same student-performance export.
 reports_bp.add_url_rule('/export/performance-excel', endpoint='performance_excel',
                         view_func=export_student_report)
+
+
+# ─── Background Jobs ─────────────────────────────────────────
+
+@job_handler('performance_export', 'Student performance (Excel)', roles=STAFF_ROLES)
+def performance_export_job(ctx):
+    total = db.session.query(func.count(Student.id)).filter(Student.status == 'active').scalar()
+    rows = ctx.track(performance_rows(), total, 'Writing students')
+    ctx.write_result('student_performance.xlsx',
+                     iter_xlsx('Student Performance', PERFORMANCE_HEADERS, rows), XLSX_MIMETYPE)
+
+
+@job_handler('attendance_export', 'Attendance summary (Excel)', roles=STAFF_ROLES)
+def attendance_export_job(ctx):
+    rows = ctx.track(attendance_rows(), len(reference_data().classes), 'Writing classes')
+    ctx.write_result('attendance_summary.xlsx',
+                     iter_xlsx('Attendance Summary', ATTENDANCE_HEADERS, rows,
+                               widths=[20] * len(ATTENDANCE_HEADERS)), XLSX_MIMETYPE)
+
+
+@job_handler('attendance_rollup', 'Rebuild attendance rollup (this academic year)',
+             roles=('admin',))
+def attendance_rollup_job(ctx):
+    """Regenerate attendance_daily month by month since 1 April."""
+    from app.utils.helpers import month_range, shift_month
+    today = date.today()
+    year, month = (today.year if today.month >= 4 else today.year - 1), 4
+    months = []
+    while date(year, month, 1) <= today:
+        months.append((year, month))
+        year, month = shift_month(year, month, 1)
+    written = 0
+    for done, (year, month) in enumerate(months):
+        ctx.progress(done, len(months), f'Rebuilding {date(year, month, 1):%B %Y}')
+        start, end = month_range(year, month)
+        written += rebuild_attendance_rollup(start, min(end - timedelta(days=1), today))
+        db.session.commit()
+    ctx.progress(len(months), message=f'{written} rollup rows written', force=True)
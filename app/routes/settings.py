@@ -1,8 +1,13 @@
-from flask import (Blueprint, render_template, redirect, url_for, flash, request)
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, jsonify,
+                   current_app, send_from_directory)
 from flask_login import login_required, current_user
 from app.models import (Department, Subject, User, ClassSection,
                          Announcement, AcademicCalendar)
 from app.utils.decorators import admin_required, staff_required
+from app.utils.cache import cache
+from app.utils.reference import reference_data
+from app.utils.jobs import job_handler
+from app.utils.snapshots import load_manifest, run_snapshot
 from app import db
 from datetime import date, datetime
 
@@ -76,7 +81,7 @@ def delete_department(id):
 @staff_required
 def subjects():
     subjects = Subject.query.filter_by(is_active=True).order_by(Subject.name).all()
-    departments = Department.query.filter_by(is_active=True).all()
+    departments = reference_data().departments
     return render_template('settings/subjects.html', subjects=subjects, departments=departments)
 
 
@@ -261,4 +266,46 @@ def delete_calendar_event(id):
     db.session.delete(event)
     db.session.commit()
     flash('Event deleted.', 'info')
-    return redirect(url_for('settings.calendar'))
\ No newline at end of file
+    return redirect(url_for('settings.calendar'))
+
+
+# ─── Cache ───────────────────────────────────────────────────────────────────
+
+@settings_bp.route('/cache-stats')
+@login_required
+@admin_required
+def cache_stats():
+    """Hit/miss counters of the worker that serves this request, plus the
+    size of the shared tier."""
+    return jsonify(cache.stats())
+
+
+# ─── Analytics Snapshots ─────────────────────────────────────────────────────
+
+@settings_bp.route('/snapshots')
+@login_required
+@admin_required
+def snapshots():
+    """Snapshot manifest: files written so far and each table's watermark.
+    New snapshots are queued as the 'analytics_snapshot' background job."""
+    return jsonify(load_manifest(current_app.config['SNAPSHOT_FOLDER']))
+
+
+@settings_bp.route('/snapshots/<path:filename>')
+@login_required
+@admin_required
+def snapshot_file(filename):
+    return send_from_directory(current_app.config['SNAPSHOT_FOLDER'], filename,
+                               as_attachment=True)
+
+
+@job_handler('analytics_snapshot', 'Analytics snapshot (new attendance, fees, marks)',
+             roles=('admin',))
+def analytics_snapshot_job(ctx, full=None):
+    def progress(name, rows):
+        ctx.progress(rows, message=f'Copying {name}: {rows} rows')
+
+    written = run_snapshot(current_app.config['SNAPSHOT_FOLDER'], full=bool(full),
+                           progress=progress)
+    ctx.progress(sum(e['rows'] for e in written.values() if e), message=', '.join(
+        f"{name}: {e['rows'] if e else 0} new rows" for name, e in written.items()), force=True)
@@ -1,13 +1,16 @@
 import os
 from flask import (Blueprint, render_template, redirect, url_for, flash,
-                   request, send_file, current_app)
+                   request, current_app)
 from flask_login import login_required, current_user
-from app.models import Student, ClassSection, FeePayment, Attendance
+from app.models import Student, FeePayment, Attendance
 from app.utils.helpers import generate_reg_no, paginate_query
-from app.utils.decorators import staff_required
+from app.utils.decorators import staff_required, STAFF_ROLES
+from app.utils.reference import reference_data
+from app.utils.exporter import xlsx_response, iter_xlsx, EXPORT_BATCH, XLSX_MIMETYPE
+from app.utils.jobs import job_handler
 from app import db
 from datetime import date, datetime
-import io
+from sqlalchemy import func
 
 students_bp = Blueprint('students', __name__, template_folder='../templates')
 
@@ -52,7 +55,7 @@ def list_students():
         query = query.filter_by(status=status)
 
     pagination = paginate_query(query.order_by(Student.id.desc()), page, 15)
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     return render_template('students/list.html', students=pagination.items,
                            pagination=pagination, classes=classes,
                            search=search, class_id=class_id, status=status)
@@ -62,7 +65,7 @@ def list_students():
 @login_required
 @staff_required
 def add_student():
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     if request.method == 'POST':
         student = Student(
             reg_no=generate_reg_no(),
@@ -121,7 +124,7 @@ def view_student(id):
 @staff_required
 def edit_student(id):
     student = Student.query.get_or_404(id)
-    classes = ClassSection.query.filter_by(is_active=True).all()
+    classes = reference_data().classes
     if request.method == 'POST':
         student.full_name = request.form.get('full_name', student.full_name)
         student.father_name = request.form.get('father_name', student.father_name)
@@ -162,43 +165,36 @@ def delete_student(id):
     return redirect(url_for('students.list_students'))
 
 
+EXPORT_HEADERS = ['Reg No', 'Full Name', "Father's Name", 'Gender', 'Class',
+                  'Phone', 'Parent Phone', 'Email', 'Address', 'Status', 'Admission Date']
+
+
+def export_rows():
+    """Rows of the students export, read in yield_per batches."""
+    classes = reference_data().classes_by_id
+    query = db.session.query(
+        Student.reg_no, Student.full_name, Student.father_name, Student.gender,
+        Student.class_section_id, Student.phone, Student.parent_phone, Student.email,
+        Student.address, Student.status, Student.admission_date
+    ).order_by(Student.id).yield_per(EXPORT_BATCH)
+    for s in query:
+        cls = classes.get(s.class_section_id)
+        yield [s.reg_no, s.full_name, s.father_name, s.gender,
+               cls.display_name if cls else '', s.phone, s.parent_phone, s.email,
+               s.address, s.status, s.admission_date]
+
+
 @students_bp.route('/export')
 @login_required
 @staff_required
 def export_students():
-    """Export students to Excel"""
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment
-    except ImportError:
-        flash('openpyxl not installed. Cannot export.', 'danger')
-        return redirect(url_for('students.list_students'))
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Students'
-
-    headers = ['Reg No', 'Full Name', "Father's Name", 'Gender', 'Class',
-               'Phone', 'Parent Phone', 'Email', 'Address', 'Status', 'Admission Date']
-    header_fill = PatternFill(start_color='FF6B35', end_color='FF6B35', fill_type='solid')
-    header_font = Font(color='FFFFFF', bold=True)
-
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        ws.column_dimensions[cell.column_letter].width = 18
-
-    students = Student.query.all()
-    for row, s in enumerate(students, 2):
-        class_name = s.class_section.display_name if s.class_section else ''
-        ws.append([s.reg_no, s.full_name, s.father_name, s.gender, class_name,
-                   s.phone, s.parent_phone, s.email, s.address, s.status,
-                   s.admission_date.strftime('%Y-%m-%d') if s.admission_date else ''])
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name='students_export.xlsx',
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    """Export students to Excel, streamed as rows are read"""
+    return xlsx_response('students_export.xlsx', 'Students', EXPORT_HEADERS, export_rows())
+
+
+@job_handler('students_export', 'Students list (Excel)', roles=STAFF_ROLES)
+def students_export_job(ctx):
+    total = db.session.query(func.count(Student.id)).scalar()
+    rows = ctx.track(export_rows(), total, 'Writing students')
+    ctx.write_result('students_export.xlsx', iter_xlsx('Students', EXPORT_HEADERS, rows),
+                     XLSX_MIMETYPE)
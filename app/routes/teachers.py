@@ -5,6 +5,7 @@ from flask_login import login_required, current_user
 from app.models import Teacher, Department, SalaryRecord, TeacherAttendance
 from app.utils.helpers import generate_employee_id, paginate_query
 from app.utils.decorators import staff_required, admin_required
+from app.utils.reference import reference_data
 from app import db
 from datetime import date, datetime
 
@@ -47,7 +48,7 @@ def list_teachers():
         query = query.filter_by(department_id=int(dept_id))
 
     pagination = paginate_query(query.order_by(Teacher.id.desc()), page, 15)
-    departments = Department.query.filter_by(is_active=True).all()
+    departments = reference_data().departments
     return render_template('teachers/list.html', teachers=pagination.items,
                            pagination=pagination, departments=departments,
                            search=search, dept_id=dept_id)
@@ -57,7 +58,7 @@ def list_teachers():
 @login_required
 @staff_required
 def add_teacher():
-    departments = Department.query.filter_by(is_active=True).all()
+    departments = reference_data().departments
     if request.method == 'POST':
         teacher = Teacher(
             employee_id=generate_employee_id(),
@@ -113,7 +114,7 @@ def view_teacher(id):
 @staff_required
 def edit_teacher(id):
     teacher = Teacher.query.get_or_404(id)
-    departments = Department.query.filter_by(is_active=True).all()
+    departments = reference_data().departments
     if request.method == 'POST':
         teacher.full_name = request.form.get('full_name', teacher.full_name)
         teacher.gender = request.form.get('gender', teacher.gender)
@@ -234,10 +234,72 @@ async function initClassChart() {
     } catch (e) { console.warn('Class chart error:', e); }
 }
 
+// ─── Live Counters (server-sent events) ───────────────
+
+const STAT_FORMAT = {
+    today_attendance_pct: v => `${v}%`,
+    month_fees: v => Math.round(v).toLocaleString('en-US'),
+};
+let liveStats = null;
+
+function renderStats() {
+    const total = liveStats.today_total;
+    liveStats.today_attendance_pct = total
+        ? Math.round(liveStats.today_present / total * 1000) / 10 : 0;
+    document.querySelectorAll('[data-stat]').forEach(el => {
+        const key = el.dataset.stat;
+        if (!(key in liveStats)) return;
+        const format = STAT_FORMAT[key] || (v => v);
+        el.textContent = format(liveStats[key]);
+    });
+}
+
+async function refreshStats() {
+    try {
+        const res = await fetch('/api/stats');
+        liveStats = await res.json();
+        renderStats();
+    } catch (e) { console.warn('Stats refresh error:', e); }
+}
+
+function pollStats(seconds) {
+    refreshStats();
+    setInterval(() => { if (!document.hidden) refreshStats(); }, seconds * 1000);
+}
+
+function initLiveCounters() {
+    const grid = document.querySelector('[data-live-stream]');
+    if (!grid || !document.querySelector('[data-stat]')) return;
+    const pollSeconds = parseInt(grid.dataset.pollSeconds, 10) || 60;
+    if (grid.dataset.liveStream !== 'on' || !window.EventSource) {
+        pollStats(pollSeconds);
+        return;
+    }
+    const source = new EventSource('/api/stream');
+    // A refused stream (disabled, or the worker's cap reached) closes for
+    // good instead of reconnecting; fall back to polling.
+    source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED) pollStats(pollSeconds);
+    });
+    // (Re)connecting may have missed events, so start from absolute values.
+    source.addEventListener('open', refreshStats);
+    source.addEventListener('resync', refreshStats);
+    source.addEventListener('counters', e => {
+        const msg = JSON.parse(e.data);
+        if (!liveStats) return;
+        if (msg.date !== liveStats.date) { refreshStats(); return; }
+        for (const [key, delta] of Object.entries(msg.deltas)) {
+            liveStats[key] = (liveStats[key] || 0) + delta;
+        }
+        renderStats();
+    });
+}
+
 // Init all dashboard charts
 document.addEventListener('DOMContentLoaded', () => {
     initEnrollmentChart();
     initAttendanceChart();
     initFeesChart();
     initClassChart();
+    initLiveCounters();
 });
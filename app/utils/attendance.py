@@ -0,0 +1,371 @@
+"""
+Attendance write and aggregation helpers for AI-Powered Institutional Management & Face Recognition Attendance System
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert, update, delete, func, case
+from app import db
+
+STATUSES = ('present', 'absent', 'late', 'leave')
+
+# Read-only fallback for students/classes with no rows in the range.
+EMPTY_COUNTS = {'present': 0, 'absent': 0, 'late': 0, 'leave': 0,
+                'total': 0, 'percentage': 0}
+
+
+def bulk_mark_attendance(statuses, class_section_id, mark_date, marked_by, method='manual'):
+    """Insert or update one attendance row per student for mark_date.
+
+    statuses: dict {student_id: status}. Existing rows (keyed the same way as
+    the unique_student_date constraint) are loaded in one query, new rows go
+    in as a single batched INSERT and changed rows as a single executemany
+    UPDATE by primary key - a constant number of round trips however large
+    the class is. The caller commits. Returns the number of students marked.
+    """
+    from app.models import Attendance
+    if not statuses:
+        return 0
+
+    existing = {
+        row.student_id: row
+        for row in db.session.query(
+            Attendance.id, Attendance.student_id, Attendance.class_section_id,
+            Attendance.status, Attendance.marked_by, Attendance.method,
+            Attendance.leave_application_id, Attendance.previous_status
+        ).filter(
+            Attendance.date == mark_date,
+            Attendance.student_id.in_(list(statuses))
+        )
+    }
+
+    new_rows = []
+    changed_rows = []
+    touched = {(mark_date, class_section_id)}
+    for student_id, status in statuses.items():
+        row = existing.get(student_id)
+        if row is None:
+            new_rows.append({
+                'student_id': student_id,
+                'class_section_id': class_section_id,
+                'date': mark_date,
+                'status': status,
+                'marked_by': marked_by,
+                'method': method,
+            })
+        elif (row.status, row.marked_by, row.method) != (status, marked_by, method):
+            kept = row.status == status  # a re-marked day no longer belongs to a leave
+            changed_rows.append({
+                'id': row.id,
+                'status': status,
+                'marked_by': marked_by,
+                'method': method,
+                'leave_application_id': row.leave_application_id if kept else None,
+                'previous_status': row.previous_status if kept else None,
+            })
+            touched.add((mark_date, row.class_section_id))
+
+    if new_rows:
+        db.session.execute(insert(Attendance), new_rows)
+    if changed_rows:
+        db.session.execute(update(Attendance), changed_rows)
+    refresh_attendance_rollup(touched)
+    return len(statuses)
+
+
+def mark_leave_attendance(leave_app, marked_by):
+    """Record an approved leave application as 'leave' attendance.
+
+    Every school day (Monday-Saturday) in the application's range up to
+    today gets a 'leave' row; days already marked absent are switched to
+    leave, other existing marks are left alone. Days after today are marked
+    as usual when they come. The rows written carry leave_application_id
+    (and previous_status when switched) for clear_leave_attendance. The
+    caller commits.
+    """
+    from app.models import Attendance, Student
+    student = db.session.get(Student, leave_app.student_id)
+    if student is None or not leave_app.from_date or not leave_app.to_date:
+        return 0
+
+    days = []
+    day = leave_app.from_date
+    while day <= min(leave_app.to_date, date.today()):
+        if day.weekday() != 6:  # Sunday
+            days.append(day)
+        day += timedelta(days=1)
+    if not days:
+        return 0
+
+    existing = {
+        row.date: row
+        for row in db.session.query(
+            Attendance.id, Attendance.date, Attendance.class_section_id, Attendance.status
+        ).filter(
+            Attendance.student_id == student.id,
+            Attendance.date >= days[0], Attendance.date <= days[-1]
+        )
+    }
+    remarks = f'Approved leave application #{leave_app.id}'
+    new_rows = []
+    changed_rows = []
+    touched = set()
+    for day in days:
+        row = existing.get(day)
+        if row is None:
+            new_rows.append({
+                'student_id': student.id,
+                'class_section_id': student.class_section_id,
+                'date': day,
+                'status': 'leave',
+                'marked_by': marked_by,
+                'method': 'manual',
+                'remarks': remarks,
+                'leave_application_id': leave_app.id,
+            })
+            touched.add((day, student.class_section_id))
+        elif row.status == 'absent':
+            changed_rows.append({'id': row.id, 'status': 'leave', 'marked_by': marked_by,
+                                 'remarks': remarks, 'leave_application_id': leave_app.id,
+                                 'previous_status': 'absent'})
+            touched.add((day, row.class_section_id))
+
+    if new_rows:
+        db.session.execute(insert(Attendance), new_rows)
+    if changed_rows:
+        db.session.execute(update(Attendance), changed_rows)
+    refresh_attendance_rollup(touched)
+    return len(new_rows) + len(changed_rows)
+
+
+def clear_leave_attendance(leave_app, marked_by):
+    """Undo mark_leave_attendance when an approved leave is rejected: rows
+    it created are deleted and rows it switched go back to their previous
+    status. Rows re-marked since (no longer 'leave') are left alone. The
+    caller commits. Returns the number of rows reverted."""
+    from app.models import Attendance
+    rows = db.session.query(
+        Attendance.id, Attendance.date, Attendance.class_section_id, Attendance.previous_status
+    ).filter(
+        Attendance.student_id == leave_app.student_id,
+        Attendance.leave_application_id == leave_app.id,
+        Attendance.status == 'leave'
+    ).all()
+    if not rows:
+        return 0
+
+    created = [row.id for row in rows if row.previous_status is None]
+    if created:
+        db.session.execute(delete(Attendance).where(Attendance.id.in_(created)))
+    restored = [{'id': row.id, 'status': row.previous_status, 'marked_by': marked_by,
+                 'remarks': None, 'leave_application_id': None, 'previous_status': None}
+                for row in rows if row.previous_status is not None]
+    if restored:
+        db.session.execute(update(Attendance), restored)
+    refresh_attendance_rollup({(row.date, row.class_section_id) for row in rows})
+    return len(rows)
+
+
+def link_leave_attendance():
+    """Set leave_application_id (and previous_status) on 'leave' rows written
+    before those columns existed, when only their remarks - 'Approved leave
+    application #<id>', with ' (was absent)' on switched rows - recorded
+    the application. Run by `flask upgrade-db`; the caller commits."""
+    from app.models import Attendance, LeaveApplication
+    prefix = 'Approved leave application #'
+    known = {app_id for (app_id,) in db.session.query(LeaveApplication.id)}
+    links = []
+    for row in db.session.query(Attendance.id, Attendance.remarks).filter(
+            Attendance.status == 'leave', Attendance.remarks.like(f'{prefix}%')):
+        number, _, rest = row.remarks[len(prefix):].partition(' ')
+        if number.isdigit() and int(number) in known:
+            links.append({'id': row.id, 'leave_application_id': int(number),
+                          'previous_status': 'absent' if rest == '(was absent)' else None})
+    if links:
+        db.session.execute(update(Attendance), links)
+    return len(links)
+
+
+# ─── Daily rollup ────────────────────────────────────────────────────────────
+
+def _rollup_values(day, class_section_id, row=None):
+    values = {'date': day, 'class_section_id': class_section_id,
+              'updated_at': datetime.utcnow()}
+    for col in STATUSES + ('total',):
+        values[col] = int(getattr(row, col) or 0) if row is not None else 0
+    return values
+
+
+def _upsert_rollup(values):
+    """Write attendance_daily rows, replacing any existing (date, class) row."""
+    from app.models import AttendanceDaily
+    if not values:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(AttendanceDaily).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['date', 'class_section_id'],
+            set_={col: stmt.excluded[col] for col in STATUSES + ('total', 'updated_at')},
+        )
+        db.session.execute(stmt)
+        return
+    for v in values:
+        db.session.execute(delete(AttendanceDaily).where(
+            AttendanceDaily.date == v['date'],
+            AttendanceDaily.class_section_id == v['class_section_id']))
+    db.session.execute(insert(AttendanceDaily), values)
+
+
+def refresh_attendance_rollup(keys):
+    """Recount attendance_daily for the given (date, class_section_id) pairs.
+
+    Called by every attendance writer after its INSERT/UPDATE, inside the
+    same transaction. Only the touched class-days are recounted, so the
+    cost depends on class size, not on how much history is stored. The
+    change to today's totals is queued for the live dashboard stream.
+    """
+    from app.models import Attendance
+    keys = {(day, class_id or 0) for day, class_id in keys}
+    if not keys:
+        return
+    db.session.flush()
+    class_col = func.coalesce(Attendance.class_section_id, 0)
+    rows = db.session.query(
+        Attendance.date, class_col.label('class_section_id'), *_status_columns()
+    ).filter(
+        Attendance.date.in_({day for day, _ in keys}),
+        class_col.in_({class_id for _, class_id in keys})
+    ).group_by(Attendance.date, class_col)
+    counts = {(row.date, row.class_section_id): row for row in rows}
+    values = [_rollup_values(day, class_id, counts.get((day, class_id)))
+              for day, class_id in sorted(keys)]
+    _record_today_delta(values)
+    _upsert_rollup(values)
+
+
+def _record_today_delta(values):
+    """Queue the difference between today's stored rollup rows and their
+    recounted values as dashboard counter deltas."""
+    from app.models import AttendanceDaily
+    from app.utils.events import record_counter_delta
+    today = date.today()
+    new = {v['class_section_id']: v for v in values if v['date'] == today}
+    if not new:
+        return
+    old = {row.class_section_id: row for row in db.session.query(
+        AttendanceDaily.class_section_id, AttendanceDaily.present, AttendanceDaily.total
+    ).filter(AttendanceDaily.date == today,
+             AttendanceDaily.class_section_id.in_(list(new)))}
+    present = total = 0
+    for class_id, v in new.items():
+        row = old.get(class_id)
+        present += v['present'] - (row.present if row else 0)
+        total += v['total'] - (row.total if row else 0)
+    record_counter_delta(today_present=present, today_total=total)
+
+
+def rebuild_attendance_rollup(start, end):
+    """Regenerate attendance_daily for [start, end] from raw attendance.
+    Returns the number of rollup rows written. The caller commits."""
+    from app.models import Attendance, AttendanceDaily
+    class_col = func.coalesce(Attendance.class_section_id, 0)
+    rows = db.session.query(
+        Attendance.date, class_col.label('class_section_id'), *_status_columns()
+    ).filter(
+        Attendance.date >= start, Attendance.date <= end
+    ).group_by(Attendance.date, class_col).all()
+    db.session.execute(delete(AttendanceDaily).where(
+        AttendanceDaily.date >= start, AttendanceDaily.date <= end))
+    values = [_rollup_values(row.date, row.class_section_id, row) for row in rows]
+    if values:
+        db.session.execute(insert(AttendanceDaily), values)
+    return len(values)
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def _status_columns():
+    from app.models import Attendance
+    return [func.sum(case((Attendance.status == s, 1), else_=0)).label(s)
+            for s in STATUSES] + [func.count(Attendance.id).label('total')]
+
+
+def _counts(row):
+    counts = {s: int(getattr(row, s) or 0) for s in STATUSES}
+    counts['total'] = int(row.total or 0)
+    counts['percentage'] = round(
+        (counts['present'] / counts['total'] * 100) if counts['total'] else 0, 1)
+    return counts
+
+
+def _rollup_columns():
+    from app.models import AttendanceDaily
+    return [func.sum(getattr(AttendanceDaily, col)).label(col)
+            for col in STATUSES + ('total',)]
+
+
+def _rollup_range(query, start, end):
+    from app.models import AttendanceDaily
+    if start is not None:
+        query = query.filter(AttendanceDaily.date >= start)
+    if end is not None:
+        query = query.filter(AttendanceDaily.date <= end)
+    return query
+
+
+def _date_range(query, start, end):
+    from app.models import Attendance
+    if start is not None:
+        query = query.filter(Attendance.date >= start)
+    if end is not None:
+        query = query.filter(Attendance.date <= end)
+    return query
+
+
+def student_attendance_summary(start=None, end=None, class_section_id=None):
+    """Present/absent/late/leave/total counts per student for [start, end].
+
+    One GROUP BY student_id with conditional SUMs instead of a count()
+    query per student and status. class_section_id limits the result to
+    students currently in that class. Returns {student_id: counts}; look
+    students up with .get(id, EMPTY_COUNTS).
+    """
+    from app.models import Attendance, Student
+    query = db.session.query(Attendance.student_id, *_status_columns())
+    if class_section_id is not None:
+        query = query.join(Student, Student.id == Attendance.student_id).filter(
+            Student.class_section_id == class_section_id)
+    query = _date_range(query, start, end).group_by(Attendance.student_id)
+    return {row.student_id: _counts(row) for row in query}
+
+
+def class_attendance_summary(start=None, end=None):
+    """Attendance counts per class for [start, end], read from the daily
+    rollup so the cost does not grow with attendance history.
+
+    Returns {class_section_id: counts} where counts also carries
+    'students', the number of active students in the class.
+    """
+    from app.models import AttendanceDaily, Student
+    query = _rollup_range(db.session.query(
+        AttendanceDaily.class_section_id, *_rollup_columns()), start, end)
+    summary = {row.class_section_id: _counts(row)
+               for row in query.group_by(AttendanceDaily.class_section_id)}
+
+    enrolled = db.session.query(Student.class_section_id, func.count(Student.id)).filter(
+        Student.status == 'active').group_by(Student.class_section_id)
+    for class_id, students in enrolled:
+        summary.setdefault(class_id, dict(EMPTY_COUNTS))['students'] = students
+    return summary
+
+
+def daily_attendance_totals(start, end):
+    """School-wide counts per day for [start, end] from the daily rollup.
+    Returns {date: counts}."""
+    from app.models import AttendanceDaily
+    query = _rollup_range(db.session.query(
+        AttendanceDaily.date, *_rollup_columns()), start, end)
+    return {row.date: _counts(row) for row in query.group_by(AttendanceDaily.date)}
@@ -0,0 +1,175 @@
+"""
+Batch PDFs for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Vouchers or receipts for a whole class, or the result cards of a whole
+exam, are loaded with one query (student, class and fee structure or
+subject eager-loaded), turned into plain dicts and rendered
+on a pool of PDF_WORKERS processes, started on first use and kept for the
+life of the web or worker process. A ZIP is streamed member by member as
+the PDFs come back from the pool. A single combined PDF has to be laid out
+by one ReportLab document, so it is rendered by one pool process.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from itertools import groupby
+from sqlalchemy import and_
+from sqlalchemy.orm import contains_eager, joinedload
+from app import db
+from app.utils import ledger
+from app.utils.helpers import get_months
+from app.utils.pdf_generator import (render_document, render_combined, receipt_data,
+                                     result_card_data, student_fields)
+
+INLINE_BELOW = 8  # smaller batches are not worth a trip to the pool
+VOUCHER_DUE_DAY = 10
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _workers():
+    from flask import current_app
+    return current_app.config.get('PDF_WORKERS', 0)
+
+
+def _get_pool(workers):
+    """The shared pool. 'spawn' because forking a threaded web server can
+    copy a lock mid-use; the workers only import the PDF code."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def render_many(kind, items):
+    """Yield one PDF per data dict in items, in order."""
+    workers = _workers()
+    if workers < 2 or len(items) < INLINE_BELOW:
+        for data in items:
+            yield render_document(kind, data)
+        return
+    chunksize = max(1, len(items) // (workers * 4))
+    try:
+        yield from _get_pool(workers).map(render_document, [kind] * len(items), items,
+                                          chunksize=chunksize)
+    except BrokenProcessPool:
+        _reset_pool()  # a worker died; start a fresh pool next time
+        raise
+
+
+def render_one_pdf(kind, items):
+    """All items in a single PDF, one document per page."""
+    workers = _workers()
+    if workers < 2 or len(items) < INLINE_BELOW:
+        return render_combined(kind, items)
+    try:
+        return _get_pool(workers).submit(render_combined, kind, items).result()
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+
+
+# ─── Data ────────────────────────────────────────────────────────────────────
+
+def receipt_items(year, month, class_section_id=None):
+    """[(filename, data)] for the receipts of payments for a fee month."""
+    from app.models import FeePayment, Student
+    query = (FeePayment.query
+             .join(Student, FeePayment.student_id == Student.id)
+             .options(contains_eager(FeePayment.student).joinedload(Student.class_section),
+                      joinedload(FeePayment.fee_structure))
+             .filter(FeePayment.year == year, FeePayment.month == get_months()[month - 1]))
+    if class_section_id:
+        query = query.filter(Student.class_section_id == class_section_id)
+    query = query.order_by(Student.class_section_id, Student.full_name, FeePayment.id)
+    return [(f'receipt_{p.receipt_no}.pdf', receipt_data(p)) for p in query]
+
+
+def voucher_items(year, month, class_section_id=None):
+    """[(filename, data)] for one voucher per active student charged in the
+    month: the month's charges plus the balance brought forward."""
+    from app.models import FeeCharge, FeeLedger, Student
+    period = ledger.period_of(year, month)
+    opening = FeeLedger.balance - FeeLedger.charged + FeeLedger.paid
+    query = (db.session.query(FeeCharge, opening)
+             .join(Student, FeeCharge.student_id == Student.id)
+             .outerjoin(FeeLedger, and_(FeeLedger.student_id == FeeCharge.student_id,
+                                        FeeLedger.period == period))
+             .options(contains_eager(FeeCharge.student).joinedload(Student.class_section),
+                      joinedload(FeeCharge.fee_structure))
+             .filter(FeeCharge.period == period, Student.status == 'active'))
+    if class_section_id:
+        query = query.filter(Student.class_section_id == class_section_id)
+    query = query.order_by(Student.class_section_id, Student.full_name, Student.id, FeeCharge.id)
+
+    issued = date.today().strftime('%d-%b-%Y')
+    due = date(year, month, VOUCHER_DUE_DAY).strftime('%d-%b-%Y')
+    items = []
+    for _, rows in groupby(query, key=lambda row: row[0].student_id):
+        rows = list(rows)
+        student = rows[0][0].student
+        lines = [(c.fee_structure.name if c.fee_structure else 'Fee', c.amount) for c, _ in rows]
+        arrears = round(rows[0][1] or 0, 2)
+        data = student_fields(student)
+        data.update({
+            'voucher_no': f'V-{year}{month:02d}-{student.reg_no}',
+            'month_label': ledger.period_label(period),
+            'issue_date': issued,
+            'due_date': due,
+            'lines': lines,
+            'arrears': arrears,
+            'total': max(sum(amount for _, amount in lines) + arrears, 0),
+        })
+        items.append((f'voucher_{student.reg_no}_{year}{month:02d}.pdf', data))
+    return items
+
+
+BATCH_ITEMS = {'voucher': voucher_items, 'receipt': receipt_items}
+
+
+def result_card_items(exam, class_section_id=None, student_id=None):
+    """[(filename, data)] for the result card of every student with marks
+    in the exam. All marks come from one query and are grouped per student
+    here; subjects keep the order they were added to the exam."""
+    from app.models import ExamSubject, Mark, Student, Subject
+    query = (db.session.query(Mark, Subject.name)
+             .join(Student, Mark.student_id == Student.id)
+             .join(ExamSubject, and_(ExamSubject.exam_id == Mark.exam_id,
+                                     ExamSubject.subject_id == Mark.subject_id))
+             .outerjoin(Subject, Mark.subject_id == Subject.id)
+             .options(contains_eager(Mark.student).joinedload(Student.class_section))
+             .filter(Mark.exam_id == exam.id))
+    if class_section_id:
+        query = query.filter(Student.class_section_id == class_section_id)
+    if student_id:
+        query = query.filter(Mark.student_id == student_id)
+    query = query.order_by(Student.class_section_id, Student.full_name, Student.id, ExamSubject.id)
+
+    items = []
+    for _, rows in groupby(query, key=lambda row: row[0].student_id):
+        rows = list(rows)
+        student = rows[0][0].student
+        subject_marks = [{
+            'subject_name': name or 'Subject',
+            'obtained': m.obtained_marks,
+            'total': m.total_marks,
+            'grade': m.grade or 'N/A',
+        } for m, name in rows]
+        items.append((f'result_{student.reg_no}_{exam.id}.pdf',
+                      result_card_data(student, exam, subject_marks)))
+    return items
+
+
+def batch_files(kind, items):
+    """(filename, pdf bytes) pairs for a ZIP, rendered on the pool."""
+    return zip((name for name, _ in items), render_many(kind, [data for _, data in items]))
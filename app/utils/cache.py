@@ -0,0 +1,461 @@
+"""
+Application cache for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Two tiers: an in-process LRU with per-entry TTL, and - when
+CACHE_SHARED_PATH is set - a SQLite file shared by every worker on the
+host, so a value computed by one gunicorn worker is reused by the others.
+
+Shared entries are stored as JSON, never pickle: the file is only
+trusted as far as its contents, so reading it must not run code. Values
+are built from dicts, lists, tuples (named or not), strings, numbers,
+dates and datetimes; anything else stays in the in-process tier.
+
+Entries can carry tags, by convention the names of the tables they were
+computed from. Every commit that writes to a table bumps that tag's
+version (see Cache.init_app), and entries stamped with an older version
+are treated as misses in every worker.
+"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from sqlalchemy import event
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU key/value store whose entries expire after a TTL.
+
+    Lives in the worker process, so each gunicorn worker keeps its own
+    copy. Once max_entries is reached the least recently used entry is
+    evicted.
+    """
+
+    def __init__(self, default_ttl=30, max_entries=2048):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value for key, computing and storing it with
+        factory() on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, *prefixes):
+        """Drop every key starting with any of prefixes, e.g. 'dashboard:'."""
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefixes)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# ─── Shared tier encoding ────────────────────────────────────────────────────
+
+_TUPLE, _ROW, _PAIRS, _DATE, _DATETIME = '__tuple__', '__row__', '__pairs__', '__date__', '__datetime__'
+_MARKERS = {_TUPLE, _ROW, _PAIRS, _DATE, _DATETIME}
+
+
+def _encode(value):
+    """value as plain JSON types, with tuples, named tuples, dates and
+    non-string dict keys tagged so _decode can restore them."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {_DATETIME: value.isoformat()}
+    if isinstance(value, date):
+        return {_DATE: value.isoformat()}
+    if isinstance(value, tuple):
+        items = [_encode(v) for v in value]
+        if hasattr(value, '_fields'):
+            return {_ROW: items, 'fields': list(value._fields)}
+        return {_TUPLE: items}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value) and not _MARKERS.intersection(value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {_PAIRS: [[_encode(k), _encode(v)] for k, v in value.items()]}
+    raise TypeError(f'{type(value).__name__} cannot be stored in the shared cache')
+
+
+@functools.lru_cache(maxsize=256)
+def _row_type(fields):
+    return namedtuple('Row', fields)
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if _ROW in value:
+        return _row_type(tuple(value['fields']))(*map(_decode, value[_ROW]))
+    if _TUPLE in value:
+        return tuple(map(_decode, value[_TUPLE]))
+    if _PAIRS in value:
+        return {_decode(k): _decode(v) for k, v in value[_PAIRS]}
+    if _DATETIME in value:
+        return datetime.fromisoformat(value[_DATETIME])
+    if _DATE in value:
+        return date.fromisoformat(value[_DATE])
+    return {k: _decode(v) for k, v in value.items()}
+
+
+def _check_owned(path):
+    """Refuse a cache file another user could have written: it must be a
+    regular file owned by this user and not writable by group or others."""
+    st = os.lstat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise OSError(f'{path} is not a regular file')
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise OSError(f'{path} is owned by another user')
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise OSError(f'{path} is writable by other users')
+
+
+class SQLiteCache:
+    """Shared tier: JSON-encoded entries and tag versions in one SQLite file.
+
+    Each thread keeps its own connection. The file is created readable by
+    its owner only, and an existing file (or its -wal/-shm companions) is
+    refused unless this user owns it and nobody else can write it. namespace
+    keeps apps pointed at different databases apart when they share the file.
+    """
+
+    def __init__(self, path, namespace='', default_ttl=30):
+        self.path = path
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+        except FileExistsError:
+            pass
+        for name in (path, path + '-wal', path + '-shm'):
+            if os.path.lexists(name):
+                _check_owned(name)
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_entries ('
+                     'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_tags ('
+                     'tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def get(self, key, default=None):
+        """Return (value, seconds left) for key, or default on a miss."""
+        row = self._conn().execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?',
+            (self._key(key),)).fetchone()
+        if row is None:
+            return default
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return default
+        try:
+            return _decode(json.loads(row[0])), remaining
+        except (ValueError, TypeError, KeyError):
+            self.delete(key)
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store value; raises TypeError if it holds a type JSON can't carry."""
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._conn().execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)',
+            (self._key(key), json.dumps(_encode(value), separators=(',', ':')), expires))
+
+    def delete(self, *keys):
+        self._conn().executemany('DELETE FROM cache_entries WHERE key = ?',
+                                 [(self._key(k),) for k in keys])
+
+    def delete_prefix(self, *prefixes):
+        for prefix in prefixes:
+            pattern = self._key(prefix).replace('\\', '\\\\').replace(
+                '%', '\\%').replace('_', '\\_') + '%'
+            self._conn().execute(
+                "DELETE FROM cache_entries WHERE key LIKE ? ESCAPE '\\'", (pattern,))
+
+    def clear(self):
+        self.delete_prefix('')
+        self.purge()
+
+    def purge(self):
+        """Delete expired entries from every namespace."""
+        self._conn().execute('DELETE FROM cache_entries WHERE expires < ?', (time.time(),))
+
+    def count(self):
+        return self._conn().execute('SELECT count(*) FROM cache_entries').fetchone()[0]
+
+    def tag_versions(self, tags):
+        names = [self._key(t) for t in tags]
+        rows = self._conn().execute(
+            f"SELECT tag, version FROM cache_tags WHERE tag IN ({','.join('?' * len(names))})",
+            names).fetchall()
+        versions = dict(rows)
+        return {t: versions.get(self._key(t), 0) for t in tags}
+
+    def bump_tags(self, tags):
+        self._conn().executemany(
+            'INSERT INTO cache_tags (tag, version) VALUES (?, 1) '
+            'ON CONFLICT(tag) DO UPDATE SET version = version + 1',
+            [(self._key(t),) for t in tags])
+
+
+class Cache:
+    """Two-tier cache with tag invalidation and hit/miss counters.
+
+    Values are stored as (tag stamp, value); a read whose stamp no longer
+    matches the current tag versions counts as a miss. Without a shared
+    tier, tag versions are kept in-process and only this worker sees them.
+    """
+
+    def __init__(self, default_ttl=30, max_entries=2048):
+        self.default_ttl = default_ttl
+        self.local = TTLCache(default_ttl, max_entries)
+        self.shared = None
+        self._tag_versions = {}
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0,
+                       'sets': 0, 'tag_invalidations': 0, 'shared_errors': 0}
+
+    def init_app(self, app):
+        """Open the shared tier and hook tag invalidation into the session."""
+        from app import db
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', self.default_ttl)
+        self.local.default_ttl = self.default_ttl
+        self.shared = None
+        path = app.config.get('CACHE_SHARED_PATH')
+        if path:
+            namespace = hashlib.sha1(
+                str(app.config.get('SQLALCHEMY_DATABASE_URI')).encode()).hexdigest()[:8]
+            try:
+                self.shared = SQLiteCache(path, namespace, self.default_ttl)
+            except (OSError, sqlite3.Error) as exc:
+                app.logger.warning(f'Shared cache at {path} unavailable, '
+                                   f'using in-process cache only: {exc}')
+        if not event.contains(db.session, 'after_commit', _invalidate_written_tables):
+            event.listen(db.session, 'after_flush', _collect_flushed_tables)
+            event.listen(db.session, 'do_orm_execute', _collect_executed_table)
+            event.listen(db.session, 'after_commit', _invalidate_written_tables)
+            event.listen(db.session, 'after_rollback', _discard_written_tables)
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def _shared_call(self, method, *args, default=None):
+        """Run a shared-tier operation; a locked or broken file, or a value
+        JSON can't carry, degrades to a miss instead of failing the request."""
+        if self.shared is None:
+            return default
+        try:
+            return getattr(self.shared, method)(*args)
+        except (sqlite3.Error, TypeError):
+            self._count('shared_errors')
+            return default
+
+    def tag_versions(self, tags):
+        if not tags:
+            return {}
+        versions = self._shared_call('tag_versions', tags)
+        if versions is not None:
+            return versions
+        with self._lock:
+            return {t: self._tag_versions.get(t, 0) for t in tags}
+
+    def invalidate_tags(self, *tags):
+        """Expire every entry stamped with any of tags, in all workers."""
+        if not tags:
+            return
+        with self._lock:
+            for t in tags:
+                self._tag_versions[t] = self._tag_versions.get(t, 0) + 1
+            self._stats['tag_invalidations'] += len(tags)
+        self._shared_call('bump_tags', tags)
+
+    def get(self, key, default=None):
+        entry = self.local.get(key, _MISSING)
+        stat = 'local_hits'
+        if entry is _MISSING:
+            found = self._shared_call('get', key, _MISSING, default=_MISSING)
+            if found is not _MISSING:
+                entry, remaining = found
+                self.local.set(key, entry, min(remaining, self.local.default_ttl))
+                stat = 'shared_hits'
+        if entry is not _MISSING:
+            stamp, value = entry
+            if not stamp or self.tag_versions(list(stamp)) == stamp:
+                self._count(stat)
+                return value
+            self.local.delete(key)
+        self._count('misses')
+        return default
+
+    def set(self, key, value, ttl=None, tags=(), stamp=None):
+        """Store value; stamp defaults to the tags' current versions."""
+        if stamp is None:
+            stamp = self.tag_versions(list(tags))
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = (stamp, value)
+        self.local.set(key, entry, ttl)
+        self._shared_call('set', key, entry, ttl)
+        self._count('sets')
+
+    def get_or_set(self, key, factory, ttl=None, tags=()):
+        """Return the cached value for key, computing and storing it with
+        factory() on a miss. Tag versions are read before factory() runs, so
+        a write that commits meanwhile still invalidates the result."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            stamp = self.tag_versions(list(tags))
+            value = factory()
+            self.set(key, value, ttl, stamp=stamp)
+        return value
+
+    def memoize(self, ttl=None, tags=(), prefix=None):
+        """Cache a function's return value per argument tuple.
+
+            @cache.memoize(ttl=300, tags=('students', 'marks'))
+            def top_performers(limit=10): ...
+
+        Arguments must have a stable repr(). fn.uncached(...) bypasses the
+        cache and fn.invalidate(...) drops one argument tuple.
+        """
+        def decorator(fn):
+            name = prefix or f'memo:{fn.__module__}.{fn.__qualname__}'
+
+            def make_key(args, kwargs):
+                raw = repr((args, sorted(kwargs.items())))
+                if len(raw) > 200:
+                    raw = hashlib.sha1(raw.encode()).hexdigest()
+                return f'{name}:{raw}'
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.get_or_set(make_key(args, kwargs),
+                                       lambda: fn(*args, **kwargs), ttl, tags)
+
+            wrapper.uncached = fn
+            wrapper.invalidate = lambda *a, **kw: self.delete(make_key(a, kw))
+            return wrapper
+        return decorator
+
+    def delete(self, *keys):
+        self.local.delete(*keys)
+        self._shared_call('delete', *keys)
+
+    def delete_prefix(self, *prefixes):
+        """Drop keys by prefix in the shared tier and in this worker. Other
+        workers keep their in-process copies until the TTL; use tags when
+        that matters."""
+        self.local.delete_prefix(*prefixes)
+        self._shared_call('delete_prefix', *prefixes)
+
+    def clear(self):
+        self.local.clear()
+        self._shared_call('clear')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats['local_hits'] + stats['shared_hits']
+        lookups = hits + stats['misses']
+        stats.update({
+            'hits': hits,
+            'hit_rate': round(hits / lookups * 100, 1) if lookups else 0,
+            'local_entries': len(self.local),
+            'shared': self.shared.path if self.shared else None,
+            'shared_entries': self._shared_call('count'),
+        })
+        return stats
+
+
+cache = Cache()
+
+
+# ─── Session hooks: written tables become invalidated tags ───────────────────
+
+def _written_tables(session):
+    return session.info.setdefault('cache_tags', set())
+
+
+def _collect_flushed_tables(session, flush_context):
+    tables = _written_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            tables.add(table)
+
+
+def _collect_executed_table(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE statements bypass the flush."""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _written_tables(orm_execute_state.session).add(table.name)
+
+
+def _invalidate_written_tables(session):
+    tables = session.info.pop('cache_tags', None)
+    if tables:
+        cache.invalidate_tags(*sorted(tables))
+
+
+def _discard_written_tables(session):
+    session.info.pop('cache_tags', None)
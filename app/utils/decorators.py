@@ -5,6 +5,9 @@ from functools import wraps
 from flask import flash, redirect, url_for
 from flask_login import current_user
 
+STAFF_ROLES = frozenset({'admin', 'principal', 'hod', 'teacher', 'accountant',
+                         'receptionist', 'librarian'})
+
 
 def admin_required(f):
     @wraps(f)
@@ -18,8 +21,6 @@ def admin_required(f):
 
 def staff_required(f):
     """Allow admin, principal, hod, teacher, accountant, receptionist, librarian"""
-    STAFF_ROLES = {'admin', 'principal', 'hod', 'teacher', 'accountant', 'receptionist', 'librarian'}
-
     @wraps(f)
     def decorated(*args, **kwargs):
         if not current_user.is_authenticated or current_user.role not in STAFF_ROLES:
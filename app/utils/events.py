@@ -0,0 +1,79 @@
+"""
+In-process publish/subscribe for live dashboard counters.
+
+Writers record counter deltas on the session with record_counter_delta();
+they are published to every open dashboard stream only once the
+transaction commits, and dropped if it rolls back.
+"""
+import queue
+import threading
+from datetime import date
+from sqlalchemy import event
+from app import db
+
+
+class EventBroker:
+    """Fan-out of (event, data) messages to subscriber queues.
+
+    In-process only: a stream sees what its own worker commits. A
+    subscriber that falls behind has its backlog replaced by a single
+    'resync' message, telling the client to reload absolute values.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, limit=None):
+        """A new subscriber queue, or None when limit subscribers are
+        already open."""
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event_name, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event_name, data))
+            except queue.Full:
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(('resync', {}))
+
+
+broker = EventBroker()
+
+
+def record_counter_delta(**deltas):
+    """Queue dashboard counter changes (e.g. books_issued=1) for publishing
+    when the current transaction commits."""
+    pending = db.session.info.setdefault('counter_deltas', {})
+    for name, value in deltas.items():
+        if value:
+            pending[name] = pending.get(name, 0) + value
+
+
+def _publish_pending(session):
+    deltas = session.info.pop('counter_deltas', None)
+    if deltas:
+        broker.publish('counters', {'date': date.today().isoformat(), 'deltas': deltas})
+
+
+def _discard_pending(session):
+    session.info.pop('counter_deltas', None)
+
+
+def init_app(app):
+    if not event.contains(db.session, 'after_commit', _publish_pending):
+        event.listen(db.session, 'after_commit', _publish_pending)
+        event.listen(db.session, 'after_rollback', _discard_pending)
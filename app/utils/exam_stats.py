@@ -0,0 +1,182 @@
+"""
+Exam statistics for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Built on the students x subjects marks matrix from app.utils.results: per
+subject mean, median, standard deviation, range, pass rate against the
+exam subject's passing marks and a grade histogram; for the exam as a whole
+the grade histogram, pass rate and a merit list with overall and class
+positions and percentile ranks. Columns are reduced with NumPy when it is
+installed, otherwise with the statistics module.
+
+The result is a plain dict (it is also the JSON API's body), cached per
+exam until marks, exam subjects or students change.
+"""
+import statistics
+from bisect import bisect_left, bisect_right
+from app import db
+from app.utils.cache import cache
+from app.utils.reference import reference_data
+from app.utils import results
+from app.utils.results import GRADE_BOUNDS, GRADE_LABELS
+
+STATS_TTL = 600
+STATS_TAGS = ('marks', 'exam_subjects', 'exams', 'students', 'class_sections')
+GRADES = list(reversed(GRADE_LABELS))  # best first, as tables show them
+
+
+def _histogram(grade_indexes):
+    """{grade: count} from GRADE_LABELS indexes."""
+    if results.NUMPY_AVAILABLE:
+        counts = results.np.bincount(results.np.asarray(grade_indexes, dtype=int),
+                                     minlength=len(GRADE_LABELS)).tolist()
+    else:
+        counts = [0] * len(GRADE_LABELS)
+        for g in grade_indexes:
+            counts[g] += 1
+    return dict(zip(GRADE_LABELS, counts))
+
+
+def _subject_numpy(column, es):
+    np = results.np
+    values = column[~np.isnan(column)]
+    if not values.size:
+        return None
+    total = es.total_marks or 0
+    grades = np.searchsorted(GRADE_BOUNDS, values * (100 / total), side='right') if total else []
+    return {
+        'mean': float(values.mean()), 'median': float(np.median(values)),
+        'std': float(values.std()), 'min': float(values.min()), 'max': float(values.max()),
+        'entered': int(values.size), 'passed': int((values >= (es.passing_marks or 0)).sum()),
+        'grades': _histogram(grades),
+    }
+
+
+def _subject_python(column, es):
+    values = [m for m in column if m == m]  # drop NaN
+    if not values:
+        return None
+    total = es.total_marks or 0
+    grades = [bisect_right(GRADE_BOUNDS, m * 100 / total) for m in values] if total else []
+    return {
+        'mean': statistics.fmean(values), 'median': statistics.median(values),
+        'std': statistics.pstdev(values), 'min': min(values), 'max': max(values),
+        'entered': len(values), 'passed': sum(1 for m in values if m >= (es.passing_marks or 0)),
+        'grades': _histogram(grades),
+    }
+
+
+def _percentiles(totals):
+    """Percentile rank of each total: the share of students below it, with
+    ties counted half."""
+    count = len(totals)
+    if results.NUMPY_AVAILABLE and count:
+        np = results.np
+        values = np.asarray(totals)
+        ordered = np.sort(values)
+        below = np.searchsorted(ordered, values, side='left')
+        tied = np.searchsorted(ordered, values, side='right') - below
+        return ((below + tied / 2) * 100 / count).tolist()
+    # Same operations in the same order as above, so both round alike.
+    ordered = sorted(totals)
+    return [(bisect_left(ordered, t) + (bisect_right(ordered, t) - bisect_left(ordered, t)) / 2)
+            * 100 / count for t in totals]
+
+
+def _class_positions(order, totals, class_ids):
+    """Position of each student within their class (ties share it); order
+    is every row index best first."""
+    positions = [0] * len(totals)
+    placed, previous = {}, {}  # per class: students placed so far, the last one placed
+    for i in order:
+        klass = class_ids[i]
+        placed[klass] = placed.get(klass, 0) + 1
+        before = previous.get(klass)
+        tied = before is not None and totals[before] == totals[i]
+        positions[i] = positions[before] if tied else placed[klass]
+        previous[klass] = i
+    return positions
+
+
+def _build(exam):
+    from app.models import Student
+    exam_subjects, student_ids, obtained = results.load_matrix(exam)
+    count, width = len(student_ids), len(exam_subjects)
+    possible = sum(es.total_marks or 0 for es in exam_subjects)
+    passing = [es.passing_marks or 0 for es in exam_subjects]
+    totals, pct, grades, passed, ranks, order = results.compute(obtained, count, possible, passing)
+
+    if results.NUMPY_AVAILABLE and count:
+        matrix = results.np.frombuffer(obtained, dtype='float64').reshape(count, width)
+        columns = [(matrix[:, j], _subject_numpy) for j in range(width)]
+    else:
+        columns = [(obtained[j::width] if count else [], _subject_python) for j in range(width)]
+    subjects = []
+    for es, (column, reduce) in zip(exam_subjects, columns):
+        stats = reduce(column, es) if count else None
+        total = es.total_marks or 0
+        subjects.append({
+            'subject_id': es.subject_id,
+            'name': es.subject.name if es.subject else 'Subject',
+            'total_marks': total,
+            'passing_marks': es.passing_marks or 0,
+            'entered': stats['entered'] if stats else 0,
+            'missing': count - (stats['entered'] if stats else 0),
+            'mean': round(stats['mean'], 2) if stats else None,
+            'median': round(stats['median'], 2) if stats else None,
+            'std': round(stats['std'], 2) if stats else None,
+            'min': stats['min'] if stats else None,
+            'max': stats['max'] if stats else None,
+            'mean_pct': round(stats['mean'] * 100 / total, 1) if stats and total else None,
+            'pass_rate': round(stats['passed'] * 100 / stats['entered'], 1) if stats else None,
+            'grades': stats['grades'] if stats else _histogram([]),
+        })
+
+    students = {s.id: s for s in db.session.query(
+        Student.id, Student.reg_no, Student.full_name, Student.class_section_id
+    ).filter(Student.id.in_(student_ids))} if student_ids else {}
+    classes = reference_data().classes_by_id
+    class_ids = [students[sid].class_section_id for sid in student_ids]
+    percentiles = _percentiles(totals)
+    class_positions = _class_positions(order, totals, class_ids)
+    merit = []
+    for i in order:
+        student = students[student_ids[i]]
+        merit.append({
+            'position': ranks[i],
+            'class_position': class_positions[i],
+            'student_id': student.id,
+            'reg_no': student.reg_no,
+            'name': student.full_name,
+            'class_name': classes[class_ids[i]].display_name if class_ids[i] in classes else 'N/A',
+            'total': round(totals[i], 2),
+            'percentage': round(pct[i], 1),
+            'grade': GRADE_LABELS[grades[i]] if possible else 'N/A',
+            'percentile': round(percentiles[i], 1),
+            'status': 'Pass' if passed[i] else 'Fail',
+        })
+
+    passed_count = sum(1 for p in passed if p)
+    return {
+        'exam': {'id': exam.id, 'name': exam.name, 'academic_year': exam.academic_year},
+        'grades': GRADES,
+        'overall': {
+            'students': count,
+            'total_marks': possible,
+            'passed': passed_count,
+            'failed': count - passed_count,
+            'pass_rate': round(passed_count * 100 / count, 1) if count else None,
+            'mean_pct': round(statistics.fmean(pct), 1) if count else None,
+            'median_pct': round(statistics.median(pct), 1) if count else None,
+            'std_pct': round(statistics.pstdev(pct), 1) if count else None,
+            'top_pct': round(max(pct), 1) if count else None,
+            'grades': _histogram(grades if possible else []),
+        },
+        'subjects': subjects,
+        'merit': merit,
+    }
+
+
+def exam_statistics(exam):
+    """Statistics and merit list of an exam, cached until its inputs change."""
+    return cache.get_or_set(f'exams:stats:{exam.id}', lambda: _build(exam),
+                            ttl=STATS_TTL, tags=STATS_TAGS)
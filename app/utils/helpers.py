@@ -2,66 +2,89 @@
 Utility helpers for AI-Powered Institutional Management & Face Recognition Attendance System
 """
 from datetime import date
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from app import db
 
 
+def _highest_existing(column, prefix):
+    """Largest number already used after prefix in column, or 0."""
+    rows = db.session.query(column).filter(column.like(f'{prefix}%')).order_by(
+        func.length(column).desc(), column.desc()).limit(1).all()
+    try:
+        return int(rows[0][0][len(prefix):]) if rows else 0
+    except ValueError:
+        return 0
+
+
+def next_number(prefix, column):
+    """Allocate the next number for prefix, in the caller's transaction.
+
+    One UPDATE ... RETURNING on the prefix's number_sequences row: it is
+    O(1) however large the table grows, and the row stays locked until the
+    caller commits, so concurrent requests get distinct numbers. A rollback
+    hands the number back. The first call for a prefix (a new year or day)
+    starts after the highest number already in column, so databases that
+    predate the sequence table carry on from where they were.
+    """
+    from app.models import NumberSequence
+    seq = NumberSequence.__table__
+    if db.session.get(NumberSequence, prefix) is None:
+        start = _highest_existing(column, prefix)
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            db.session.execute(dialect_insert(seq).values(prefix=prefix, value=start)
+                               .on_conflict_do_nothing(index_elements=['prefix']))
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(seq).values(prefix=prefix, value=start))
+            except IntegrityError:
+                pass  # another request created it first
+    stmt = update(seq).where(seq.c.prefix == prefix).values(value=seq.c.value + 1)
+    if db.session.get_bind().dialect.update_returning:
+        value = db.session.execute(stmt.returning(seq.c.value)).scalar_one()
+    else:
+        db.session.execute(stmt)
+        value = db.session.execute(select(seq.c.value).where(seq.c.prefix == prefix)).scalar_one()
+    return value
+
+
 def generate_reg_no():
     """Generate student registration number: MTB-YYYY-XXXX"""
     from app.models import Student
-    year = date.today().year
-    prefix = f'MTB-{year}-'
-    last = Student.query.filter(Student.reg_no.like(f'{prefix}%')).order_by(
-        Student.id.desc()).first()
-    if last:
-        try:
-            seq = int(last.reg_no.split('-')[-1]) + 1
-        except ValueError:
-            seq = 1
-    else:
-        seq = 1
-    return f'{prefix}{seq:04d}'
+    prefix = f'MTB-{date.today().year}-'
+    return f'{prefix}{next_number(prefix, Student.reg_no):04d}'
 
 
 def generate_employee_id():
     """Generate teacher employee ID: EMP-YYYY-XXXX"""
     from app.models import Teacher
-    year = date.today().year
-    prefix = f'EMP-{year}-'
-    last = Teacher.query.filter(Teacher.employee_id.like(f'{prefix}%')).order_by(
-        Teacher.id.desc()).first()
-    if last:
-        try:
-            seq = int(last.employee_id.split('-')[-1]) + 1
-        except ValueError:
-            seq = 1
-    else:
-        seq = 1
-    return f'{prefix}{seq:04d}'
+    prefix = f'EMP-{date.today().year}-'
+    return f'{prefix}{next_number(prefix, Teacher.employee_id):04d}'
 
 
 def generate_receipt_no():
     """Generate fee receipt number: RCP-YYYYMMDD-XXXX"""
     from app.models import FeePayment
-    today_str = date.today().strftime('%Y%m%d')
-    prefix = f'RCP-{today_str}-'
-    count = FeePayment.query.filter(FeePayment.receipt_no.like(f'{prefix}%')).count()
-    return f'{prefix}{count + 1:04d}'
+    prefix = f'RCP-{date.today().strftime("%Y%m%d")}-'
+    return f'{prefix}{next_number(prefix, FeePayment.receipt_no):04d}'
+
+
+# (lowest percentage, grade), best first; anything below the last is an F
+GRADE_THRESHOLDS = ((90, 'A+'), (80, 'A'), (70, 'B'), (60, 'C'), (50, 'D'))
 
 
 def calculate_grade(percentage):
     """Return letter grade based on percentage"""
-    if percentage >= 90:
-        return 'A+'
-    elif percentage >= 80:
-        return 'A'
-    elif percentage >= 70:
-        return 'B'
-    elif percentage >= 60:
-        return 'C'
-    elif percentage >= 50:
-        return 'D'
-    else:
-        return 'F'
+    for lowest, grade in GRADE_THRESHOLDS:
+        if percentage >= lowest:
+            return grade
+    return 'F'
 
 
 def calculate_grade_from_marks(obtained, total):
@@ -84,6 +107,38 @@ def paginate_query(query, page, per_page=15):
     return query.paginate(page=page, per_page=per_page, error_out=False)
 
 
+class ListPagination:
+    """The parts of Flask-SQLAlchemy's Pagination the templates use, over
+    a list that is already in memory (e.g. a cached report)."""
+
+    def __init__(self, items, page, per_page):
+        self.total = len(items)
+        self.per_page = per_page
+        self.pages = max((self.total + per_page - 1) // per_page, 1)
+        self.page = min(max(page, 1), self.pages)
+        start = (self.page - 1) * per_page
+        self.items = items[start:start + per_page]
+        self.has_prev = self.page > 1
+        self.has_next = self.page < self.pages
+        self.prev_num = self.page - 1 if self.has_prev else None
+        self.next_num = self.page + 1 if self.has_next else None
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        last = 0
+        for num in range(1, self.pages + 1):
+            if (num <= left_edge or num > self.pages - right_edge
+                    or self.page - left_current <= num <= self.page + right_current):
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+
+def paginate_list(items, page, per_page=15):
+    """Paginate an in-memory list"""
+    return ListPagination(items, page, per_page)
+
+
 def log_activity(action, module=None, details=None, user_id=None):
     """Log user activity"""
     from app.models import ActivityLog
@@ -107,9 +162,27 @@ def get_months():
             'July', 'August', 'September', 'October', 'November', 'December']
 
 
+def month_range(year, month):
+    """Return the half-open [start, end) date range of a calendar month.
+    Filter with `col >= start, col < end` rather than extract(month/year)
+    so the column's index can serve the query."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def shift_month(year, month, delta):
+    """Return (year, month) moved by delta calendar months."""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def academic_year_of(year, month):
+    """The academic year (April to March) a month belongs to, e.g. '2025-26'."""
+    start = year if month >= 4 else year - 1
+    return f'{start}-{str(start + 1)[2:]}'
+
+
 def get_current_academic_year():
     today = date.today()
-    if today.month >= 4:
-        return f'{today.year}-{str(today.year + 1)[2:]}'
-    else:
-        return f'{today.year - 1}-{str(today.year)[2:]}'
+    return academic_year_of(today.year, today.month)
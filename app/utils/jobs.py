@@ -0,0 +1,259 @@
+"""
+Background jobs for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Long exports, batch PDFs and report rebuilds are queued as rows in the
+jobs table and run by `flask jobs-worker`, outside any request timeout.
+Handlers are registered with @job_handler next to the routes they serve;
+results are written under JOB_RESULTS_FOLDER and downloaded from
+/jobs/<id>/download until JOB_RETENTION_HOURS after they finish.
+"""
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import insert, literal, select, update, func
+from app import db
+
+JOB_HANDLERS = {}
+
+PROGRESS_INTERVAL = 1.0  # seconds between progress commits
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobLimitError(Exception):
+    """The user already has the maximum number of unfinished jobs."""
+
+
+class JobHandler:
+    def __init__(self, kind, fn, label, roles=None):
+        self.kind = kind
+        self.fn = fn
+        self.label = label
+        self.roles = set(roles) if roles else None
+        # The keyword parameters fn takes after ctx: the only ones a job may carry.
+        params = list(inspect.signature(fn).parameters.values())[1:]
+        self.params = tuple(p.name for p in params)
+        self.required = tuple(p.name for p in params if p.default is inspect.Parameter.empty)
+
+    def allowed_for(self, user):
+        return self.roles is None or user.role in self.roles
+
+    def pick_params(self, values):
+        """The handler's own parameters from values (e.g. request.form),
+        leaving out blanks and any field the handler does not take."""
+        return {name: values[name] for name in self.params
+                if name in values and values[name] != ''}
+
+
+def job_handler(kind, label, roles=None):
+    """Register fn(ctx, **params) as the runner for jobs of this kind.
+    roles limits who may queue it (default: anyone who can reach the UI)."""
+    def decorator(fn):
+        JOB_HANDLERS[kind] = JobHandler(kind, fn, label, roles)
+        return fn
+    return decorator
+
+
+def enqueue_job(kind, user, **params):
+    """Queue a job for user and return it. The caller commits.
+
+    Raises KeyError for an unknown kind, PermissionError when the user's
+    role may not run it, ValueError for parameters the handler does not
+    take or a missing required one, and JobLimitError past
+    JOB_MAX_ACTIVE_PER_USER.
+
+    The limit is checked by the INSERT itself (INSERT ... SELECT ... WHERE
+    the user's active count is below it) after locking the user's row, so
+    two requests from the same user cannot both slip under it.
+    """
+    from flask import current_app
+    from app.models import Job, User
+    handler = JOB_HANDLERS[kind]
+    if not handler.allowed_for(user):
+        raise PermissionError(kind)
+    unexpected = sorted(set(params) - set(handler.params))
+    if unexpected:
+        raise ValueError(f'{handler.label} does not take {", ".join(unexpected)}.')
+    missing = [name for name in handler.required if name not in params]
+    if missing:
+        raise ValueError(f'{handler.label} needs {", ".join(missing)}.')
+
+    limit = current_app.config.get('JOB_MAX_ACTIVE_PER_USER', 2)
+    # Held until the caller commits (Postgres); SQLite serialises at the INSERT.
+    db.session.execute(select(User.id).where(User.id == user.id).with_for_update())
+    active = select(func.count(Job.id)).where(
+        Job.created_by == user.id, Job.status.in_(ACTIVE_STATUSES)).scalar_subquery()
+    row = select(literal(kind, Job.kind.type), literal(json.dumps(params), Job.params.type),
+                 literal(user.id, Job.created_by.type),
+                 literal('Waiting for a worker', Job.message.type)).where(active < limit)
+    stmt = insert(Job).from_select(['kind', 'params', 'created_by', 'message'], row)
+    if db.session.get_bind().dialect.insert_returning:
+        inserted = db.session.execute(stmt.returning(Job.id)).scalar()
+    elif db.session.execute(stmt).rowcount:
+        inserted = db.session.query(func.max(Job.id)).filter(Job.created_by == user.id).scalar()
+    else:
+        inserted = None
+    if inserted is None:
+        raise JobLimitError(f'You already have {limit} jobs waiting or running '
+                            f'(limit {limit}). Try again when one finishes.')
+    return db.session.get(Job, inserted)
+
+
+class JobContext:
+    """Handed to a job handler: progress reporting and result files."""
+
+    def __init__(self, job, folder):
+        self.job = job
+        self.folder = folder
+        self._last_commit = 0.0
+
+    def progress(self, done, total=None, message=None, force=False):
+        """Record progress; committed at most once per PROGRESS_INTERVAL."""
+        self.job.progress = done
+        if total is not None:
+            self.job.total = total
+        if message is not None:
+            self.job.message = message[:255]
+        now = time.monotonic()
+        if force or now - self._last_commit >= PROGRESS_INTERVAL:
+            self.job.updated_at = datetime.utcnow()
+            db.session.commit()
+            self._last_commit = now
+
+    def track(self, items, total, message=None):
+        """Yield from items, reporting progress as they are consumed."""
+        self.progress(0, total, message, force=True)
+        done = 0
+        for item in items:
+            yield item
+            done += 1
+            self.progress(done)
+        self.progress(done, force=True)
+
+    def open_result(self, filename, mimetype):
+        """Open the job's downloadable result file for binary writing."""
+        os.makedirs(self.folder, exist_ok=True)
+        self.job.result_path = os.path.join(self.folder, f'job_{self.job.id}_{filename}')
+        self.job.result_name = filename
+        self.job.result_mimetype = mimetype
+        return open(self.job.result_path, 'wb')
+
+    def write_result(self, filename, chunks, mimetype):
+        """Write an iterable of byte chunks as the job's downloadable result."""
+        with self.open_result(filename, mimetype) as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        return self.job.result_path
+
+
+def claim_next_job(worker_name):
+    """Atomically move the oldest queued job to 'running'. Returns it or None.
+
+    The conditional UPDATE ... WHERE status = 'queued' is what makes this
+    safe with several workers: only one of them can change the row."""
+    from app.models import Job
+    while True:
+        job_id = db.session.query(Job.id).filter(Job.status == 'queued').order_by(
+            Job.id).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == 'queued').values(
+                status='running', worker=worker_name, started_at=now, updated_at=now,
+                message='Started'),
+            execution_options={'synchronize_session': False}).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+
+def run_job(job, folder):
+    """Run one claimed job to completion, recording done or failed."""
+    handler = JOB_HANDLERS.get(job.kind)
+    ctx = JobContext(job, folder)
+    try:
+        if handler is None:
+            raise KeyError(f'No handler registered for job kind {job.kind!r}')
+        handler.fn(ctx, **json.loads(job.params or '{}'))
+        job.status = 'done'
+        if job.message == 'Started':
+            job.message = 'Finished'
+    except Exception as exc:
+        db.session.rollback()
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        job.result_path = None
+        job.status = 'failed'
+        job.message = str(exc)[:255] or exc.__class__.__name__
+        job.error = traceback.format_exc()
+    job.finished_at = job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def cleanup_jobs(retention_hours, stale_minutes=30):
+    """Delete finished jobs (and their files) older than retention_hours and
+    fail running jobs whose worker stopped reporting. Returns (removed, failed)."""
+    from app.models import Job
+    now = datetime.utcnow()
+    stale = Job.query.filter(Job.status == 'running',
+                             Job.updated_at < now - timedelta(minutes=stale_minutes)).all()
+    for job in stale:
+        job.status = 'failed'
+        job.message = 'Worker stopped responding'
+        job.finished_at = now
+    expired = Job.query.filter(Job.status.in_(('done', 'failed')),
+                               Job.finished_at < now - timedelta(hours=retention_hours)).all()
+    for job in expired:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(expired), len(stale)
+
+
+def run_worker(app, threads=1, once=False, poll=2.0, cleanup_every=600):
+    """Process jobs with `threads` worker threads until interrupted, or
+    until the queue is empty when once=True."""
+    folder = app.config['JOB_RESULTS_FOLDER']
+    retention = app.config.get('JOB_RETENTION_HOURS', 24)
+    stop = threading.Event()
+    base_name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def loop(index):
+        name = f'{base_name}:{index}'
+        while not stop.is_set():
+            with app.app_context():
+                job = claim_next_job(name)
+                if job is not None:
+                    app.logger.info(f'[{name}] job {job.id} ({job.kind}) started')
+                    run_job(job, folder)
+                    app.logger.info(f'[{name}] job {job.id} {job.status}')
+                    continue
+            if once:
+                return
+            stop.wait(poll)
+
+    with app.app_context():
+        cleanup_jobs(retention)
+    workers = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(threads)]
+    for w in workers:
+        w.start()
+    last_cleanup = time.monotonic()
+    try:
+        while any(w.is_alive() for w in workers):
+            for w in workers:
+                w.join(timeout=poll)
+            if time.monotonic() - last_cleanup > cleanup_every:
+                with app.app_context():
+                    cleanup_jobs(retention)
+                last_cleanup = time.monotonic()
+    except KeyboardInterrupt:
+        stop.set()
+        for w in workers:
+            w.join()
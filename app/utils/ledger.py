@@ -0,0 +1,361 @@
+"""
+Fee ledger for AI-Powered Institutional Management & Face Recognition Attendance System
+
+fee_charges holds what each student is expected to pay per month, generated
+from the active fee structures. fee_ledger holds one row per student and
+month with the month's charged and paid totals and the running balance.
+The ledger is updated in the same transaction as the write that changes it,
+so balances, dues and collection totals are read from a few indexed rows
+instead of being recomputed from every payment. rebuild_ledger() derives
+it from scratch, and reconcile() compares the two.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from sqlalchemy import (select, insert, update, delete, exists, func, case, extract,
+                        literal, union_all, or_)
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.utils.cache import cache
+from app.utils.helpers import get_months, month_range, academic_year_of
+from app.utils.reference import reference_data
+
+MONTH_NUMBERS = {name: number for number, name in enumerate(get_months(), 1)}
+REBUILD_THRESHOLD = 50  # above this many students, rebuild instead of row updates
+TOLERANCE = 0.005  # amounts are floats; differences below a paisa are equal
+
+
+def period_of(year, month):
+    return year * 12 + month - 1
+
+
+def period_label(period):
+    return f'{get_months()[period % 12]} {period // 12}'
+
+
+def payment_period(payment):
+    """The month a payment is for: its month/year fields, else its date."""
+    paid_on = payment.payment_date or date.today()
+    month = MONTH_NUMBERS.get(payment.month) or paid_on.month
+    return period_of(payment.year or paid_on.year, month)
+
+
+def _charged_in(structure, month):
+    """Whether a fee structure bills in this calendar month. The academic
+    year starts in April; one-time fees are not generated."""
+    if structure.frequency == 'monthly':
+        return True
+    if structure.frequency == 'quarterly':
+        return month in (4, 7, 10, 1)
+    if structure.frequency == 'annual':
+        return month == 4
+    return False
+
+
+# ─── Incremental updates ─────────────────────────────────────────────────────
+
+def _apply(student_id, period, charged=0.0, paid=0.0):
+    """Add to a student's month and carry the change into later balances."""
+    from app.models import FeeLedger
+    led = FeeLedger.__table__
+    delta = charged - paid
+    now = datetime.utcnow()
+    updated = db.session.execute(update(led).where(
+        led.c.student_id == student_id, led.c.period == period
+    ).values(charged=led.c.charged + charged, paid=led.c.paid + paid,
+             balance=led.c.balance + delta, updated_at=now)).rowcount
+    if not updated:
+        previous = db.session.execute(select(led.c.balance).where(
+            led.c.student_id == student_id, led.c.period < period
+        ).order_by(led.c.period.desc()).limit(1)).scalar() or 0
+        db.session.execute(insert(led).values(
+            student_id=student_id, period=period, year=period // 12, month=period % 12 + 1,
+            charged=charged, paid=paid, balance=previous + delta, updated_at=now))
+    if delta:
+        db.session.execute(update(led).where(
+            led.c.student_id == student_id, led.c.period > period
+        ).values(balance=led.c.balance + delta, updated_at=now))
+
+
+def post_payment(payment):
+    """Record a new FeePayment in the ledger. The caller commits."""
+    period = payment_period(payment)
+    student_id = int(payment.student_id)
+    ensure_charges(period // 12, period % 12 + 1, student_ids=[student_id])
+    _apply(student_id, period, paid=payment.total_paid or 0)
+
+
+def charging_structures(year, month):
+    """The active fee structures that bill in the month: those of its
+    academic year or, when that year has none yet, of the closest year that
+    has some - the latest earlier one, else the earliest later one - so a
+    fee schedule stays in force until the next year's is entered."""
+    structures = reference_data().fee_structures
+    years = sorted({fs.academic_year for fs in structures if fs.academic_year})
+    wanted = academic_year_of(year, month)
+    if wanted not in years:
+        earlier = [y for y in years if y < wanted]
+        wanted = earlier[-1] if earlier else (years[0] if years else None)
+    return [fs for fs in structures
+            if fs.academic_year == wanted and _charged_in(fs, month)]
+
+
+def ensure_charges(year, month, student_ids=None):
+    """Create the missing fee_charges rows for a month - for every active
+    student, or only student_ids - and add them to the ledger. Returns the
+    ids of the students charged. The caller commits.
+
+    Only write paths call this: recording a payment, `flask
+    fees-generate-charges` and the fee_charges job. Pages that show dues
+    read the charges that exist."""
+    from app.models import FeeCharge, Student, ClassSection
+    structures = charging_structures(year, month)
+    if not structures:
+        return set()
+    period = period_of(year, month)
+    month_end = month_range(year, month)[1]
+    charge = FeeCharge.__table__
+    now = datetime.utcnow()
+    new_rows = []
+    for fs in structures:
+        query = db.session.query(Student.id).filter(
+            Student.status == 'active',
+            or_(Student.admission_date.is_(None), Student.admission_date < month_end),
+            ~exists().where(charge.c.student_id == Student.id,
+                            charge.c.fee_structure_id == fs.id,
+                            charge.c.period == period))
+        if fs.class_name:  # no class on the structure means every class
+            query = query.join(ClassSection, ClassSection.id == Student.class_section_id).filter(
+                ClassSection.class_name == fs.class_name)
+        if student_ids is not None:
+            query = query.filter(Student.id.in_(student_ids))
+        new_rows.extend({'student_id': student_id, 'fee_structure_id': fs.id,
+                         'period': period, 'year': year, 'month': month,
+                         'amount': fs.amount, 'created_at': now} for (student_id,) in query)
+    if not new_rows:
+        return set()
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(charge), new_rows)
+    except IntegrityError:
+        return set()  # a concurrent request generated the same charges
+
+    charged = defaultdict(float)
+    for row in new_rows:
+        charged[row['student_id']] += row['amount']
+    if len(charged) > REBUILD_THRESHOLD:
+        rebuild_ledger(list(charged))
+    else:
+        for student_id, amount in charged.items():
+            _apply(student_id, period, charged=amount)
+    return set(charged)
+
+
+# ─── Derivation and reconciliation ───────────────────────────────────────────
+
+def _payment_period_expr(pay):
+    month = case(MONTH_NUMBERS, value=pay.c.month,
+                 else_=extract('month', pay.c.payment_date))
+    year = func.coalesce(pay.c.year, extract('year', pay.c.payment_date))
+    return year * 12 + month - 1
+
+
+def _derived_ledger(student_ids=None):
+    """SELECT of the ledger as it should be, computed from the raw rows."""
+    from app.models import FeeCharge, FeePayment
+    charge, pay = FeeCharge.__table__, FeePayment.__table__
+    pay_period = _payment_period_expr(pay)
+    charges = select(charge.c.student_id, charge.c.period.label('period'),
+                     charge.c.amount.label('charged'), literal(0.0).label('paid'))
+    payments = select(pay.c.student_id, pay_period.label('period'),
+                      literal(0.0).label('charged'), pay.c.total_paid.label('paid')
+                      ).where(pay_period.isnot(None))
+    if student_ids is not None:
+        charges = charges.where(charge.c.student_id.in_(student_ids))
+        payments = payments.where(pay.c.student_id.in_(student_ids))
+    entries = union_all(charges, payments).subquery()
+    monthly = select(
+        entries.c.student_id, entries.c.period,
+        func.sum(entries.c.charged).label('charged'),
+        func.coalesce(func.sum(entries.c.paid), 0).label('paid'),
+    ).group_by(entries.c.student_id, entries.c.period).subquery()
+    return select(
+        monthly.c.student_id, monthly.c.period,
+        (monthly.c.period // 12).label('year'), (monthly.c.period % 12 + 1).label('month'),
+        monthly.c.charged, monthly.c.paid,
+        func.sum(monthly.c.charged - monthly.c.paid).over(
+            partition_by=monthly.c.student_id, order_by=monthly.c.period).label('balance'),
+    )
+
+
+def rebuild_ledger(student_ids=None):
+    """Replace the ledger rows of student_ids (default: everyone) with ones
+    derived from fee_charges and fee_payments. Returns rows written.
+    The caller commits."""
+    from app.models import FeeLedger
+    led = FeeLedger.__table__
+    removal = delete(led)
+    if student_ids is not None:
+        removal = removal.where(led.c.student_id.in_(student_ids))
+    db.session.execute(removal)
+    derived = _derived_ledger(student_ids).subquery()
+    columns = ['student_id', 'period', 'year', 'month', 'charged', 'paid', 'balance']
+    db.session.execute(insert(led).from_select(
+        columns + ['updated_at'],
+        select(*[derived.c[name] for name in columns], literal(datetime.utcnow()))))
+    query = select(func.count()).select_from(led)
+    if student_ids is not None:
+        query = query.where(led.c.student_id.in_(student_ids))
+    return db.session.execute(query).scalar()
+
+
+def reconcile(fix=False, examples=10):
+    """Compare the stored ledger with one derived from the raw rows.
+    Returns {'rows', 'students', 'mismatched', 'examples'}; with fix=True
+    the mismatched students' rows are rebuilt (the caller commits)."""
+    from app.models import FeeLedger
+    led = FeeLedger.__table__
+    fields = ('charged', 'paid', 'balance')
+    expected = {(r.student_id, r.period): r for r in db.session.execute(_derived_ledger())}
+    stored = {(r.student_id, r.period): r for r in db.session.execute(
+        select(led.c.student_id, led.c.period, *[led.c[f] for f in fields]))}
+    mismatched, found = set(), []
+    for key in expected.keys() | stored.keys():
+        want, have = expected.get(key), stored.get(key)
+        if want is not None and have is not None and all(
+                abs((getattr(want, f) or 0) - (getattr(have, f) or 0)) < TOLERANCE for f in fields):
+            continue
+        mismatched.add(key[0])
+        if len(found) < examples:
+            found.append({
+                'student_id': key[0], 'month': period_label(key[1]),
+                'expected': {f: getattr(want, f) for f in fields} if want else None,
+                'stored': {f: getattr(have, f) for f in fields} if have else None,
+            })
+    if fix and mismatched:
+        rebuild_ledger(sorted(mismatched))
+    return {'rows': len(expected), 'students': len({k[0] for k in expected}),
+            'mismatched': len(mismatched), 'examples': found}
+
+
+# ─── Lookups ─────────────────────────────────────────────────────────────────
+
+@cache.memoize(ttl=300, tags=('fee_ledger',))
+def total_collected():
+    """All payments ever recorded."""
+    from app.models import FeeLedger
+    return float(db.session.query(func.sum(FeeLedger.paid)).scalar() or 0)
+
+
+# ─── Arrears ─────────────────────────────────────────────────────────────────
+
+AGEING_BUCKETS = ('current', 'one_month', 'two_months', 'older')  # age 0, 1, 2, 3+ months
+ARREARS_TTL = 300
+
+ArrearsRow = namedtuple('ArrearsRow', 'student_id outstanding months_behind oldest_period '
+                                      'current one_month two_months older')
+
+
+def _arrears_query(since, until, class_section_id=None):
+    """Per-student arrears over ledger months [since, until], in SQL.
+
+    Payments settle the oldest charges first, so what is still owed is the
+    newest charges that add up to the outstanding amount. For each month,
+    window sums over the student's rows give the outstanding total for the
+    range and the charges of the later months (all charges minus the
+    running total); the month's unpaid part is then
+    outstanding - later charges, clamped to [0, charged].
+    """
+    from app.models import FeeLedger, Student
+    led = FeeLedger.__table__
+    by_student = led.c.student_id
+    months = select(
+        led.c.student_id, led.c.period, led.c.charged,
+        func.sum(led.c.charged - led.c.paid).over(partition_by=by_student).label('outstanding'),
+        (func.sum(led.c.charged).over(partition_by=by_student)
+         - func.sum(led.c.charged).over(partition_by=by_student, order_by=led.c.period)
+         ).label('later_charged'),
+    ).where(led.c.period <= until)
+    if since is not None:
+        months = months.where(led.c.period >= since)
+    months = months.subquery()
+    left = months.c.outstanding - months.c.later_charged
+    unpaid = select(
+        months.c.student_id, months.c.period, months.c.outstanding,
+        (until - months.c.period).label('age'),
+        case((left <= 0, 0.0), (left >= months.c.charged, months.c.charged), else_=left
+             ).label('unpaid'),
+    ).subquery()
+
+    def bucket(condition):
+        return func.sum(case((condition, unpaid.c.unpaid), else_=0.0))
+
+    owing = unpaid.c.unpaid >= TOLERANCE
+    per_student = select(
+        unpaid.c.student_id,
+        func.max(unpaid.c.outstanding).label('outstanding'),
+        func.sum(case((owing, 1), else_=0)).label('months_behind'),
+        func.min(case((owing, unpaid.c.period))).label('oldest_period'),
+        bucket(unpaid.c.age == 0).label('current'),
+        bucket(unpaid.c.age == 1).label('one_month'),
+        bucket(unpaid.c.age == 2).label('two_months'),
+        bucket(unpaid.c.age >= 3).label('older'),
+    ).group_by(unpaid.c.student_id).having(
+        func.max(unpaid.c.outstanding) >= TOLERANCE).subquery()
+    query = select(*per_student.c).join(Student, Student.id == per_student.c.student_id).where(
+        Student.status == 'active')
+    if class_section_id:
+        query = query.where(Student.class_section_id == class_section_id)
+    return query.order_by(per_student.c.outstanding.desc(), per_student.c.student_id)
+
+
+def unpaid_estimate(period, class_section_id=None):
+    """{student_id: expected} for the active students who have neither
+    been charged nor paid anything for a month, each owing their class's
+    monthly tuition - the defaulters list as it was before the ledger, for
+    months (or students) that charges have not been generated for yet."""
+    from app.models import FeeCharge, FeeLedger, Student, ClassSection
+    paid = select(FeeLedger.student_id).where(FeeLedger.period == period, FeeLedger.paid > 0)
+    charged = select(FeeCharge.student_id).where(FeeCharge.period == period)
+    query = db.session.query(Student.id, ClassSection.class_name).outerjoin(
+        ClassSection, ClassSection.id == Student.class_section_id).filter(
+        Student.status == 'active', ~Student.id.in_(paid), ~Student.id.in_(charged))
+    if class_section_id:
+        query = query.filter(Student.class_section_id == class_section_id)
+    tuition = reference_data().tuition_by_class
+    return {student_id: tuition.get(class_name, 0) for student_id, class_name in query}
+
+
+def _with_estimate(rows, period, estimate):
+    """rows plus the estimated dues of students not charged for period, the
+    last month of the range, in its current bucket."""
+    by_student = {r.student_id: r for r in rows}
+    for student_id, amount in estimate.items():
+        r = by_student.get(student_id)
+        if r is None:
+            by_student[student_id] = ArrearsRow(student_id, amount, 1, period, amount, 0.0, 0.0, 0.0)
+        else:
+            by_student[student_id] = r._replace(
+                outstanding=r.outstanding + amount, months_behind=r.months_behind + 1,
+                oldest_period=period if r.oldest_period is None else r.oldest_period,
+                current=r.current + amount)
+    return sorted(by_student.values(), key=lambda r: (-r.outstanding, r.student_id))
+
+
+def arrears_report(since, until, class_section_id=None):
+    """ArrearsRow for every active student who owes money for ledger months
+    [since, until] (since=None: all history), largest debt first, with
+    totals. Students not yet charged for the last month get its dues from
+    unpaid_estimate(), and 'estimated' counts them. Cached until the
+    ledger, students or fee structures change."""
+    def build():
+        rows = [ArrearsRow(*row) for row in db.session.execute(
+            _arrears_query(since, until, class_section_id))]
+        estimate = unpaid_estimate(until, class_section_id)
+        rows = _with_estimate(rows, until, estimate)
+        totals = {name: sum(getattr(r, name) for r in rows)
+                  for name in ('outstanding',) + AGEING_BUCKETS}
+        totals['students'] = len(rows)
+        return {'rows': rows, 'totals': totals, 'estimated': len(estimate)}
+    return cache.get_or_set(f'fees:arrears:{since}:{until}:{class_section_id or 0}', build,
+                            ttl=ARREARS_TTL,
+                            tags=('fee_ledger', 'fee_charges', 'students', 'fee_structure'))
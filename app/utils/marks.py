@@ -0,0 +1,75 @@
+"""
+Mark writes for AI-Powered Institutional Management & Face Recognition Attendance System
+
+marks holds at most one row per student, exam and subject, enforced by the
+uq_marks_student_exam_subject index. Saving a subject's marks sheet loads the
+existing rows in one query and writes the rest as one batched INSERT and one
+executemany UPDATE, however many students are on the sheet.
+"""
+from sqlalchemy import insert, update, delete, select, func
+from app import db
+from app.utils.helpers import calculate_grade_from_marks
+
+
+def save_subject_marks(exam_id, subject_id, obtained, total_marks, entered_by):
+    """Insert or update one mark per student for a subject of an exam.
+
+    obtained: dict {student_id: marks obtained}. Rows whose marks, total
+    and grade are unchanged are left alone. The caller commits. Returns the
+    number of students whose marks were saved.
+    """
+    from app.models import Mark
+    if not obtained:
+        return 0
+
+    existing = {
+        row.student_id: row
+        for row in db.session.query(
+            Mark.id, Mark.student_id, Mark.obtained_marks, Mark.total_marks, Mark.grade
+        ).filter(
+            Mark.exam_id == exam_id,
+            Mark.subject_id == subject_id,
+            Mark.student_id.in_(list(obtained))
+        )
+    }
+
+    new_rows = []
+    changed_rows = []
+    for student_id, marks in obtained.items():
+        grade, _ = calculate_grade_from_marks(marks, total_marks)
+        row = existing.get(student_id)
+        if row is None:
+            new_rows.append({
+                'student_id': student_id,
+                'exam_id': exam_id,
+                'subject_id': subject_id,
+                'obtained_marks': marks,
+                'total_marks': total_marks,
+                'grade': grade,
+                'entered_by': entered_by,
+            })
+        elif (row.obtained_marks, row.total_marks, row.grade) != (marks, total_marks, grade):
+            changed_rows.append({
+                'id': row.id,
+                'obtained_marks': marks,
+                'total_marks': total_marks,
+                'grade': grade,
+                'entered_by': entered_by,
+            })
+
+    if new_rows:
+        db.session.execute(insert(Mark), new_rows)
+    if changed_rows:
+        db.session.execute(update(Mark), changed_rows)
+    return len(obtained)
+
+
+def remove_duplicate_marks():
+    """Delete all but the newest row of each (student, exam, subject), so
+    the unique index can be created on databases from before it existed.
+    The caller commits. Returns the number of rows deleted."""
+    from app.models import Mark
+    keep = (select(func.max(Mark.id))
+            .group_by(Mark.student_id, Mark.exam_id, Mark.subject_id)
+            .scalar_subquery())
+    return db.session.execute(delete(Mark).where(Mark.id.not_in(keep))).rowcount
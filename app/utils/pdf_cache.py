@@ -0,0 +1,219 @@
+"""
+PDF cache for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Receipts and result cards are cached under a key hashed from the data the
+PDF shows plus the layout's TEMPLATE_VERSIONS entry. Any change to the
+payment, marks or student details gives a new key, so entries never need
+invalidating; the least recently used ones are evicted once the cache
+passes PDF_CACHE_MAX_MB.
+
+Files live under PDF_CACHE_FOLDER. On hosts without a writable folder
+(Vercel) they are kept as blobs in the pdf_cache table instead. Rendering
+is deterministic, so the key doubles as a strong ETag and a browser that
+already has the PDF gets a 304 without any rendering or cache read.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from flask import current_app, request, make_response
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+EVICT_TO = 0.8  # evict down to this fraction of the limit
+
+
+def cache_key(kind, data):
+    """Hex digest of the layout, its version and the data it renders."""
+    from app.utils.pdf_generator import TEMPLATE_VERSIONS
+    payload = json.dumps([kind, TEMPLATE_VERSIONS[kind], data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DiskStore:
+    """One file per key, sharded by the first two hex digits. A file's
+    mtime is its last use."""
+
+    def __init__(self, folder, max_bytes):
+        os.makedirs(folder, exist_ok=True)
+        if not os.access(folder, os.W_OK):
+            raise OSError(f'{folder} is not writable')
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._size = None  # estimated total; rescanned when evicting
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f'{key}.pdf')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                pdf = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return pdf
+
+    def put(self, key, kind, pdf):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(pdf)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += len(pdf)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        for shard in os.scandir(self.folder):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.pdf'):
+                        st = entry.stat()
+                        yield entry.path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def stats(self):
+        files = list(self._files())
+        return {'backend': 'disk', 'location': self.folder, 'entries': len(files),
+                'bytes': sum(size for _, size, _ in files), 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        removed = 0
+        for path, _, _ in list(self._files()):
+            os.remove(path)
+            removed += 1
+        self._size = 0
+        return removed
+
+
+class DbStore:
+    """Rows of the pdf_cache table, written on their own connection so a
+    cache write never joins (or commits) the request's transaction."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    @property
+    def _table(self):
+        from app.models import PdfCacheEntry
+        return PdfCacheEntry.__table__
+
+    def get(self, key):
+        t = self._table
+        with db.engine.begin() as conn:
+            pdf = conn.execute(select(t.c.data).where(t.c.key == key)).scalar()
+            if pdf is not None:
+                conn.execute(update(t).where(t.c.key == key).values(last_used_at=datetime.utcnow()))
+        return pdf
+
+    def put(self, key, kind, pdf):
+        t = self._table
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(t).values(key=key, kind=kind, data=pdf, size=len(pdf),
+                                              created_at=now, last_used_at=now))
+        except IntegrityError:
+            return  # another worker stored it first
+        with db.engine.begin() as conn:
+            total = conn.execute(select(func.coalesce(func.sum(t.c.size), 0))).scalar()
+            if total > self.max_bytes:
+                oldest = conn.execute(select(t.c.key, t.c.size).order_by(t.c.last_used_at)).all()
+                for old_key, size in oldest:
+                    if total <= self.max_bytes * EVICT_TO:
+                        break
+                    conn.execute(delete(t).where(t.c.key == old_key))
+                    total -= size
+
+    def stats(self):
+        t = self._table
+        with db.engine.connect() as conn:
+            entries, size = conn.execute(select(func.count(), func.coalesce(func.sum(t.c.size), 0))).one()
+        return {'backend': 'db', 'location': 'pdf_cache table', 'entries': entries,
+                'bytes': size, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with db.engine.begin() as conn:
+            return conn.execute(delete(self._table)).rowcount
+
+
+class PdfCache:
+    def __init__(self):
+        self.store = None
+
+    def init_app(self, app):
+        max_bytes = int(app.config.get('PDF_CACHE_MAX_MB', 200)) * 1024 * 1024
+        folder = app.config.get('PDF_CACHE_FOLDER')
+        self.store = None
+        if folder:
+            try:
+                self.store = DiskStore(folder, max_bytes)
+            except OSError as exc:
+                app.logger.warning(f'PDF cache folder {folder} unavailable, '
+                                   f'caching in the database: {exc}')
+        if self.store is None:
+            self.store = DbStore(max_bytes)
+
+    def get_or_render(self, kind, data, key=None):
+        """(key, pdf bytes) for the document, rendered only on a miss.
+        A broken cache degrades to rendering every time."""
+        from app.utils.pdf_generator import render_document
+        key = key or cache_key(kind, data)
+        try:
+            pdf = self.store.get(key)
+        except Exception as exc:
+            current_app.logger.warning(f'PDF cache read failed: {exc}')
+            pdf = None
+        if pdf is None:
+            pdf = render_document(kind, data)
+            try:
+                self.store.put(key, kind, pdf)
+            except Exception as exc:
+                current_app.logger.warning(f'PDF cache write failed: {exc}')
+        return key, pdf
+
+
+pdf_cache = PdfCache()
+
+
+def pdf_response(kind, data, filename):
+    """An inline PDF response with a strong ETag; 304 when the browser
+    already has this exact document."""
+    key = cache_key(kind, data)
+    if key in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        _, pdf = pdf_cache.get_or_render(kind, data, key)
+        response = make_response(pdf)
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'inline; filename={filename}'
+    response.set_etag(key)
+    # Revalidate every time: marks and payments can still be corrected.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
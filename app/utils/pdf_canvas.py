@@ -0,0 +1,303 @@
+"""
+Fixed-form PDF renderer for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Receipts, vouchers and result cards are fixed forms: the same header,
+labels, table heads and footer on every page, with a few fields and table
+rows filled in. Instead of laying out a platypus story for each one, the
+geometry of each form (wrapped title lines, column positions, row
+capacity) is worked out once per process. The static part is drawn once
+per PDF into a Form XObject that every page reuses, and the variable
+fields are drawn straight onto the canvas. Documents with more rows than
+their form has room for go back to the platypus layout in pdf_generator
+(see fits()).
+"""
+import io
+from functools import lru_cache
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from app.utils.pdf_generator import (PRIMARY, SECONDARY, LIGHT_GRAY, WHITE, SCHOOL_NAME,
+                                     TAGLINE, CONTACT_LINE, GRADE_SCALE, receipt_rows,
+                                     voucher_rows, result_card_rows)
+
+PAGE_W, PAGE_H = A4
+MARGIN = 1.5 * cm
+CONTENT_W = PAGE_W - 2 * MARGIN
+PAD = 8
+ROW_H = 28      # 10pt text with 8pt padding above and below, as in the tables
+INFO_ROW_H = 26
+META_ROW_H = 18
+FOOTER_H = 48   # rule and two 8pt lines at the bottom of the page
+
+
+def _fit(text, font, size, width):
+    """text, shortened with an ellipsis if it is wider than width."""
+    text = str(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '…', font, size) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def _cells(c, y, cells, widths, aligns, font, size, color, height, fit=True):
+    """Draw one table row of text whose top edge is at y. With fit, text
+    too wide for its cell is shortened; labels are left to overflow."""
+    c.setFont(font, size)
+    c.setFillColor(color)
+    baseline = y - height / 2 - size * 0.35
+    x = _left(widths)
+    for text, width, align in zip(cells, widths, aligns):
+        if text not in (None, ''):
+            if fit:
+                text = _fit(text, font, size, width - 2 * PAD)
+            if align == 'C':
+                c.drawCentredString(x + width / 2, baseline, text)
+            elif align == 'R':
+                c.drawRightString(x + width - PAD, baseline, text)
+            else:
+                c.drawString(x + PAD, baseline, text)
+        x += width
+
+
+def _left(widths):
+    """x of a table's left edge; tables wider than the margins are centred,
+    as platypus does."""
+    return (PAGE_W - sum(widths)) / 2
+
+
+def _band(c, y, height, fill, width=CONTENT_W):
+    c.setFillColor(fill)
+    c.rect((PAGE_W - width) / 2, y - height, width, height, stroke=0, fill=1)
+
+
+def _rule(c, y, thickness, color):
+    c.setStrokeColor(color)
+    c.setLineWidth(thickness)
+    c.line(MARGIN, y, PAGE_W - MARGIN, y)
+
+
+def _centred(c, lines, y, font, size, color):
+    """Centred lines from y down; returns the y below them."""
+    c.setFont(font, size)
+    c.setFillColor(color)
+    for line in lines:
+        c.drawCentredString(PAGE_W / 2, y - size, line)
+        y -= size * 1.2
+    return y
+
+
+# ─── Form geometry (once per process) ────────────────────────────────────────
+
+class _Form:
+    """Where a form's parts go. Built once per kind by _form()."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.title_lines = simpleSplit(SCHOOL_NAME, 'Helvetica-Bold', 22, CONTENT_W)
+        self.contact_lines = simpleSplit(CONTACT_LINE, 'Helvetica', 8, CONTENT_W)
+        y = PAGE_H - MARGIN - len(self.title_lines) * 22 * 1.2
+        if kind == 'result_card':
+            y -= 11 * 1.2 + 5 + 2 + 10  # subtitle, rule
+            self.info_top = y
+            y -= 3 * INFO_ROW_H + 14
+            self.widths = [1*cm, 7*cm, 3*cm, 3*cm, 3*cm, 2*cm]
+            self.aligns = 'LLCCCC'
+            self.bottom = MARGIN + 45 + 20 + 9 * 1.2 + 16  # signatures and legend
+        else:
+            y -= 11 * 1.2 + 8 + 2 + 4 + 16 * 1.2 + 10  # tagline, rule, heading
+            self.meta_top = y
+            y -= 2 * META_ROW_H + 10
+            self.meta_rule = y
+            y -= 10
+            self.student_top = y
+            y -= 2 * ROW_H + 14
+            if kind == 'receipt':
+                self.widths = [1*cm, 9*cm, 4*cm, 4*cm]
+                self.aligns = 'CLLR'
+                self.bottom = MARGIN + FOOTER_H + 20 + ROW_H  # collected-by line
+            else:
+                self.widths = [1*cm, 13*cm, 4*cm]
+                self.aligns = 'CLR'
+                self.bottom = MARGIN + FOOTER_H + 12  # due-date line
+        self.table_top = y
+        self.capacity = int((y - ROW_H - self.bottom) // ROW_H)  # rows below the head
+
+
+@lru_cache(maxsize=None)
+def _form(kind):
+    return _Form(kind)
+
+
+def _rows(kind, data):
+    if kind == 'receipt':
+        return receipt_rows(data)
+    if kind == 'voucher':
+        return voucher_rows(data)
+    return result_card_rows(data['subject_marks'])
+
+
+def fits(kind, data):
+    """Whether the document's table fits on its fixed form."""
+    return len(_rows(kind, data)) <= _form(kind).capacity
+
+
+# ─── Static parts (a Form XObject per PDF) ───────────────────────────────────
+
+HEADINGS = {'receipt': 'FEE RECEIPT', 'voucher': 'FEE VOUCHER'}
+META_LABELS = {
+    'receipt': [('Receipt No:', 'Date:'), ('Payment Method:', 'Academic Year:')],
+    'voucher': [('Voucher No:', 'Issue Date:'), ('Fee Month:', 'Due Date:')],
+}
+TABLE_HEADS = {
+    'receipt': ['Sr.', 'Description', 'Month/Period', 'Amount (PKR)'],
+    'voucher': ['Sr.', 'Description', 'Amount (PKR)'],
+    'result_card': ['Sr.', 'Subject', 'Total Marks', 'Obtained', 'Percentage', 'Grade'],
+}
+META_WIDTHS = [3*cm, 6*cm, 3*cm, 6*cm]
+STUDENT_WIDTHS = [3*cm, 7*cm, 3*cm, 5*cm]
+INFO_WIDTHS = [3.5*cm, 6*cm, 3.5*cm, 5*cm]
+
+
+def _draw_static(c, form):
+    kind = form.kind
+    y = _centred(c, form.title_lines, PAGE_H - MARGIN, 'Helvetica-Bold', 22, PRIMARY)
+    if kind == 'result_card':
+        y = _centred(c, ['Result Card'], y, 'Helvetica', 11, SECONDARY) - 5
+        _rule(c, y - 1, 2, PRIMARY)
+        top = form.info_top
+        _band(c, top, 3 * INFO_ROW_H, LIGHT_GRAY)
+        c.setStrokeColor(colors.lightgrey)
+        c.setLineWidth(0.5)
+        c.rect(MARGIN, top - 3 * INFO_ROW_H, CONTENT_W, 3 * INFO_ROW_H, stroke=1, fill=0)
+        labels = [('Student Name:', 'Exam:'), ('Reg. No:', 'Class:'),
+                  ("Father's Name:", 'Academic Year:')]
+        for i, (left, right) in enumerate(labels):
+            _cells(c, top - i * INFO_ROW_H, [left, '', right, ''], INFO_WIDTHS, 'LLLL',
+                   'Helvetica-Bold', 10, colors.black, INFO_ROW_H, fit=False)
+        # Legend and signature boxes sit at the foot of the page.
+        c.setFont('Helvetica', 9)
+        c.setFillColor(colors.gray)
+        c.drawString(MARGIN, MARGIN + 45 + 20, GRADE_SCALE)
+        c.setStrokeColor(colors.grey)
+        for i, label in enumerate(['Principal Signature', 'Class Teacher Signature',
+                                   'Parent Signature']):
+            x = MARGIN + i * 6 * cm
+            c.rect(x, MARGIN, 6 * cm, 45, stroke=1, fill=0)
+            c.setFont('Helvetica', 10)
+            c.setFillColor(colors.black)
+            c.drawCentredString(x + 3 * cm, MARGIN + 6, label)
+    else:
+        y = _centred(c, [TAGLINE], y, 'Helvetica', 11, SECONDARY) - 8
+        _rule(c, y - 1, 2, PRIMARY)
+        _centred(c, [HEADINGS[kind]], y - 6, 'Helvetica-Bold', 16, SECONDARY)
+        for i, (left, right) in enumerate(META_LABELS[kind]):
+            _cells(c, form.meta_top - i * META_ROW_H, [left, '', right, ''], META_WIDTHS,
+                   'LLLL', 'Helvetica-Bold', 10, SECONDARY, META_ROW_H, fit=False)
+        _rule(c, form.meta_rule, 0.5, colors.lightgrey)
+        top = form.student_top
+        _band(c, top, ROW_H, LIGHT_GRAY)
+        c.setStrokeColor(colors.lightgrey)
+        c.setLineWidth(0.5)
+        c.rect(MARGIN, top - 2 * ROW_H, CONTENT_W, 2 * ROW_H, stroke=1, fill=0)
+        for i, (left, right) in enumerate([('Student Name:', 'Reg. No:'),
+                                           ("Father's Name:", 'Class:')]):
+            _cells(c, top - i * ROW_H, [left, '', right, ''], STUDENT_WIDTHS, 'LLLL',
+                   'Helvetica-Bold', 10, colors.black, ROW_H, fit=False)
+        # Footer notes
+        _rule(c, MARGIN + FOOTER_H - 6, 0.5, colors.lightgrey)
+        lines = (['This is a computer-generated receipt. No signature required.']
+                 if kind == 'receipt' else []) + form.contact_lines
+        _centred(c, lines, MARGIN + FOOTER_H - 12, 'Helvetica', 8, colors.gray)
+
+    _band(c, form.table_top, ROW_H, SECONDARY, sum(form.widths))
+    _cells(c, form.table_top, TABLE_HEADS[kind], form.widths, form.aligns,
+           'Helvetica-Bold', 10, WHITE, ROW_H, fit=False)
+
+
+# ─── Variable parts ──────────────────────────────────────────────────────────
+
+def _draw_table(c, form, rows):
+    """Body rows under the static head, the last one as the total band."""
+    top = form.table_top - ROW_H
+    for i, row in enumerate(rows):
+        y = top - i * ROW_H
+        last = i == len(rows) - 1
+        if last or i % 2:
+            _band(c, y, ROW_H, PRIMARY if last else LIGHT_GRAY, sum(form.widths))
+        _cells(c, y, row, form.widths, form.aligns,
+               'Helvetica-Bold' if last else 'Helvetica', 10, WHITE if last else colors.black,
+               ROW_H)
+    bottom = top - len(rows) * ROW_H
+    c.setStrokeColor(colors.lightgrey)
+    c.setLineWidth(0.5)
+    left = x = _left(form.widths)
+    right = PAGE_W - left
+    for width in form.widths[:-1]:
+        x += width
+        c.line(x, form.table_top, x, bottom + ROW_H)
+    for i in range(1, len(rows)):
+        c.line(left, top - i * ROW_H + ROW_H, right, top - i * ROW_H + ROW_H)
+    c.setStrokeColor(SECONDARY)
+    c.setLineWidth(1)
+    c.rect(left, bottom, right - left, form.table_top - bottom, stroke=1, fill=0)
+    return bottom
+
+
+def _draw_fields(c, form, data):
+    kind = form.kind
+    if kind == 'result_card':
+        values = [(data['student_name'], data['exam_name']), (data['reg_no'], data['class_name']),
+                  (data['father_name'], data['academic_year'])]
+        for i, (left, right) in enumerate(values):
+            _cells(c, form.info_top - i * INFO_ROW_H, ['', left, '', right], INFO_WIDTHS, 'LLLL',
+                   'Helvetica', 10, colors.black, INFO_ROW_H)
+        _draw_table(c, form, _rows(kind, data))
+        return
+
+    if kind == 'receipt':
+        meta = [(data['receipt_no'], data['date']), (data['payment_method'], '2024-25')]
+    else:
+        meta = [(data['voucher_no'], data['issue_date']), (data['month_label'], data['due_date'])]
+    for i, (left, right) in enumerate(meta):
+        _cells(c, form.meta_top - i * META_ROW_H, ['', left, '', right], META_WIDTHS, 'LLLL',
+               'Helvetica', 10, colors.black, META_ROW_H)
+    for i, (left, right) in enumerate([(data['student_name'], data['reg_no']),
+                                       (data['father_name'], data['class_name'])]):
+        _cells(c, form.student_top - i * ROW_H, ['', left, '', right], STUDENT_WIDTHS, 'LLLL',
+               'Helvetica', 10, colors.black, ROW_H)
+    bottom = _draw_table(c, form, _rows(kind, data))
+    if kind == 'receipt':
+        y = bottom - 30
+        c.setFont('Helvetica-Bold', 10)
+        c.setFillColor(colors.black)
+        c.drawString(MARGIN, y, 'Collected By:')
+        c.setFont('Helvetica', 10)
+        c.drawString(MARGIN + 3*cm, y, _fit(data['collected_by'], 'Helvetica', 10, 8*cm - PAD))
+        c.drawString(MARGIN + 13*cm, y, 'Signature: _______________')
+    else:
+        c.setFont('Helvetica', 8)
+        c.setFillColor(colors.gray)
+        c.drawCentredString(PAGE_W / 2, MARGIN + FOOTER_H + 2,
+                            f"Please pay by {data['due_date']}. A late fine may be charged "
+                            'after the due date.')
+
+
+def render(kind, items):
+    """One PDF with a page per data dict in items; each must fits()."""
+    form = _form(kind)
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    name = f'{kind}_static'
+    c.beginForm(name)
+    _draw_static(c, form)
+    c.endForm()
+    for data in items:
+        c.doForm(name)
+        _draw_fields(c, form, data)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
@@ -1,6 +1,6 @@
 """
 PDF Generator using ReportLab
-Generates fee receipts and result cards.
+Generates fee receipts, fee vouchers and result cards.
 """
 import io
 from datetime import date
@@ -10,7 +10,7 @@ try:
     from reportlab.lib import colors
     from reportlab.lib.units import inch, cm
     from reportlab.platypus import (SimpleDocTemplate, Paragraph, Table,
-                                     TableStyle, Spacer, HRFlowable)
+                                     TableStyle, Spacer, HRFlowable, PageBreak)
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
     REPORTLAB_AVAILABLE = True
@@ -26,200 +26,350 @@ LIGHT_GRAY = colors.HexColor('#f8f9fa')
 WHITE = colors.white
 
 
-def generate_fee_receipt(payment):
-    """
-    Generate PDF fee receipt for a FeePayment object.
-    Returns bytes or None.
-    """
-    if not REPORTLAB_AVAILABLE:
-        return None
+# Styles are built once per process and shared by every document.
+TITLE_STYLE = ParagraphStyle('Title', fontName='Helvetica-Bold', fontSize=22,
+                             leading=26, textColor=PRIMARY, alignment=TA_CENTER)
+SUB_STYLE = ParagraphStyle('Sub', fontName='Helvetica',
+                           fontSize=11, textColor=SECONDARY, alignment=TA_CENTER)
+HEADING_STYLE = ParagraphStyle('Heading', fontName='Helvetica-Bold',
+                               fontSize=16, textColor=SECONDARY, alignment=TA_CENTER)
+FOOTER_STYLE = ParagraphStyle('Footer', fontName='Helvetica',
+                              fontSize=8, textColor=colors.gray, alignment=TA_CENTER)
+LEGEND_STYLE = ParagraphStyle('Legend', fontName='Helvetica',
+                              fontSize=9, textColor=colors.gray)
 
+META_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), SECONDARY),
+    ('TEXTCOLOR', (2, 0), (2, -1), SECONDARY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+STUDENT_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BACKGROUND', (0, 0), (-1, -1), LIGHT_GRAY),
+    ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ('ROWBACKGROUNDS', (0, 0), (-1, -1), [LIGHT_GRAY, WHITE]),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+])
+# Sr./description/.../amount tables with a header row and a total row
+AMOUNT_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BACKGROUND', (0, 0), (-1, 0), SECONDARY),
+    ('TEXTCOLOR', (0, 0), (-1, 0), WHITE),
+    ('BACKGROUND', (0, -1), (-1, -1), PRIMARY),
+    ('TEXTCOLOR', (0, -1), (-1, -1), WHITE),
+    ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+    ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -2), 0.5, colors.lightgrey),
+    ('BOX', (0, 0), (-1, -1), 1, SECONDARY),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [WHITE, LIGHT_GRAY]),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+])
+COLLECTED_BY_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+])
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BACKGROUND', (0, 0), (-1, -1), LIGHT_GRAY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 7),
+    ('TOPPADDING', (0, 0), (-1, -1), 7),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+])
+MARKS_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BACKGROUND', (0, 0), (-1, 0), SECONDARY),
+    ('TEXTCOLOR', (0, 0), (-1, 0), WHITE),
+    ('BACKGROUND', (0, -1), (-1, -1), PRIMARY),
+    ('TEXTCOLOR', (0, -1), (-1, -1), WHITE),
+    ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+    ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
+    ('GRID', (0, 0), (-1, -2), 0.5, colors.lightgrey),
+    ('BOX', (0, 0), (-1, -1), 1, SECONDARY),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [WHITE, LIGHT_GRAY]),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+])
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('TOPPADDING', (0, 0), (-1, -1), 30),
+    ('BOX', (0, 0), (0, 0), 0.5, colors.grey),
+    ('BOX', (1, 0), (1, 0), 0.5, colors.grey),
+    ('BOX', (2, 0), (2, 0), 0.5, colors.grey),
+])
+
+SCHOOL_NAME = 'AI-Powered Institutional Management & Face Recognition Attendance System'
+TAGLINE = 'Providing Quality Education Since 2005'
+CONTACT_LINE = f'{SCHOOL_NAME} | Phone: +92-XXX-XXXXXXX | Email: info@mtbschool.edu.pk'
+GRADE_SCALE = 'Grade Scale: A+ (≥90%) | A (80-89%) | B (70-79%) | C (60-69%) | D (50-59%) | F (<50%)'
+
+
+def _build(story):
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
+    # invariant: no timestamp or random id, so the same data gives the same bytes
+    doc = SimpleDocTemplate(buffer, pagesize=A4, invariant=1,
                              rightMargin=1.5*cm, leftMargin=1.5*cm,
                              topMargin=1.5*cm, bottomMargin=1.5*cm)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Header
-    title_style = ParagraphStyle('Title', fontName='Helvetica-Bold',
-                                  fontSize=22, textColor=PRIMARY, alignment=TA_CENTER)
-    sub_style = ParagraphStyle('Sub', fontName='Helvetica',
-                                fontSize=11, textColor=SECONDARY, alignment=TA_CENTER)
-    small_style = ParagraphStyle('Small', fontName='Helvetica',
-                                  fontSize=9, textColor=colors.gray, alignment=TA_CENTER)
-
-    story.append(Paragraph('AI-Powered Institutional Management & Face Recognition Attendance System', title_style))
-    story.append(Paragraph('Providing Quality Education Since 2005', sub_style))
-    story.append(Spacer(1, 8))
-    story.append(HRFlowable(width='100%', thickness=2, color=PRIMARY))
-    story.append(Spacer(1, 4))
+    doc.build(story)
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+    return pdf_bytes
 
-    receipt_style = ParagraphStyle('Receipt', fontName='Helvetica-Bold',
-                                    fontSize=16, textColor=SECONDARY, alignment=TA_CENTER)
-    story.append(Paragraph('FEE RECEIPT', receipt_style))
-    story.append(Spacer(1, 10))
 
-    # Receipt meta
-    meta_data = [
-        ['Receipt No:', payment.receipt_no or 'N/A',
-         'Date:', payment.payment_date.strftime('%d-%b-%Y') if payment.payment_date else date.today().strftime('%d-%b-%Y')],
-        ['Payment Method:', (payment.payment_method or 'Cash').title(),
-         'Academic Year:', '2024-25'],
+def _header_story(heading):
+    return [
+        Paragraph(SCHOOL_NAME, TITLE_STYLE),
+        Paragraph(TAGLINE, SUB_STYLE),
+        Spacer(1, 8),
+        HRFlowable(width='100%', thickness=2, color=PRIMARY),
+        Spacer(1, 4),
+        Paragraph(heading, HEADING_STYLE),
+        Spacer(1, 10),
     ]
+
+
+def _meta_table(meta_data):
     meta_table = Table(meta_data, colWidths=[3*cm, 6*cm, 3*cm, 6*cm])
-    meta_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 0), (0, -1), SECONDARY),
-        ('TEXTCOLOR', (2, 0), (2, -1), SECONDARY),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(meta_table)
-    story.append(Spacer(1, 10))
-    story.append(HRFlowable(width='100%', thickness=0.5, color=colors.lightgrey))
-    story.append(Spacer(1, 10))
+    meta_table.setStyle(META_TABLE_STYLE)
+    return [meta_table, Spacer(1, 10),
+            HRFlowable(width='100%', thickness=0.5, color=colors.lightgrey), Spacer(1, 10)]
 
-    # Student info
-    student = payment.student
-    reg_no = student.reg_no if student else 'N/A'
-    student_name = student.full_name if student else 'N/A'
-    father_name = student.father_name if student else 'N/A'
-    class_name = student.class_section.display_name if student and student.class_section else 'N/A'
 
+def _student_table(data):
     student_data = [
-        ['Student Name:', student_name, 'Reg. No:', reg_no],
-        ["Father's Name:", father_name, 'Class:', class_name],
+        ['Student Name:', data['student_name'], 'Reg. No:', data['reg_no']],
+        ["Father's Name:", data['father_name'], 'Class:', data['class_name']],
     ]
     student_table = Table(student_data, colWidths=[3*cm, 7*cm, 3*cm, 5*cm])
-    student_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BACKGROUND', (0, 0), (-1, -1), LIGHT_GRAY),
-        ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [LIGHT_GRAY, WHITE]),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    story.append(student_table)
-    story.append(Spacer(1, 14))
+    student_table.setStyle(STUDENT_TABLE_STYLE)
+    return [student_table, Spacer(1, 14)]
+
+
+def _amount_table(all_rows, col_widths):
+    table = Table(all_rows, colWidths=col_widths)
+    table.setStyle(AMOUNT_TABLE_STYLE)
+    return table
+
+
+def _footer_notes(*lines):
+    story = [Spacer(1, 10), HRFlowable(width='100%', thickness=0.5, color=colors.lightgrey),
+             Spacer(1, 6)]
+    story.extend(Paragraph(line, FOOTER_STYLE) for line in lines)
+    return story
+
+
+def student_fields(student):
+    """The student block of a receipt or voucher."""
+    return {
+        'student_name': student.full_name if student else 'N/A',
+        'reg_no': student.reg_no if student else 'N/A',
+        'father_name': (student.father_name or 'N/A') if student else 'N/A',
+        'class_name': student.class_section.display_name if student and student.class_section else 'N/A',
+    }
+
+
+def receipt_data(payment):
+    """Everything a fee receipt shows, as a plain (picklable) dict."""
+    data = student_fields(payment.student)
+    data.update({
+        'receipt_no': payment.receipt_no or 'N/A',
+        'date': (payment.payment_date or date.today()).strftime('%d-%b-%Y'),
+        'payment_method': (payment.payment_method or 'Cash').title(),
+        'fee_name': payment.fee_structure.name if payment.fee_structure else 'Fee Payment',
+        'period': f"{payment.month or ''} {payment.year or ''}".strip() or 'N/A',
+        'amount': payment.amount or 0,
+        'discount': payment.discount or 0,
+        'fine': payment.fine or 0,
+        'total_paid': payment.total_paid or 0,
+        'collected_by': payment.collected_by or 'Accounts Department',
+    })
+    return data
+
+
+def receipt_rows(data):
+    """Fee table rows of a receipt, ending with the TOTAL PAID row."""
+    rows = [['1', data['fee_name'], data['period'], f"Rs. {data['amount']:,.0f}"]]
+    if data['discount'] > 0:
+        rows.append(['', 'Discount', '', f"-Rs. {data['discount']:,.0f}"])
+    if data['fine'] > 0:
+        rows.append(['', 'Late Fine', '', f"+Rs. {data['fine']:,.0f}"])
+    rows.append(['', '', 'TOTAL PAID', f"Rs. {data['total_paid']:,.0f}"])
+    return rows
+
+
+def voucher_rows(data):
+    """Charge rows of a voucher, ending with the TOTAL PAYABLE row."""
+    rows = [[str(i), description, f'Rs. {amount:,.0f}']
+            for i, (description, amount) in enumerate(data['lines'], 1)]
+    if data['arrears'] > 0:
+        rows.append(['', 'Arrears brought forward', f"+Rs. {data['arrears']:,.0f}"])
+    elif data['arrears'] < 0:
+        rows.append(['', 'Advance paid', f"-Rs. {-data['arrears']:,.0f}"])
+    rows.append(['', 'TOTAL PAYABLE', f"Rs. {data['total']:,.0f}"])
+    return rows
+
+
+def _receipt_story(data):
+    story = _header_story('FEE RECEIPT')
+    story += _meta_table([
+        ['Receipt No:', data['receipt_no'], 'Date:', data['date']],
+        ['Payment Method:', data['payment_method'], 'Academic Year:', '2024-25'],
+    ])
+    story += _student_table(data)
 
     # Fee details
     fee_header = [['Sr.', 'Description', 'Month/Period', 'Amount (PKR)']]
-    fee_name = payment.fee_structure.name if payment.fee_structure else 'Fee Payment'
-    period = f"{payment.month or ''} {payment.year or ''}".strip() or 'N/A'
-    fee_rows = [[1, fee_name, period, f'Rs. {payment.amount:,.0f}']]
-    if payment.discount and payment.discount > 0:
-        fee_rows.append(['', 'Discount', '', f'-Rs. {payment.discount:,.0f}'])
-    if payment.fine and payment.fine > 0:
-        fee_rows.append(['', 'Late Fine', '', f'+Rs. {payment.fine:,.0f}'])
-
-    all_rows = fee_header + fee_rows + [['', '', 'TOTAL PAID', f'Rs. {payment.total_paid:,.0f}']]
-    fee_table = Table(all_rows, colWidths=[1*cm, 9*cm, 4*cm, 4*cm])
-    fee_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BACKGROUND', (0, 0), (-1, 0), SECONDARY),
-        ('TEXTCOLOR', (0, 0), (-1, 0), WHITE),
-        ('BACKGROUND', (0, -1), (-1, -1), PRIMARY),
-        ('TEXTCOLOR', (0, -1), (-1, -1), WHITE),
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('ALIGN', (3, 0), (3, -1), 'RIGHT'),
-        ('GRID', (0, 0), (-1, -2), 0.5, colors.lightgrey),
-        ('BOX', (0, 0), (-1, -1), 1, SECONDARY),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [WHITE, LIGHT_GRAY]),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    story.append(fee_table)
+    story.append(_amount_table(fee_header + receipt_rows(data), [1*cm, 9*cm, 4*cm, 4*cm]))
     story.append(Spacer(1, 20))
 
     # Footer
-    footer_data = [
-        ['Collected By:', payment.collected_by or 'Accounts Department', '', 'Signature: _______________']
-    ]
-    footer_table = Table(footer_data, colWidths=[3*cm, 8*cm, 2*cm, 5*cm])
-    footer_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ]))
+    footer_table = Table([['Collected By:', data['collected_by'], '', 'Signature: _______________']],
+                         colWidths=[3*cm, 8*cm, 2*cm, 5*cm])
+    footer_table.setStyle(COLLECTED_BY_STYLE)
     story.append(footer_table)
-    story.append(Spacer(1, 10))
-    story.append(HRFlowable(width='100%', thickness=0.5, color=colors.lightgrey))
-    story.append(Spacer(1, 6))
-    story.append(Paragraph('This is a computer-generated receipt. No signature required.',
-                             ParagraphStyle('footer', fontName='Helvetica',
-                                             fontSize=8, textColor=colors.gray, alignment=TA_CENTER)))
-    story.append(Paragraph('AI-Powered Institutional Management & Face Recognition Attendance System | Phone: +92-XXX-XXXXXXX | Email: info@mtbschool.edu.pk',
-                             ParagraphStyle('footer2', fontName='Helvetica',
-                                             fontSize=8, textColor=colors.gray, alignment=TA_CENTER)))
+    story += _footer_notes('This is a computer-generated receipt. No signature required.',
+                           CONTACT_LINE)
+    return story
 
-    doc.build(story)
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    return pdf_bytes
 
+def _voucher_story(data):
+    """data: student fields plus voucher_no, month_label, issue_date,
+    due_date, lines [(description, amount)], arrears and total."""
+    story = _header_story('FEE VOUCHER')
+    story += _meta_table([
+        ['Voucher No:', data['voucher_no'], 'Issue Date:', data['issue_date']],
+        ['Fee Month:', data['month_label'], 'Due Date:', data['due_date']],
+    ])
+    story += _student_table(data)
 
-def generate_result_card(student, exam, subject_marks):
+    rows = [['Sr.', 'Description', 'Amount (PKR)']] + voucher_rows(data)
+    story.append(_amount_table(rows, [1*cm, 13*cm, 4*cm]))
+    story += _footer_notes(
+        f"Please pay by {data['due_date']}. A late fine may be charged after the due date.",
+        CONTACT_LINE)
+    return story
+
+
+_STORIES = {'receipt': _receipt_story, 'voucher': _voucher_story}
+
+# Bump a layout's version whenever its output changes, so that cached
+# copies made from the old layout are no longer served.
+TEMPLATE_VERSIONS = {'receipt': 2, 'voucher': 2, 'result_card': 2}
+
+
+def render_flowing(kind, items):
+    """Lay documents out with platypus, each starting on a new page. Used
+    for documents too long for the fixed forms in pdf_canvas."""
+    story = []
+    for data in items:
+        if story:
+            story.append(PageBreak())
+        story += _STORIES[kind](data)
+    return _build(story)
+
+
+def render_combined(kind, items):
+    """Render many documents of one kind into a single PDF."""
+    from app.utils import pdf_canvas
+    if all(pdf_canvas.fits(kind, data) for data in items):
+        return pdf_canvas.render(kind, items)
+    return render_flowing(kind, items)
+
+
+def render_document(kind, data):
+    """Render one 'receipt', 'voucher' or 'result_card' from its data dict.
+    Module-level so that a process pool can call it."""
+    return render_combined(kind, [data])
+
+
+def generate_fee_receipt(payment):
     """
-    Generate PDF result card.
-    subject_marks: list of dicts {subject_name, obtained, total, grade}
+    Generate PDF fee receipt for a FeePayment object.
     Returns bytes or None.
     """
     if not REPORTLAB_AVAILABLE:
         return None
+    return render_document('receipt', receipt_data(payment))
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                             rightMargin=1.5*cm, leftMargin=1.5*cm,
-                             topMargin=1.5*cm, bottomMargin=1.5*cm)
-    styles = getSampleStyleSheet()
-    story = []
 
-    title_style = ParagraphStyle('Title', fontName='Helvetica-Bold',
-                                  fontSize=22, textColor=PRIMARY, alignment=TA_CENTER)
-    sub_style = ParagraphStyle('Sub', fontName='Helvetica',
-                                fontSize=11, textColor=SECONDARY, alignment=TA_CENTER)
+def result_card_data(student, exam, subject_marks):
+    """Everything a result card shows, as a plain (picklable) dict.
+    subject_marks: list of dicts {subject_name, obtained, total, grade}"""
+    data = student_fields(student)
+    data.update({
+        'exam_name': exam.name,
+        'academic_year': exam.academic_year or '2024-25',
+        'subject_marks': [dict(sm) for sm in subject_marks],
+    })
+    return data
 
-    story.append(Paragraph('AI-Powered Institutional Management & Face Recognition Attendance System', title_style))
-    story.append(Paragraph('Result Card', sub_style))
+
+def _result_card_story(data):
+    story = []
+    story.append(Paragraph(SCHOOL_NAME, TITLE_STYLE))
+    story.append(Paragraph('Result Card', SUB_STYLE))
     story.append(Spacer(1, 5))
     story.append(HRFlowable(width='100%', thickness=2, color=PRIMARY))
     story.append(Spacer(1, 10))
 
     # Exam & Student Details
-    class_name = student.class_section.display_name if student.class_section else 'N/A'
     info_data = [
-        ['Student Name:', student.full_name, 'Exam:', exam.name],
-        ['Reg. No:', student.reg_no, 'Class:', class_name],
-        ["Father's Name:", student.father_name or 'N/A', 'Academic Year:', exam.academic_year or '2024-25'],
+        ['Student Name:', data['student_name'], 'Exam:', data['exam_name']],
+        ['Reg. No:', data['reg_no'], 'Class:', data['class_name']],
+        ["Father's Name:", data['father_name'], 'Academic Year:', data['academic_year']],
     ]
     info_table = Table(info_data, colWidths=[3.5*cm, 6*cm, 3.5*cm, 5*cm])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BACKGROUND', (0, 0), (-1, -1), LIGHT_GRAY),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 7),
-        ('TOPPADDING', (0, 0), (-1, -1), 7),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-    ]))
+    info_table.setStyle(INFO_TABLE_STYLE)
     story.append(info_table)
     story.append(Spacer(1, 14))
 
     # Marks Table
     headers = [['Sr.', 'Subject', 'Total Marks', 'Obtained', 'Percentage', 'Grade']]
+    all_rows = headers + result_card_rows(data['subject_marks'])
+    marks_table = Table(all_rows, colWidths=[1*cm, 7*cm, 3*cm, 3*cm, 3*cm, 2*cm])
+    marks_table.setStyle(MARKS_TABLE_STYLE)
+    story.append(marks_table)
+    story.append(Spacer(1, 16))
+
+    # Grade legend
+    story.append(Paragraph(GRADE_SCALE, LEGEND_STYLE))
+    story.append(Spacer(1, 20))
+
+    # Signatures
+    sig_data = [['Principal Signature', 'Class Teacher Signature', 'Parent Signature']]
+    sig_table = Table(sig_data, colWidths=[6*cm, 6*cm, 6*cm])
+    sig_table.setStyle(SIGNATURE_TABLE_STYLE)
+    story.append(sig_table)
+    return story
+
+
+def result_card_rows(subject_marks):
+    """Table rows for each subject plus the TOTAL row."""
+    from app.utils.helpers import calculate_grade
     rows = []
     total_obtained = 0
     total_marks_sum = 0
@@ -231,56 +381,20 @@ def generate_result_card(student, exam, subject_marks):
         total_marks_sum += sm['total']
 
     total_pct = round((total_obtained / total_marks_sum) * 100, 1) if total_marks_sum > 0 else 0
-    from app.utils.helpers import calculate_grade
-    overall_grade = calculate_grade(total_pct)
     rows.append(['', 'TOTAL', str(total_marks_sum), str(total_obtained),
-                 f"{total_pct}%", overall_grade])
+                 f"{total_pct}%", calculate_grade(total_pct)])
+    return rows
 
-    all_rows = headers + rows
-    marks_table = Table(all_rows, colWidths=[1*cm, 7*cm, 3*cm, 3*cm, 3*cm, 2*cm])
-    marks_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BACKGROUND', (0, 0), (-1, 0), SECONDARY),
-        ('TEXTCOLOR', (0, 0), (-1, 0), WHITE),
-        ('BACKGROUND', (0, -1), (-1, -1), PRIMARY),
-        ('TEXTCOLOR', (0, -1), (-1, -1), WHITE),
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
-        ('GRID', (0, 0), (-1, -2), 0.5, colors.lightgrey),
-        ('BOX', (0, 0), (-1, -1), 1, SECONDARY),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [WHITE, LIGHT_GRAY]),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    story.append(marks_table)
-    story.append(Spacer(1, 16))
 
-    # Grade legend
-    legend_style = ParagraphStyle('legend', fontName='Helvetica',
-                                   fontSize=9, textColor=colors.gray)
-    story.append(Paragraph('Grade Scale: A+ (≥90%) | A (80-89%) | B (70-79%) | C (60-69%) | D (50-59%) | F (<50%)',
-                             legend_style))
-    story.append(Spacer(1, 20))
+_STORIES['result_card'] = _result_card_story
 
-    # Signatures
-    sig_data = [['Principal Signature', 'Class Teacher Signature', 'Parent Signature']]
-    sig_table = Table(sig_data, colWidths=[6*cm, 6*cm, 6*cm])
-    sig_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('TOPPADDING', (0, 0), (-1, -1), 30),
-        ('BOX', (0, 0), (0, 0), 0.5, colors.grey),
-        ('BOX', (1, 0), (1, 0), 0.5, colors.grey),
-        ('BOX', (2, 0), (2, 0), 0.5, colors.grey),
-    ]))
-    story.append(sig_table)
 
-    doc.build(story)
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    return pdf_bytes
+def generate_result_card(student, exam, subject_marks):
+    """
+    Generate PDF result card.
+    subject_marks: list of dicts {subject_name, obtained, total, grade}
+    Returns bytes or None.
+    """
+    if not REPORTLAB_AVAILABLE:
+        return None
+    return render_document('result_card', result_card_data(student, exam, subject_marks))
@@ -0,0 +1,93 @@
+"""
+Reference data (classes, subjects, departments, fee structures) for AI-Powered Institutional Management & Face Recognition Attendance System
+
+These tables change a few times a year but feed a dropdown on nearly
+every page. They are loaded once per process into immutable tuples and
+reloaded when a commit touches one of them - the cache's table tags
+carry that version across workers - or after REFERENCE_TTL at the latest.
+"""
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from flask import current_app, g
+from app import db
+from app.utils.cache import cache
+
+REFERENCE_TABLES = ('class_sections', 'subjects', 'departments', 'fee_structure')
+REFERENCE_TTL = 300  # seconds; bounds staleness when there is no shared cache tier
+
+_lock = threading.Lock()
+
+
+class ClassRef(namedtuple('ClassRef', 'id class_name section academic_year')):
+    __slots__ = ()
+
+    @property
+    def display_name(self):
+        return f"{self.class_name} - {self.section}"
+
+
+SubjectRef = namedtuple('SubjectRef', 'id name code department_id')
+DepartmentRef = namedtuple('DepartmentRef', 'id name code')
+FeeStructureRef = namedtuple('FeeStructureRef', 'id name class_name amount fee_type frequency academic_year')
+
+ReferenceData = namedtuple('ReferenceData', [
+    'version', 'loaded_at',
+    'classes',            # active ClassRef, by id
+    'classes_by_id',      # {id: ClassRef}, active and inactive
+    'subjects',           # active SubjectRef, by id
+    'departments',        # active DepartmentRef, by id
+    'fee_structures',     # active FeeStructureRef, by id
+    'tuition_by_class',   # {class_name: amount} from active tuition structures
+])
+
+
+def _load(version):
+    from app.models import ClassSection, Subject, Department, FeeStructure
+    class_rows = db.session.query(
+        ClassSection.id, ClassSection.class_name, ClassSection.section,
+        ClassSection.academic_year, ClassSection.is_active
+    ).order_by(ClassSection.id).all()
+    all_classes = [ClassRef(*row[:4]) for row in class_rows]
+    active_ids = {row.id for row in class_rows if row.is_active}
+    fee_structures = tuple(FeeStructureRef(*row) for row in db.session.query(
+        FeeStructure.id, FeeStructure.name, FeeStructure.class_name, FeeStructure.amount,
+        FeeStructure.fee_type, FeeStructure.frequency, FeeStructure.academic_year
+    ).filter(FeeStructure.is_active == True).order_by(FeeStructure.id))
+    return ReferenceData(
+        version=version,
+        loaded_at=time.monotonic(),
+        classes=tuple(c for c in all_classes if c.id in active_ids),
+        classes_by_id=MappingProxyType({c.id: c for c in all_classes}),
+        subjects=tuple(SubjectRef(*row) for row in db.session.query(
+            Subject.id, Subject.name, Subject.code, Subject.department_id
+        ).filter(Subject.is_active == True).order_by(Subject.id)),
+        departments=tuple(DepartmentRef(*row) for row in db.session.query(
+            Department.id, Department.name, Department.code
+        ).filter(Department.is_active == True).order_by(Department.id)),
+        fee_structures=fee_structures,
+        tuition_by_class=MappingProxyType({
+            fs.class_name: fs.amount for fs in fee_structures if fs.fee_type == 'tuition'}),
+    )
+
+
+def _stale(data, version):
+    return (data is None or data.version != version
+            or time.monotonic() - data.loaded_at > REFERENCE_TTL)
+
+
+def reference_data():
+    """Current ReferenceData for this app. Checked at most once per request."""
+    if 'reference_data' in g:
+        return g.reference_data
+    version = tuple(sorted(cache.tag_versions(REFERENCE_TABLES).items()))
+    data = current_app.extensions.get('reference_data')
+    if _stale(data, version):
+        with _lock:
+            data = current_app.extensions.get('reference_data')
+            if _stale(data, version):
+                data = _load(version)
+                current_app.extensions['reference_data'] = data
+    g.reference_data = data
+    return data
@@ -0,0 +1,146 @@
+"""
+Exam results for AI-Powered Institutional Management & Face Recognition Attendance System
+
+All marks of an exam are read in one query and pivoted into a flat
+students x subjects matrix of obtained marks (NaN where no mark has been
+entered). Totals, percentages, grades, pass/fail and ranks are then
+computed a whole column at a time - with NumPy when it is installed,
+otherwise over the same flat array in plain Python. Either way a results
+page costs three queries however many students sat the exam.
+"""
+import math
+from array import array
+from bisect import bisect_right
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from app import db
+from app.utils.helpers import GRADE_THRESHOLDS
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    pass
+
+# calculate_grade() as a lookup: bisect_right(GRADE_BOUNDS, pct) indexes GRADE_LABELS
+GRADE_BOUNDS = [lowest for lowest, _ in reversed(GRADE_THRESHOLDS)]
+GRADE_LABELS = ['F'] + [grade for _, grade in reversed(GRADE_THRESHOLDS)]
+
+
+def _candidates(exam):
+    """Criteria on Student for who the exam's results cover: active students
+    of its class, or of every class when it has none."""
+    from app.models import Student
+    criteria = [Student.status == 'active']
+    if exam.class_section_id:
+        criteria.append(Student.class_section_id == exam.class_section_id)
+    return criteria
+
+
+def load_matrix(exam):
+    """(exam subjects, student ids, obtained) for the exam's candidates with
+    marks. Students are in name order; obtained[i * len(exam_subjects) + j]
+    is student i's mark in exam subject j, NaN when not entered."""
+    from app.models import ExamSubject, Mark, Student
+    exam_subjects = (ExamSubject.query.options(joinedload(ExamSubject.subject))
+                     .filter_by(exam_id=exam.id).order_by(ExamSubject.id).all())
+    column = {es.subject_id: j for j, es in enumerate(exam_subjects)}
+    rows = db.session.execute(
+        select(Mark.student_id, Mark.subject_id, Mark.obtained_marks)
+        .join(Student, Mark.student_id == Student.id)
+        .where(Mark.exam_id == exam.id, Mark.subject_id.in_(list(column)), *_candidates(exam))
+        .order_by(Student.full_name, Student.id)).all()
+
+    width = len(exam_subjects)
+    student_ids, row_of = [], {}
+    obtained = array('d')
+    for student_id, subject_id, marks in rows:
+        i = row_of.get(student_id)
+        if i is None:
+            i = row_of[student_id] = len(student_ids)
+            student_ids.append(student_id)
+            obtained.extend([math.nan] * width)
+        obtained[i * width + column[subject_id]] = marks or 0
+    return exam_subjects, student_ids, obtained
+
+
+def _compute_numpy(obtained, count, possible, passing):
+    matrix = np.frombuffer(obtained, dtype=np.float64).reshape(count, len(passing))
+    totals = np.nansum(matrix, axis=1)
+    pct = totals * (100 / possible) if possible else np.zeros(count)
+    grades = np.searchsorted(GRADE_BOUNDS, pct, side='right')
+    passed = (matrix >= np.asarray(passing, dtype=np.float64)).all(axis=1)  # NaN fails
+    ranks = count - np.searchsorted(np.sort(totals), totals, side='right') + 1
+    order = np.argsort(-totals, kind='stable')
+    return totals.tolist(), pct.tolist(), grades.tolist(), passed.tolist(), ranks.tolist(), order.tolist()
+
+
+def _compute_python(obtained, count, possible, passing):
+    width = len(passing)
+    totals, passed = [], []
+    for i in range(count):
+        row = obtained[i * width:(i + 1) * width]
+        totals.append(sum(m for m in row if m == m))  # m != m only for NaN
+        passed.append(all(m >= p for m, p in zip(row, passing)))
+    pct = [t * (100 / possible) for t in totals] if possible else [0.0] * count
+    grades = [bisect_right(GRADE_BOUNDS, p) for p in pct]
+    order = sorted(range(count), key=lambda i: -totals[i])
+    ranks = [0] * count
+    for position, i in enumerate(order):
+        tied = position and totals[i] == totals[order[position - 1]]
+        ranks[i] = ranks[order[position - 1]] if tied else position + 1
+    return totals, pct, grades, passed, ranks, order
+
+
+def compute(obtained, count, possible, passing):
+    """(totals, percentages, grade indexes, passed, ranks, order) for a
+    matrix from load_matrix; order lists row indexes best first."""
+    if NUMPY_AVAILABLE and count:
+        return _compute_numpy(obtained, count, possible, passing)
+    return _compute_python(obtained, count, possible, passing)
+
+
+def exam_results(exam):
+    """Ranked results of the exam's candidates with marks in it.
+
+    {'exam_subjects', 'subjects', 'results': [{student, marks, total_obtained,
+    total_marks, percentage, grade, status, rank}], 'summary': {passed,
+    failed, avg_pct, top_pct}}. Ties share a rank; a student passes when
+    every subject of the exam has a mark at or above its passing marks."""
+    from app.models import Mark, Student
+    exam_subjects, student_ids, obtained = load_matrix(exam)
+    count = len(student_ids)
+    possible = sum(es.total_marks or 0 for es in exam_subjects)
+    passing = [es.passing_marks or 0 for es in exam_subjects]
+    totals, pct, grades, passed, ranks, order = compute(obtained, count, possible, passing)
+
+    students = {s.id: s for s in Student.query.filter(Student.id.in_(
+        select(Mark.student_id).where(Mark.exam_id == exam.id)), *_candidates(exam))}
+    width = len(exam_subjects)
+    results = []
+    for i in order:
+        row = obtained[i * width:(i + 1) * width]
+        results.append({
+            'student': students[student_ids[i]],
+            'marks': {es.subject_id: m for es, m in zip(exam_subjects, row) if m == m},
+            'total_obtained': round(totals[i], 2),
+            'total_marks': possible,
+            'percentage': round(pct[i], 1),
+            'grade': GRADE_LABELS[grades[i]] if possible else 'N/A',
+            'status': 'Pass' if passed[i] else 'Fail',
+            'rank': ranks[i],
+        })
+
+    passed_count = sum(1 for p in passed if p)
+    return {
+        'exam_subjects': exam_subjects,
+        'subjects': [es.subject for es in exam_subjects],
+        'results': results,
+        'summary': {
+            'passed': passed_count,
+            'failed': count - passed_count,
+            'avg_pct': round(sum(pct) / count, 1) if count else 0,
+            'top_pct': round(max(pct), 1) if count else 0,
+        },
+    }
@@ -0,0 +1,179 @@
+"""
+Analytics snapshots for AI-Powered Institutional Management & Face Recognition Attendance System
+
+Copies the history tables (attendance, fee payments, marks) into compressed
+files for the data team: Parquet when pyarrow is installed, gzipped CSV
+otherwise. Each run only copies rows created since the previous one. The
+position reached in each table is kept in manifest.json next to the files,
+together with the list of files and their column types.
+
+Rows are selected by (created_at, id), rows from before created_at was
+recorded (NULL) first, and are left for the next run until
+they are SNAPSHOT_LAG old, so that a transaction that committed late cannot
+slip behind the watermark. Rows are never rewritten: a mark corrected after
+it was exported shows up only in a later full snapshot (--full).
+"""
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, and_, or_
+from app import db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+SNAPSHOT_BATCH = 5000  # rows per yield_per() batch and per Parquet row group
+SNAPSHOT_LAG = timedelta(minutes=5)
+MANIFEST = 'manifest.json'
+
+
+def snapshot_tables():
+    """{name: table} of the tables that are snapshotted."""
+    from app.models import Attendance, FeePayment, Mark
+    return {
+        'attendance': Attendance.__table__,
+        'fee_payments': FeePayment.__table__,
+        'marks': Mark.__table__,
+    }
+
+
+def load_manifest(folder):
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return {'tables': {}}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _save_manifest(folder, manifest):
+    path = os.path.join(folder, MANIFEST)
+    with open(path + '.tmp', 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _column_type(column):
+    try:
+        return column.type.python_type.__name__
+    except NotImplementedError:
+        return 'str'
+
+
+class _CsvGzWriter:
+    """csv writes None as '' and dates via str(): 2024-05-01, 2024-05-01 08:30:00."""
+    extension = '.csv.gz'
+
+    def __init__(self, path, columns):
+        self._fh = gzip.open(path, 'wt', compresslevel=6, newline='', encoding='utf-8')
+        self._csv = csv.writer(self._fh)
+        self._csv.writerow([c.name for c in columns])
+
+    def write(self, rows):
+        self._csv.writerows(rows)
+
+    def close(self):
+        self._fh.close()
+
+
+class _ParquetWriter:
+    extension = '.parquet'
+
+    _TYPES = {'int': 'int64', 'float': 'float64', 'bool': 'bool_', 'str': 'string',
+              'date': 'date32', 'datetime': 'timestamp'}
+
+    def __init__(self, path, columns):
+        self._names = [c.name for c in columns]
+        fields = []
+        for c in columns:
+            kind = self._TYPES.get(_column_type(c), 'string')
+            pa_type = pa.timestamp('us') if kind == 'timestamp' else getattr(pa, kind)()
+            fields.append(pa.field(c.name, pa_type))
+        self._schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(path, self._schema, compression='zstd')
+
+    def write(self, rows):
+        data = list(zip(*rows)) if rows else [()] * len(self._names)
+        self._writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(data, self._schema)],
+            schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_table(name, table, folder, since=None, until=None, progress=None):
+    """Write rows of table created after the `since` watermark and no later
+    than `until` to one new file. Returns the manifest entry for the file,
+    or None when there was nothing new."""
+    created, pk = table.c.created_at, table.c.id
+    query = select(*table.columns).order_by(created.asc().nullsfirst(), pk)
+    if since:
+        if since['created_at'] is None:
+            # Stopped inside the rows from before created_at was recorded.
+            query = query.where(or_(created.isnot(None),
+                                    and_(created.is_(None), pk > since['id'])))
+        else:
+            since_at = datetime.fromisoformat(since['created_at'])
+            query = query.where(or_(created > since_at,
+                                    and_(created == since_at, pk > since['id'])))
+    if until is not None:
+        query = query.where(or_(created <= until, created.is_(None)))
+
+    writer_cls = _ParquetWriter if PYARROW_AVAILABLE else _CsvGzWriter
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    os.makedirs(os.path.join(folder, name), exist_ok=True)
+    filename = f'{name}/{name}_{stamp}{writer_cls.extension}'
+    suffix = 1
+    while os.path.exists(os.path.join(folder, filename)):
+        suffix += 1
+        filename = f'{name}/{name}_{stamp}_{suffix}{writer_cls.extension}'
+    path = os.path.join(folder, filename)
+    writer = writer_cls(path + '.tmp', list(table.columns))
+    count, last = 0, None
+    try:
+        result = db.session.execute(query.execution_options(yield_per=SNAPSHOT_BATCH))
+        for batch in result.partitions():
+            writer.write(batch)
+            count += len(batch)
+            last = batch[-1]
+            if progress:
+                progress(count)
+    finally:
+        writer.close()
+    if not count:
+        os.remove(path + '.tmp')
+        return None
+    os.replace(path + '.tmp', path)
+    watermark = {'created_at': last.created_at and last.created_at.isoformat(), 'id': last.id}
+    return {'file': filename, 'rows': count, 'bytes': os.path.getsize(path),
+            'written_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'watermark': watermark}
+
+
+def run_snapshot(folder, full=False, tables=None, progress=None):
+    """Snapshot each table (all of them by default) past its watermark, or
+    from the start when full=True. Returns {name: manifest entry or None}."""
+    manifest = load_manifest(folder)
+    until = datetime.utcnow() - SNAPSHOT_LAG
+    written = {}
+    for name, table in snapshot_tables().items():
+        if tables and name not in tables:
+            continue
+        state = manifest['tables'].setdefault(name, {'watermark': None, 'files': []})
+        state['columns'] = [{'name': c.name, 'type': _column_type(c)} for c in table.columns]
+        since = None if full else state['watermark']
+        entry = export_table(name, table, folder, since, until,
+                             progress=(lambda n, name=name: progress(name, n)) if progress else None)
+        written[name] = entry
+        if entry:
+            entry['full'] = full or since is None
+            state['files'].append(entry)
+            state['watermark'] = entry['watermark']
+        _save_manifest(folder, manifest)
+    return written
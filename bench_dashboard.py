@@ -0,0 +1,142 @@
+"""
+Dashboard Benchmark for AIMS-FR (MTB College Management System)
+
+Seeds a temporary SQLite database with a school's worth of students,
+teachers, attendance and fee payments, then has --users staff members log
+in at the same moment and load the dashboard --loads times each from
+their own threads - the 8am rush. Reports wall time, per-load latency and
+SQL statements per load.
+
+By default the counters come from the shared cache, as in production, so
+only the first load after a write recomputes them. --cold clears the cache
+before every load to time the single combined counters query itself.
+
+Usage:
+    python bench_dashboard.py                    # 8 users x 25 loads
+    python bench_dashboard.py --users 16 --cold
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from check_queries import counting
+
+STUDENTS = 5000
+TEACHERS = 200
+ATTENDANCE_DAYS = 40
+PAYMENTS = 100000
+
+
+def seed(users):
+    """The school, plus one staff login per simulated user."""
+    from app import db
+    from app.models import (User, ClassSection, Student, Teacher, Attendance,
+                            FeePayment)
+    from app.utils.attendance import rebuild_attendance_rollup
+    rng = random.Random(42)
+    today = date.today()
+    classes = [ClassSection(class_name=f'Class {i}', section='A') for i in range(1, 11)]
+    db.session.add_all(classes)
+    for i in range(users):
+        user = User(username=f'staff{i}', full_name=f'Staff {i}', role='teacher')
+        user.set_password('bench123')
+        db.session.add(user)
+    db.session.flush()
+    db.session.execute(db.insert(Student), [
+        {'reg_no': f'BENCH-{i:05d}', 'full_name': f'Student {i:05d}', 'status': 'active',
+         'class_section_id': classes[i % len(classes)].id,
+         'admission_date': today - timedelta(days=rng.randrange(1500))} for i in range(STUDENTS)])
+    db.session.execute(db.insert(Teacher), [
+        {'employee_id': f'BENCH-{i:04d}', 'full_name': f'Teacher {i}', 'status': 'active'}
+        for i in range(TEACHERS)])
+    students = db.session.execute(db.select(Student.id, Student.class_section_id)).all()
+    first_day = today - timedelta(days=ATTENDANCE_DAYS - 1)
+    for offset in range(ATTENDANCE_DAYS):
+        day = first_day + timedelta(days=offset)
+        db.session.execute(db.insert(Attendance), [
+            {'student_id': sid, 'class_section_id': cid, 'date': day,
+             'status': 'present' if rng.random() < 0.9 else 'absent'} for sid, cid in students])
+    rebuild_attendance_rollup(first_day, today)
+    db.session.execute(db.insert(FeePayment), [
+        {'receipt_no': f'BENCH-{i:07d}', 'student_id': rng.randrange(1, STUDENTS + 1),
+         'amount': 2000, 'total_paid': 2000,
+         'payment_date': today - timedelta(days=rng.randrange(1500))} for i in range(PAYMENTS)])
+    db.session.commit()
+
+
+def staff_member(app, index, loads, cold, barrier, timings, failures):
+    """One user: log in, then load the dashboard `loads` times."""
+    from app.utils.cache import cache
+    client = app.test_client()
+    barrier.wait()
+    client.post('/auth/login', data={'username': f'staff{index}', 'password': 'bench123'}).close()
+    for _ in range(loads):
+        if cold:
+            cache.clear()
+        start = time.perf_counter()
+        resp = client.get('/')
+        resp.get_data()
+        resp.close()
+        timings.append((time.perf_counter() - start) * 1000)
+        if resp.status_code != 200:
+            failures.append(resp.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--loads', type=int, default=25)
+    parser.add_argument('--cold', action='store_true', help='clear the cache before every load')
+    args = parser.parse_args()
+
+    # Threads need their own connections, which an in-memory database cannot give.
+    path = os.path.join(tempfile.mkdtemp(), 'dashboard.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app, db
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed(args.users)
+        engine = db.engine
+    print(f"{STUDENTS:,} students, {ATTENDANCE_DAYS} days of attendance, {PAYMENTS:,} payments")
+    print(f"{args.users} users x {args.loads} dashboard loads"
+          f"{' (cache cleared before each load)' if args.cold else ''}\n")
+
+    barrier = threading.Barrier(args.users)
+    timings, failures = [], []
+    threads = [threading.Thread(target=staff_member,
+                                args=(app, i, args.loads, args.cold, barrier, timings, failures))
+               for i in range(args.users)]
+    with counting(engine) as statements:
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+    loads = args.users * args.loads
+    timings.sort()
+    print(f"wall        {wall:8.2f} s   ({loads / wall:.0f} loads/s)")
+    print(f"p50         {statistics.median(timings):8.1f} ms")
+    print(f"p95         {timings[int(len(timings) * 0.95) - 1]:8.1f} ms")
+    print(f"statements  {len(statements):8d}     ({len(statements) / loads:.1f} per load, logins included)")
+    if failures:
+        print(f"\n{len(failures)} loads failed (status {sorted(set(failures))})")
+    engine.dispose()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+PDF Benchmark for AIMS-FR (MTB College Management System)
+
+Times the two PDF renderers in app/utils on the same sample documents and
+reports per-document latency and peak Python memory (tracemalloc):
+
+  platypus - the flowing layout (pdf_generator.render_flowing)
+  canvas   - the fixed forms with a shared Form XObject (pdf_canvas.render)
+
+Each kind is measured one document per PDF, as the receipt and result
+card links serve them, and as one PDF of --count documents, as the batch
+downloads do. Run it after changing either renderer.
+
+Usage:
+    python bench_pdf.py                 # 200 documents of each kind
+    python bench_pdf.py --count 1000
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+
+def sample_data():
+    """One realistic data dict per document kind."""
+    student = {'student_name': 'Muhammad Abdullah Khan', 'reg_no': 'MTB-2024-0001',
+               'father_name': 'Abdul Rehman', 'class_name': '10th - A'}
+    receipt = dict(student, receipt_no='RCP-20241019-0001', date='19-Oct-2024',
+                   payment_method='Cash', fee_name='Monthly Tuition Fee', period='October 2024',
+                   amount=2500, discount=100, fine=50, total_paid=2450,
+                   collected_by='Accounts Department')
+    voucher = dict(student, voucher_no='V-202410-MTB-2024-0001', month_label='October 2024',
+                   issue_date='01-Oct-2024', due_date='10-Oct-2024',
+                   lines=[('Tuition Fee', 2500), ('Lab Fee', 300), ('Transport', 1500)],
+                   arrears=1200, total=5500)
+    subjects = ['English', 'Urdu', 'Mathematics', 'Physics', 'Chemistry', 'Biology',
+                'Islamiyat', 'Pakistan Studies', 'Computer Science']
+    result_card = dict(student, exam_name='Mid Term', academic_year='2024-25', subject_marks=[
+        {'subject_name': name, 'obtained': 60 + i * 4, 'total': 100, 'grade': 'B'}
+        for i, name in enumerate(subjects)])
+    return {'receipt': receipt, 'voucher': voucher, 'result_card': result_card}
+
+
+def measure(fn, repeat):
+    """(median ms per call, peak KiB) of calling fn() repeat times."""
+    fn()  # warm up: imports, fonts, the per-process form geometry
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--count', type=int, default=200,
+                        help='documents per kind (single runs and batch size)')
+    args = parser.parse_args()
+
+    from app.utils import pdf_canvas
+    from app.utils.pdf_generator import render_flowing
+
+    renderers = {
+        'platypus': render_flowing,
+        'canvas': pdf_canvas.render,
+    }
+    print(f"{'document':<12} {'renderer':<9} {'single ms':>10} {'single KiB':>11} "
+          f"{'batch ms/doc':>13} {'batch KiB':>10}")
+    for kind, data in sample_data().items():
+        results = {}
+        for name, render in renderers.items():
+            single_ms, single_kib = measure(lambda: render(kind, [data]), args.count)
+            batch_ms, batch_kib = measure(lambda: render(kind, [data] * args.count), 3)
+            results[name] = single_ms
+            print(f'{kind:<12} {name:<9} {single_ms:>10.2f} {single_kib:>11.0f} '
+                  f'{batch_ms / args.count:>13.2f} {batch_kib:>10.0f}')
+        print(f"{'':<12} speed-up  {results['platypus'] / results['canvas']:>9.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
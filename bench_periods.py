@@ -0,0 +1,114 @@
+"""
+Period Filter Benchmark for AIMS-FR (MTB College Management System)
+
+Seeds an in-memory SQLite database with --payments fee payments spread
+over five years, then times a month's collection total filtered two ways:
+the half-open date range from app.utils.helpers.month_range that the
+dashboard and reports use, and the extract(month)/extract(year) predicate
+they used before. The range is served by ix_fee_payments_payment_date; no
+index can serve the extract() form, so it scans the whole table.
+
+Both forms must return the same total: the script exits non-zero if they
+differ or if the range query is not served by the index.
+
+Usage:
+    python bench_periods.py                      # 200,000 payments
+    python bench_periods.py --payments 1000000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+INDEX = 'ix_fee_payments_payment_date'
+
+
+def seed(payments):
+    """Payments on random days of the last five years, in batches."""
+    from app import db
+    from app.models import FeePayment
+    rng = random.Random(42)
+    first = date.today() - timedelta(days=5 * 365)
+    batch = []
+    for i in range(payments):
+        amount = rng.choice((1500, 2000, 2500, 3000))
+        batch.append({'receipt_no': f'BENCH-{i:07d}', 'student_id': rng.randint(1, 2000),
+                      'amount': amount, 'total_paid': amount,
+                      'payment_date': first + timedelta(days=rng.randrange(5 * 365))})
+        if len(batch) == 10000:
+            db.session.execute(db.insert(FeePayment), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(FeePayment), batch)
+    db.session.commit()
+
+
+def month_total(year, month, use_range):
+    """The query of the month's total collection, filtered either way."""
+    from sqlalchemy import func
+    from app import db
+    from app.models import FeePayment
+    from app.utils.helpers import month_range
+    query = db.session.query(func.coalesce(func.sum(FeePayment.total_paid), 0))
+    if use_range:
+        start, end = month_range(year, month)
+        return query.filter(FeePayment.payment_date >= start, FeePayment.payment_date < end)
+    return query.filter(func.extract('month', FeePayment.payment_date) == month,
+                        func.extract('year', FeePayment.payment_date) == year)
+
+
+def measure(query, repeat):
+    """(median ms, result) of running the query repeat times."""
+    query.scalar()  # warm up: statement cache, SQLite pages
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = query.scalar()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def plan(query):
+    from app import db
+    sql = str(query.statement.compile(dialect=db.engine.dialect,
+                                      compile_kwargs={'literal_binds': True}))
+    return ' / '.join(str(row[-1]) for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--payments', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app import create_app, db
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed(args.payments)
+        today = date.today()
+        print(f"{args.payments:,} fee payments, total for {today:%B %Y}\n")
+
+        failures = 0
+        results = {}
+        for name, use_range in (('range', True), ('extract', False)):
+            query = month_total(today.year, today.month, use_range)
+            ms, results[name] = measure(query, args.repeat)
+            print(f"{name:<8} {ms:8.2f} ms  total {results[name]:,.0f}")
+            print(f"         plan: {plan(query)}")
+            if use_range and INDEX not in plan(query):
+                failures += 1
+                print(f"         [MISS] not served by {INDEX}")
+        if results['range'] != results['extract']:
+            failures += 1
+            print("\n[FAIL] the two filters returned different totals")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
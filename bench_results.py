@@ -0,0 +1,162 @@
+"""
+Results Benchmark for AIMS-FR (MTB College Management System)
+
+Seeds an in-memory SQLite database with one exam sat by --students
+students in --subjects subjects, then times app.utils.results.exam_results
+(the Exams -> Results page) and counts the queries it issues. Both ways of
+computing the results are timed: NumPy, when it is installed, and the
+plain Python fallback. With NumPy installed the two must also agree on
+every student's total, percentage, grade, status and rank, and on the exam
+statistics (per-subject figures and the merit list).
+
+The query count must not grow with the number of students: the script
+exits non-zero if a results page takes more than QUERY_BUDGET queries, or
+if the two ways of computing disagree.
+
+Usage:
+    python bench_results.py                          # 1,000 students, 10 subjects
+    python bench_results.py --students 5000 --subjects 12
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date
+
+QUERY_BUDGET = 3  # exam subjects, marks, students
+
+
+def seed(students, subjects):
+    """One class, one exam and a mark for almost every student and subject."""
+    from app import db
+    from app.models import ClassSection, Exam, ExamSubject, Mark, Student, Subject
+    rng = random.Random(42)
+    cls = ClassSection(class_name='10th', section='A', academic_year='2025-26')
+    db.session.add(cls)
+    db.session.flush()
+    exam = Exam(name='Annual', exam_type='annual', class_section_id=cls.id, academic_year='2025-26')
+    db.session.add(exam)
+    subject_rows = [Subject(name=f'Subject {j}', code=f'BENCH-{j}') for j in range(subjects)]
+    db.session.add_all(subject_rows)
+    db.session.flush()
+    db.session.add_all(ExamSubject(exam_id=exam.id, subject_id=s.id, total_marks=100,
+                                   passing_marks=33) for s in subject_rows)
+    db.session.execute(db.insert(Student), [
+        {'reg_no': f'BENCH-{i:05d}', 'full_name': f'Student {i:05d}', 'class_section_id': cls.id,
+         'status': 'active', 'admission_date': date(2024, 4, 1)} for i in range(students)])
+    student_ids = db.session.scalars(db.select(Student.id)).all()
+    db.session.execute(db.insert(Mark), [
+        {'student_id': sid, 'exam_id': exam.id, 'subject_id': s.id,
+         'obtained_marks': rng.randint(0, 100), 'total_marks': 100}
+        for sid in student_ids for s in subject_rows if rng.random() > 0.01])
+    db.session.commit()
+    return exam.id
+
+
+def measure(exam_id, repeat):
+    """(median ms, queries) of exam_results for the exam."""
+    from sqlalchemy import event
+    from app import db
+    from app.models import Exam
+    from app.utils.results import exam_results
+
+    queries = []
+    listener = lambda *args: queries.append(args[2])
+    timings = []
+    exam_results(db.session.get(Exam, exam_id))  # warm up: statement cache, SQLite pages
+    for _ in range(repeat):
+        db.session.expunge_all()  # a request starts with an empty session
+        exam = db.session.get(Exam, exam_id)
+        queries.clear()
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        start = time.perf_counter()
+        exam_results(exam)
+        timings.append((time.perf_counter() - start) * 1000)
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return statistics.median(timings), len(queries)
+
+
+def result_rows(exam_id):
+    """exam_results reduced to comparable plain values, per student."""
+    from app import db
+    from app.models import Exam
+    from app.utils.results import exam_results
+    data = exam_results(db.session.get(Exam, exam_id))
+    return [(r['student'].id, r['total_obtained'], r['percentage'], r['grade'],
+             r['status'], r['rank']) for r in data['results']] + [data['summary']]
+
+
+def stats_rows(exam_id):
+    """The exam statistics (uncached) as comparable rows: overall, one per
+    subject, one per merit list entry."""
+    from app import db
+    from app.models import Exam
+    from app.utils.exam_stats import _build
+    data = _build(db.session.get(Exam, exam_id))
+    return [data['overall']] + data['subjects'] + data['merit']
+
+
+def compare(exam_id, outputs):
+    """Run outputs(exam_id) with NumPy and with plain Python; the list of
+    differences (empty when both paths agree)."""
+    from app.utils import results
+    numpy_available = results.NUMPY_AVAILABLE
+    try:
+        results.NUMPY_AVAILABLE = True
+        with_numpy = outputs(exam_id)
+        results.NUMPY_AVAILABLE = False
+        without = outputs(exam_id)
+    finally:
+        results.NUMPY_AVAILABLE = numpy_available
+    if len(with_numpy) != len(without):
+        return [f'{len(with_numpy)} rows != {len(without)} rows']
+    return [f'{a!r} != {b!r}' for a, b in zip(with_numpy, without) if a != b]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from app.utils import results
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        exam_id = seed(args.students, args.subjects)
+        print(f"{args.students} students x {args.subjects} subjects\n")
+
+        modes = [('numpy', True)] if results.NUMPY_AVAILABLE else []
+        modes.append(('python', False))
+        numpy_available = results.NUMPY_AVAILABLE
+        failures = 0
+        for name, use_numpy in modes:
+            results.NUMPY_AVAILABLE = use_numpy
+            ms, queries = measure(exam_id, args.repeat)
+            ok = queries <= QUERY_BUDGET
+            failures += not ok
+            print(f"[{'OK' if ok else 'OVER'}] {name:<7} {ms:8.1f} ms  {queries} queries")
+        results.NUMPY_AVAILABLE = numpy_available
+        if numpy_available:
+            print()
+            for name, outputs in (('results', result_rows), ('statistics', stats_rows)):
+                differences = compare(exam_id, outputs)
+                failures += bool(differences)
+                print(f"[{'OK' if not differences else 'DIFF'}] NumPy and Python {name} agree")
+                for difference in differences[:5]:
+                    print(f"    {difference[:200]}")
+        else:
+            print("\nNumPy is not installed - only the plain Python path was timed "
+                  "and the two paths were not compared.")
+
+    print(f"\nQuery budget: {QUERY_BUDGET} per results page.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Attendance Marking Checker for AIMS-FR (MTB College Management System)
+
+Posts the attendance sheet of a class the way the mark page does - first
+marking everyone (all inserts), then changing a third of the statuses (all
+updates) - and counts the SQL statements each POST issues. The count must
+stay within budget and be the same for a small and a large class: existing
+rows are loaded in one query, new rows go in as one batched INSERT and
+changes as one executemany UPDATE, so a class never costs a round trip per
+student.
+
+Usage:
+    python check_attendance.py
+"""
+
+import sys
+from datetime import date
+
+from check_queries import counting
+
+CLASS_SIZES = (10, 60, 240)
+QUERY_BUDGET = 6  # per POST, including the rollup refresh
+
+
+def seed(db, sizes):
+    """An admin, and one class of each size; returns the class ids."""
+    from app.models import User, ClassSection, Student
+    admin = User(username='admin', full_name='Admin', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    class_ids = []
+    for size in sizes:
+        klass = ClassSection(class_name=f'Class {size}', section='A')
+        db.session.add(klass)
+        db.session.flush()
+        db.session.add_all(Student(reg_no=f'CHK-{size}-{i:04d}', full_name=f'Student {i}',
+                                   class_section_id=klass.id, status='active')
+                           for i in range(size))
+        class_ids.append(klass.id)
+    db.session.commit()
+    return class_ids
+
+
+def post_sheet(client, engine, class_id, statuses):
+    form = {'class_id': class_id, 'att_date': date.today().isoformat()}
+    form.update({f'status_{sid}': status for sid, status in statuses.items()})
+    with counting(engine) as statements:
+        resp = client.post('/attendance/mark', data=form)
+        resp.close()
+    return resp.status_code, statements
+
+
+def main():
+    from app import create_app, db
+    from app.models import Attendance, Student
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        class_ids = seed(db, CLASS_SIZES)
+        students = {cid: [sid for (sid,) in db.session.query(Student.id).filter_by(class_section_id=cid)]
+                    for cid in class_ids}
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    client.get('/attendance/mark').close()  # warm the reference data cache
+    print(f"Statements per attendance POST (budget {QUERY_BUDGET}):\n")
+    failures = 0
+    counts = set()
+    for size, class_id in zip(CLASS_SIZES, class_ids):
+        ids = students[class_id]
+        first = {sid: 'present' for sid in ids}
+        second = {sid: ('absent' if i % 3 == 0 else 'present') for i, sid in enumerate(ids)}
+        for label, statuses in (('insert', first), ('update', second)):
+            status, statements = post_sheet(client, engine, class_id, statuses)
+            with app.app_context():
+                stored = dict(db.session.query(Attendance.student_id, Attendance.status).filter_by(
+                    class_section_id=class_id, date=date.today()))
+            ok = status == 302 and stored == statuses and len(statements) <= QUERY_BUDGET
+            failures += not ok
+            counts.add((label, len(statements)))
+            print(f"[{'OK' if ok else 'FAIL'}] {size:>4} students, {label}: {len(statements)} statements")
+            if not ok:
+                for statement in statements:
+                    print('    ' + ' '.join(statement.split())[:120])
+
+    # The same kind of POST must cost the same whatever the class size.
+    flat = len({label for label, _ in counts}) == len(counts)
+    failures += not flat
+    print(f"\n[{'OK' if flat else 'FAIL'}] statement count independent of class size")
+    print(f"\n{failures} checks failed.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
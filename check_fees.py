@@ -0,0 +1,92 @@
+"""
+Fee Defaulters Checker for AIMS-FR (MTB College Management System)
+
+Seeds a class with a monthly tuition fee and three students - one who has
+never paid, one who has paid this month and one who has withdrawn - and
+loads the defaulters page before and after this month's charges are
+generated. Both times the student who has never paid must be listed with
+the class's tuition due, and the other two must not be.
+
+Usage:
+    python check_fees.py
+"""
+
+import re
+import sys
+from datetime import date
+
+TUITION = 3000
+
+
+def seed(db):
+    """An admin, the class and its fee structure, and the three students."""
+    from app.models import User, ClassSection, FeeStructure, Student
+    admin = User(username='admin', full_name='Admin', role='admin')
+    admin.set_password('admin123')
+    klass = ClassSection(class_name='9', section='A')
+    db.session.add_all([admin, klass, FeeStructure(name='Tuition Fee - Class 9', class_name='9',
+                                                   amount=TUITION, fee_type='tuition')])
+    db.session.flush()
+    first_of_month = date.today().replace(day=1)
+    students = {status: Student(reg_no=f'CHK-{status.upper()}', full_name=f'Student {status}',
+                                class_section_id=klass.id, admission_date=first_of_month,
+                                status='withdrawn' if status == 'withdrawn' else 'active')
+                for status in ('unpaid', 'paid', 'withdrawn')}
+    db.session.add_all(students.values())
+    db.session.commit()
+    return {status: s.id for status, s in students.items()}
+
+
+def listed(client):
+    """{reg_no: outstanding} of the rows on the defaulters page."""
+    resp = client.get('/fees/defaulters')
+    body = resp.get_data(as_text=True)
+    resp.close()
+    return resp.status_code, {
+        reg_no: float(amount.replace(',', ''))
+        for reg_no, amount in re.findall(
+            r'<span class="reg-no">([^<]+)</span>.*?<strong>PKR ([\d,.]+)</strong>', body, re.S)}
+
+
+def main():
+    from app import create_app, db
+    from app.utils import ledger
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        ids = seed(db)
+
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'}).close()
+    today = date.today()
+    client.post('/fees/record', data={
+        'student_id': ids['paid'], 'amount': TUITION, 'month': today.strftime('%B'),
+        'year': today.year, 'payment_method': 'cash'}).close()
+
+    failures = 0
+    for stage in ('before charges', 'after charges'):
+        if stage == 'after charges':
+            with app.app_context():
+                ledger.ensure_charges(today.year, today.month)
+                db.session.commit()
+        status, rows = listed(client)
+        checks = (
+            ('page loads', status == 200),
+            ('never-paid student listed with the tuition due', rows.get('CHK-UNPAID') == TUITION),
+            ('student who paid this month not listed', 'CHK-PAID' not in rows),
+            ('withdrawn student not listed', 'CHK-WITHDRAWN' not in rows),
+        )
+        print(f"{stage}:")
+        for label, ok in checks:
+            failures += not ok
+            print(f"  [{'OK' if ok else 'FAIL'}] {label}")
+        if not all(ok for _, ok in checks):
+            print(f"         listed: {rows}")
+
+    print(f"\n{failures} checks failed.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
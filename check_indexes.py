@@ -0,0 +1,100 @@
+"""
+Index Checker for AIMS-FR (MTB College Management System)
+
+Runs EXPLAIN on each of the hot dashboard/report queries and reports
+whether the database actually serves it from the index declared for it in
+app/models.py. Run this after touching models or the queries below, on
+SQLite and against Postgres, to catch a query that has silently fallen
+back to a full table scan.
+
+Usage:
+    python check_indexes.py                      # in-memory SQLite
+    DATABASE_URL=postgresql://... python check_indexes.py
+
+Against Postgres the schema must already exist (flask upgrade-db). The
+check turns off sequential scans for its own session only: on a small
+table the planner prefers a seq scan even when a usable index exists,
+and what we want to know is whether the index *can* serve the query.
+"""
+
+import sys
+from datetime import date
+
+
+def hot_queries():
+    """(expected index, query) pairs, built the same way the routes build them."""
+    from app import db
+    from app.models import Attendance, FeePayment, Mark, BookIssue, Student
+    from app.utils.helpers import month_range
+
+    today = date.today()
+    month_start, month_end = month_range(today.year, today.month)
+    return [
+        ('ix_attendance_date_status',
+         db.session.query(Attendance.id).filter(
+             Attendance.date == today, Attendance.status == 'present')),
+        ('ix_attendance_class_date',
+         db.session.query(Attendance.id).filter(
+             Attendance.class_section_id == 1, Attendance.date == today)),
+        ('ix_fee_payments_period_student',
+         db.session.query(FeePayment.student_id).filter(
+             FeePayment.month == today.strftime('%B'), FeePayment.year == today.year)),
+        ('ix_fee_payments_payment_date',
+         db.session.query(FeePayment.total_paid).filter(
+             FeePayment.payment_date >= month_start,
+             FeePayment.payment_date < month_end)),
+        ('ix_marks_exam_subject',
+         db.session.query(Mark.id).filter(Mark.exam_id == 1, Mark.subject_id == 1)),
+        ('ix_book_issues_status_due',
+         db.session.query(BookIssue.id).filter(
+             BookIssue.status == 'issued', BookIssue.due_date < today)),
+        ('ix_students_admission_date',
+         db.session.query(Student.id).filter(
+             Student.admission_date >= month_start,
+             Student.admission_date < month_end)),
+        ('ix_students_status_class',
+         db.session.query(Student.id).filter(
+             Student.status == 'active', Student.class_section_id == 1)),
+    ]
+
+
+def explain(query):
+    from app import db
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+        return '\n'.join(str(row[-1]) for row in rows)
+    rows = db.session.execute(db.text(f'EXPLAIN {sql}')).fetchall()
+    return '\n'.join(str(row[0]) for row in rows)
+
+
+def main():
+    import os
+    from app import create_app, db
+
+    app = create_app('testing')
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite' and not os.environ.get('DATABASE_URL'):
+            db.create_all()
+        if dialect == 'postgresql':
+            db.session.execute(db.text('SET enable_seqscan = off'))
+
+        print(f"Checking hot queries on {dialect}...\n")
+        failures = 0
+        for index_name, query in hot_queries():
+            plan = explain(query)
+            ok = index_name in plan
+            failures += not ok
+            print(f"[{'OK' if ok else 'MISS'}] {index_name}")
+            if not ok:
+                print('    ' + plan.replace('\n', '\n    '))
+        db.session.rollback()
+
+    print(f"\n{failures} hot queries not served by their index.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
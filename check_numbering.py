@@ -0,0 +1,103 @@
+"""
+Numbering Checker for AIMS-FR (MTB College Management System)
+
+Allocates receipt/registration-style numbers with next_number from many
+threads at once, each in its own session and transaction, and checks the
+committed numbers are exactly 1..N: no number handed out twice and none
+skipped. Some allocations are rolled back on purpose - a rolled back
+number must be handed out again, not lost. All threads start together on
+a fresh prefix, so they also race to create its number_sequences row.
+
+Usage:
+    python check_numbering.py                      # temporary SQLite file
+    DATABASE_URL=postgresql://... python check_numbering.py
+
+Against Postgres the schema must already exist (flask upgrade-db); the
+check uses its own prefix and removes its sequence row afterwards.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def allocate(app, prefix, count, barrier, committed, errors):
+    """One worker: count allocations, every fifth one rolled back."""
+    from app import db
+    from app.models import Student
+    from app.utils.helpers import next_number
+
+    with app.app_context():
+        barrier.wait()
+        done = attempt = 0
+        while done < count:
+            attempt += 1
+            try:
+                number = next_number(prefix, Student.reg_no)
+                if attempt % 5 == 0:
+                    db.session.rollback()
+                    continue
+                db.session.commit()
+                committed.append(number)
+                done += 1
+            except Exception as exc:  # a lock timeout here is a real failure too
+                db.session.rollback()
+                errors.append(f'{type(exc).__name__}: {exc}')
+                return
+        db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=25)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'numbering.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app, db
+    from app.models import NumberSequence
+
+    app = create_app('testing')
+    prefix = f'CHK-{os.getpid()}-'
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            db.create_all()
+
+    barrier = threading.Barrier(args.threads)
+    committed, errors = [], []
+    threads = [threading.Thread(target=allocate,
+                                args=(app, prefix, args.per_thread, barrier, committed, errors))
+               for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        NumberSequence.query.filter_by(prefix=prefix).delete()
+        db.session.commit()
+
+    expected = args.threads * args.per_thread
+    duplicates = len(committed) - len(set(committed))
+    gaps = sorted(set(range(1, expected + 1)) - set(committed))
+    print(f"{args.threads} threads x {args.per_thread} numbers on {dialect} "
+          f"in {elapsed:.2f}s: {len(committed)} committed")
+    print(f"[{'OK' if not errors else 'FAIL'}] errors: {len(errors)}")
+    for error in errors[:5]:
+        print(f"    {error}")
+    print(f"[{'OK' if not duplicates else 'FAIL'}] duplicates: {duplicates}")
+    print(f"[{'OK' if not gaps else 'FAIL'}] gaps: {len(gaps)}" + (f" (first {gaps[:10]})" if gaps else ''))
+    sys.exit(1 if errors or duplicates or gaps else 0)
+
+
+if __name__ == "__main__":
+    main()
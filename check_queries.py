@@ -0,0 +1,117 @@
+"""
+Query Budget Checker for AIMS-FR (MTB College Management System)
+
+Logs in, warms the caches and counts the SQL statements each hot page and
+chart API issues per request, failing any that exceed its budget. The
+session user comes from the cache like everything else these pages show
+when warm, so the cached pages and APIs must not query at all. A commit to
+users invalidates the cached user, and the check confirms that deactivating
+a logged-in user takes effect on their very next request.
+
+Usage:
+    python check_queries.py
+"""
+
+import sys
+from contextlib import contextmanager
+
+# (url, statements allowed per warm request)
+BUDGETS = [
+    ('/api/stats', 0),
+    ('/api/enrollment-data', 0),
+    ('/api/attendance-data', 0),
+    ('/api/fees-data', 0),
+    ('/api/class-stats', 1),  # live per-class counts, not cached
+    ('/students/add', 0),
+    ('/', 2),
+]
+
+
+@contextmanager
+def counting(engine):
+    """Yields a list that collects every statement run on the engine."""
+    from sqlalchemy import event
+    statements = []
+
+    def before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+
+
+def seed(db):
+    from app.models import User, ClassSection
+    admin = User(username='admin', full_name='Admin', role='admin')
+    admin.set_password('admin123')
+    clerk = User(username='clerk', full_name='Clerk', role='receptionist')
+    clerk.set_password('clerk123')
+    manager = User(username='manager', full_name='Manager', role='admin')
+    manager.set_password('manager123')
+    db.session.add_all([admin, clerk, manager, ClassSection(class_name='Class 1', section='A')])
+    db.session.commit()
+
+
+def main():
+    from app import create_app, db
+    from app.models import User
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed(db)
+        engine = db.engine
+
+    # Requests run outside any app context of ours, so each gets a fresh
+    # session the way it would under a real server.
+    failures = 0
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    print("Statements per warm request:\n")
+    for url, budget in BUDGETS:
+        client.get(url).close()  # warm the caches
+        with counting(engine) as statements:
+            resp = client.get(url)
+            resp.get_data()
+            resp.close()
+        ok = resp.status_code == 200 and len(statements) <= budget
+        failures += not ok
+        print(f"[{'OK' if ok else 'FAIL'}] {url:<24} {len(statements)} (budget {budget}, "
+              f"status {resp.status_code})")
+        if not ok:
+            for statement in statements:
+                print('    ' + ' '.join(statement.split())[:120])
+
+    # A deactivated user must be logged out on their next request.
+    clerk = app.test_client()
+    clerk.post('/auth/login', data={'username': 'clerk', 'password': 'clerk123'})
+    before = clerk.get('/api/stats').status_code
+    with app.app_context():
+        User.query.filter_by(username='clerk').update({'is_active': False})
+        db.session.commit()
+    after = clerk.get('/api/stats').status_code
+    ok = before == 200 and after != 200
+    failures += not ok
+    print(f"\n[{'OK' if ok else 'FAIL'}] deactivated user: status {before} before, {after} after")
+
+    # So must a role change, made through the ORM rather than a bulk update.
+    manager = app.test_client()
+    manager.post('/auth/login', data={'username': 'manager', 'password': 'manager123'})
+    before = manager.get('/settings/cache-stats').status_code
+    with app.app_context():
+        User.query.filter_by(username='manager').one().role = 'teacher'
+        db.session.commit()
+    after = manager.get('/settings/cache-stats').status_code
+    ok = before == 200 and after != 200
+    failures += not ok
+    print(f"[{'OK' if ok else 'FAIL'}] demoted admin: admin page status {before} before, {after} after")
+
+    print(f"\n{failures} checks failed.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Exam Results Checker for AIMS-FR (MTB College Management System)
+
+Seeds two classes with marks in a class exam and an all-classes exam,
+including a student who has since withdrawn and, for the class exam, a
+student of the other class with stray marks. The results page and the
+statistics API must cover only active students - of the exam's class
+when it has one - and their counts must agree.
+
+Usage:
+    python check_results.py
+"""
+
+import json
+import re
+import sys
+
+
+def seed(db):
+    """An admin, two classes, the two exams and everyone's marks.
+    Returns {exam name: exam id}."""
+    from app.models import User, ClassSection, Exam, ExamSubject, Mark, Student, Subject
+    admin = User(username='admin', full_name='Admin', role='admin')
+    admin.set_password('admin123')
+    class_a = ClassSection(class_name='9', section='A')
+    class_b = ClassSection(class_name='9', section='B')
+    subjects = [Subject(name='Maths', code='CHK-M'), Subject(name='English', code='CHK-E')]
+    db.session.add_all([admin, class_a, class_b, *subjects])
+    db.session.flush()
+    students = [
+        Student(reg_no='CHK-A1', full_name='Student A1', class_section_id=class_a.id, status='active'),
+        Student(reg_no='CHK-A2', full_name='Student A2', class_section_id=class_a.id, status='active'),
+        Student(reg_no='CHK-AW', full_name='Student AW', class_section_id=class_a.id, status='withdrawn'),
+        Student(reg_no='CHK-B1', full_name='Student B1', class_section_id=class_b.id, status='active'),
+    ]
+    exams = {'class': Exam(name='Class test', exam_type='monthly', class_section_id=class_a.id),
+             'all classes': Exam(name='Annual', exam_type='annual')}
+    db.session.add_all([*students, *exams.values()])
+    db.session.flush()
+    for exam in exams.values():
+        db.session.add_all(ExamSubject(exam_id=exam.id, subject_id=s.id, total_marks=100,
+                                       passing_marks=33) for s in subjects)
+        db.session.add_all(Mark(student_id=st.id, exam_id=exam.id, subject_id=s.id,
+                                obtained_marks=60, total_marks=100)
+                           for st in students for s in subjects)
+    db.session.commit()
+    return {name: exam.id for name, exam in exams.items()}
+
+
+def fetch(client, url):
+    resp = client.get(url)
+    body = resp.get_data(as_text=True)
+    resp.close()
+    return resp.status_code, body
+
+
+def main():
+    from app import create_app, db
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        exam_ids = seed(db)
+
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'}).close()
+    expected = {'class': {'CHK-A1', 'CHK-A2'}, 'all classes': {'CHK-A1', 'CHK-A2', 'CHK-B1'}}
+    failures = 0
+    for name, exam_id in exam_ids.items():
+        status, body = fetch(client, f'/exams/{exam_id}/results')
+        listed = set(re.findall(r'<span class="reg-no">([^<]+)</span>', body))
+        api_status, api_body = fetch(client, f'/exams/{exam_id}/api/statistics')
+        stats = json.loads(api_body) if api_status == 200 else {}
+        merit = {row['reg_no'] for row in stats.get('merit', [])}
+        checks = (
+            ('results page lists the active candidates only', status == 200 and listed == expected[name]),
+            ('withdrawn student left out', 'CHK-AW' not in listed | merit),
+            ('merit list matches the results page', merit == listed),
+            ('statistics count the same students',
+             stats.get('overall', {}).get('students') == len(expected[name])),
+        )
+        print(f"{name} exam:")
+        for label, ok in checks:
+            failures += not ok
+            print(f"  [{'OK' if ok else 'FAIL'}] {label}")
+        if not all(ok for _, ok in checks):
+            print(f"         results {sorted(listed)}, merit {sorted(merit)}")
+
+    print(f"\n{failures} checks failed.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -68,8 +68,14 @@ def main():
                 r = client.get(url, follow_redirects=False)
                 status = r.status_code
                 detail = ""
+                # Consume and close every response: a streamed body left
+                # open keeps its request context pushed, and the next
+                # request then fails with "Popped wrong request context".
+                # An event stream never ends by itself, so it is only closed.
+                body = b'' if r.mimetype == 'text/event-stream' else r.get_data()
+                r.close()
                 if status == 500:
-                    body = r.get_data(as_text=True)
+                    body = body.decode('utf-8', 'replace')
                     m = re.search(r'(\w*Error: .{0,160})', body)
                     detail = m.group(1) if m else body[:160].replace('\n', ' ')
                 results.append((rule.endpoint, url, status, detail))
@@ -6,10 +6,46 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'uploads')
     FACE_ENCODINGS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'face_encodings')
+    # Shared cache tier used by every worker on the host; empty disables it.
+    # Unset, this and the job and PDF folders below go in the instance folder
+    # (see init_app), never the world-writable temp dir.
+    CACHE_SHARED_PATH = os.environ.get('CACHE_SHARED_PATH')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 30))
+    # Background jobs (flask jobs-worker); web and worker must share this folder
+    JOB_RESULTS_FOLDER = os.environ.get('JOB_RESULTS_FOLDER')
+    JOB_RETENTION_HOURS = int(os.environ.get('JOB_RETENTION_HOURS', 24))
+    JOB_MAX_ACTIVE_PER_USER = int(os.environ.get('JOB_MAX_ACTIVE_PER_USER', 2))
+    # Processes rendering batch PDFs; 0 renders in the calling process (Vercel)
+    PDF_WORKERS = int(os.environ.get(
+        'PDF_WORKERS', 0 if os.environ.get('VERCEL') == '1' else min(4, os.cpu_count() or 1)))
+    # Cached receipt and result-card PDFs; empty stores them in the database
+    PDF_CACHE_FOLDER = os.environ.get(
+        'PDF_CACHE_FOLDER', '' if os.environ.get('VERCEL') == '1' else None)
+    PDF_CACHE_MAX_MB = int(os.environ.get('PDF_CACHE_MAX_MB', 200))
+    # Live dashboard counters over server-sent events. Each open stream holds a
+    # worker thread, so they are capped per worker; when streaming is off or
+    # the cap is reached the dashboard polls /api/stats instead.
+    DASHBOARD_STREAM = os.environ.get(
+        'DASHBOARD_STREAM', '0' if os.environ.get('VERCEL') == '1' else '1') == '1'
+    DASHBOARD_STREAM_MAX = int(os.environ.get('DASHBOARD_STREAM_MAX', 16))
+    DASHBOARD_POLL_SECONDS = int(os.environ.get('DASHBOARD_POLL_SECONDS', 60))
+    # Incremental analytics snapshots (flask analytics-snapshot)
+    SNAPSHOT_FOLDER = os.environ.get(
+        'SNAPSHOT_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+
+    INSTANCE_DEFAULTS = {
+        'CACHE_SHARED_PATH': 'cache.sqlite3',
+        'JOB_RESULTS_FOLDER': 'jobs',
+        'PDF_CACHE_FOLDER': 'pdf_cache',
+    }
 
     @staticmethod
     def init_app(app):
+        for key, name in Config.INSTANCE_DEFAULTS.items():
+            if app.config.get(key) is None:
+                app.config[key] = os.path.join(app.instance_path, name)
         try:
+            os.makedirs(app.instance_path, mode=0o700, exist_ok=True)
             os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
             os.makedirs(Config.FACE_ENCODINGS_FOLDER, exist_ok=True)
         except Exception:
@@ -54,6 +90,9 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    CACHE_SHARED_PATH = ''
+    PDF_WORKERS = 0
+    PDF_CACHE_FOLDER = ''
 
 
 config = {
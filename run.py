@@ -86,5 +86,202 @@ def seed_db():
     click.echo("Teacher: teacher1 / teacher123")
     click.echo("Staff: staff1 / staff123")
 
+@app.cli.command("upgrade-db")
+def upgrade_db():
+    """Create tables, nullable columns and indexes added since the database
+    was first created."""
+    had_ledger = db.inspect(db.engine).has_table('fee_ledger')
+    had_rollup = db.inspect(db.engine).has_table('attendance_daily')
+    db.create_all()  # only creates missing tables
+    inspector = db.inspect(db.engine)
+    created = 0
+    added = set()
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                ddl = str(db.schema.CreateColumn(column).compile(dialect=db.engine.dialect))
+                ddl += ''.join(f' REFERENCES {fk.column.table.name} ({fk.column.name})'
+                               for fk in column.foreign_keys)
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+                click.echo(f"   Added column {table.name}.{column.name}")
+                added.add(f'{table.name}.{column.name}')
+    if 'attendance.leave_application_id' in added:
+        from app.utils.attendance import link_leave_attendance
+        rows = link_leave_attendance()
+        db.session.commit()
+        click.echo(f"   Linked {rows} leave attendance rows to their applications")
+    if 'uq_marks_student_exam_subject' not in {ix['name'] for ix in inspector.get_indexes('marks')}:
+        from app.utils.marks import remove_duplicate_marks
+        removed = remove_duplicate_marks()
+        db.session.commit()
+        if removed:
+            click.echo(f"   Removed {removed} duplicate marks (kept the latest of each)")
+    for table in db.metadata.sorted_tables:
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                click.echo(f"   Created index {index.name}")
+                created += 1
+    if not had_ledger:
+        from app.utils.ledger import rebuild_ledger
+        rows = rebuild_ledger()
+        db.session.commit()
+        click.echo(f"   Built fee ledger from existing payments ({rows} rows)")
+    if not had_rollup:
+        from app.models import Attendance
+        from app.utils.attendance import rebuild_attendance_rollup
+        first, last = db.session.query(db.func.min(Attendance.date), db.func.max(Attendance.date)).one()
+        rows = rebuild_attendance_rollup(first, last) if first else 0
+        db.session.commit()
+        click.echo(f"   Built attendance rollup from existing attendance ({rows} rows)")
+    click.echo(f"✅ Schema up to date ({len(added)} new columns, {created} new indexes).")
+
+@app.cli.command("rebuild-attendance-rollup")
+@click.option('--from', 'from_date', default=None, help='First day to rebuild (YYYY-MM-DD).')
+@click.option('--to', 'to_date', default=None, help='Last day to rebuild (YYYY-MM-DD).')
+def rebuild_attendance_rollup_cmd(from_date, to_date):
+    """Regenerate the daily attendance rollup from raw attendance rows."""
+    from datetime import datetime
+    from app.models import Attendance, AttendanceDaily
+    from app.utils.attendance import rebuild_attendance_rollup
+
+    # Existing databases predate the rollup table - create it on first run.
+    AttendanceDaily.__table__.create(db.engine, checkfirst=True)
+
+    first, last = db.session.query(db.func.min(Attendance.date), db.func.max(Attendance.date)).one()
+    start = datetime.strptime(from_date, '%Y-%m-%d').date() if from_date else first
+    end = datetime.strptime(to_date, '%Y-%m-%d').date() if to_date else last
+    if start is None or end is None:
+        click.echo("No attendance recorded yet - nothing to rebuild.")
+        return
+
+    written = rebuild_attendance_rollup(start, end)
+    db.session.commit()
+    click.echo(f"✅ Rebuilt {written} rollup rows for {start} to {end}.")
+
+@app.cli.command("cache-clear")
+def cache_clear():
+    """Empty the shared cache tier (workers' in-process copies expire by TTL)."""
+    from app.utils.cache import cache
+    if cache.shared is None:
+        click.echo("No shared cache configured (CACHE_SHARED_PATH) - nothing to clear.")
+        return
+    cache.clear()
+    click.echo(f"✅ Cleared shared cache at {cache.shared.path}.")
+
+@app.cli.command("pdf-cache-clear")
+def pdf_cache_clear():
+    """Delete every cached receipt and result-card PDF."""
+    from app.utils.pdf_cache import pdf_cache
+    removed = pdf_cache.store.clear()
+    click.echo(f"✅ Removed {removed} cached PDFs.")
+
+@app.cli.command("fees-generate-charges")
+@click.option('--month', 'month_str', default=None, help='Month to charge (YYYY-MM, default: this month).')
+@click.option('--from', 'from_str', default=None, help='Charge every month from YYYY-MM up to --month.')
+def fees_generate_charges(month_str, from_str):
+    """Create the month's expected fee charges for active students, from the
+    fee structures of the month's academic year (or the closest year with any)."""
+    from datetime import date, datetime
+    from app.utils.ledger import ensure_charges, charging_structures, period_of, period_label
+    def parse(value):
+        d = datetime.strptime(value, '%Y-%m').date() if value else date.today()
+        return period_of(d.year, d.month)
+    last = parse(month_str)
+    first = parse(from_str) if from_str else last
+    for period in range(first, last + 1):
+        if not charging_structures(period // 12, period % 12 + 1):
+            click.echo(f"   {period_label(period)}: no active fee structure bills in this month")
+            continue
+        charged = ensure_charges(period // 12, period % 12 + 1)
+        db.session.commit()
+        click.echo(f"   {period_label(period)}: {len(charged)} students charged")
+    click.echo("✅ Charges up to date.")
+
+@app.cli.command("fees-reconcile")
+@click.option('--fix', is_flag=True, help='Rebuild the ledger rows of mismatched students.')
+def fees_reconcile(fix):
+    """Check the fee ledger against the raw charges and payments."""
+    from app.utils.ledger import reconcile
+    report = reconcile(fix=fix)
+    for ex in report['examples']:
+        click.echo(f"   student {ex['student_id']}, {ex['month']}: "
+                   f"stored {ex['stored']}, expected {ex['expected']}")
+    if not report['mismatched']:
+        click.echo(f"✅ Ledger matches payments ({report['rows']} rows, {report['students']} students).")
+    elif fix:
+        db.session.commit()
+        click.echo(f"✅ Rebuilt the ledger of {report['mismatched']} students.")
+    else:
+        click.echo(f"❌ {report['mismatched']} students differ - run with --fix to rebuild them.")
+        raise SystemExit(1)
+
+@app.cli.command("exam-result-cards")
+@click.argument('exam_id', type=int)
+@click.option('--class', 'class_id', type=int, default=None, help='Only this class section id.')
+@click.option('--pdf', 'one_pdf', is_flag=True, help='One PDF with a card per page instead of a ZIP.')
+@click.option('--out', 'out_path', default=None, help='File to write (default: in the current folder).')
+def exam_result_cards(exam_id, class_id, one_pdf, out_path):
+    """Write the result cards of every student in an exam to a ZIP or one PDF."""
+    from app.models import Exam
+    from app.utils.batch_pdf import batch_files, render_one_pdf, result_card_items
+    from app.utils.exporter import iter_zip
+    exam = db.session.get(Exam, exam_id)
+    if exam is None:
+        click.echo(f"❌ Exam {exam_id} not found.")
+        raise SystemExit(1)
+    items = result_card_items(exam, class_id)
+    if not items:
+        click.echo("No marks entered for this exam yet - nothing to print.")
+        return
+    out_path = out_path or f"result_cards_{exam.id}.{'pdf' if one_pdf else 'zip'}"
+    with open(out_path, 'wb') as fh:
+        if one_pdf:
+            fh.write(render_one_pdf('result_card', [data for _, data in items]))
+        else:
+            for chunk in iter_zip(batch_files('result_card', items)):
+                fh.write(chunk)
+    click.echo(f"✅ Wrote {len(items)} result cards to {out_path}.")
+
+@app.cli.command("jobs-worker")
+@click.option('--threads', default=1, show_default=True, help='Jobs to run at the same time.')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+def jobs_worker(threads, once):
+    """Run queued background jobs (exports, result cards, rollup rebuilds)."""
+    from app.models import Job
+    from app.utils.jobs import run_worker
+    Job.__table__.create(db.engine, checkfirst=True)
+    click.echo(f"Worker started with {threads} thread(s); results in {app.config['JOB_RESULTS_FOLDER']}.")
+    run_worker(app, threads=threads, once=once)
+    click.echo("✅ Worker stopped.")
+
+@app.cli.command("jobs-cleanup")
+def jobs_cleanup():
+    """Delete expired job results and fail jobs whose worker died."""
+    from app.utils.jobs import cleanup_jobs
+    removed, failed = cleanup_jobs(app.config['JOB_RETENTION_HOURS'])
+    click.echo(f"✅ Removed {removed} expired jobs, marked {failed} stale jobs failed.")
+
+@app.cli.command("analytics-snapshot")
+@click.option('--full', is_flag=True, help='Copy every row, not just rows added since the last run.')
+@click.option('--table', 'tables', multiple=True,
+              type=click.Choice(['attendance', 'fee_payments', 'marks']),
+              help='Only this table (repeatable).')
+def analytics_snapshot(full, tables):
+    """Write new attendance, fee payment and mark rows to compressed snapshot files."""
+    from app.utils.snapshots import run_snapshot, PYARROW_AVAILABLE
+    folder = app.config['SNAPSHOT_FOLDER']
+    written = run_snapshot(folder, full=full, tables=tables)
+    for name, entry in written.items():
+        if entry:
+            click.echo(f"   {name}: {entry['rows']} rows -> {entry['file']}")
+        else:
+            click.echo(f"   {name}: nothing new")
+    fmt = 'Parquet' if PYARROW_AVAILABLE else 'gzipped CSV'
+    click.echo(f"✅ Snapshot written to {folder} ({fmt}).")
+
 if __name__ == '__main__':
     app.run(debug=True)